@@ -0,0 +1,141 @@
+#-----------------------------------------------------------
+ # DRAWTONE
+ # Copyright (c) 2026 Dave Kronawitter & Malte Mittrowann.
+ # All rights reserved.
+ #
+ # This code is proprietary and not open source.
+ # Unauthorized copying of this file is strictly prohibited.
+#------------------------------------------------------------
+
+
+import cv2
+import numpy as np
+import threading
+
+from analysen.feature_cache import bild_hash
+from analysen.frequency_spectrum import Frequenzspektrum
+
+# ---------------------- Analyse-Kontext ---------------------- #
+class AnalyseKontext:
+    """
+    Hält ein BGR-Bild einer Aufnahme und berechnet abgeleitete Ebenen (Gray, HSV, Lab,
+    Chroma, Masken, Laplace, Spektrum) erst bei Bedarf – jede davon höchstens einmal.
+    Alle berechne_*- und visualisiere_*-Funktionen akzeptieren statt eines Bildes auch einen Kontext.
+    hash_funktion: liefert den Feature-Cache-Schlüssel des Bildes (Kamerabilder: feature_cache.LiveSchluessel).
+    """
+
+    def __init__(self, image, hash_funktion=bild_hash):
+        self.bild = image
+        self.hash_funktion = hash_funktion
+        self._ebenen = {}
+        self._sperren = {}
+        self._sperre = threading.Lock()
+
+    def hole(self, schluessel, berechnung):
+        """
+        Liefert das Zwischenergebnis zu schluessel; berechnet es beim ersten Zugriff.
+        Thread-sicher: greifen mehrere Analysen gleichzeitig zu, rechnet nur eine, die anderen warten.
+        """
+        if schluessel in self._ebenen:
+            return self._ebenen[schluessel]
+        with self._sperre:
+            sperre = self._sperren.setdefault(schluessel, threading.Lock())
+        with sperre:
+            if schluessel not in self._ebenen:
+                self._ebenen[schluessel] = berechnung()
+        return self._ebenen[schluessel]
+
+    @property
+    def shape(self):
+        return self.bild.shape
+
+    @property
+    def inhalt_hash(self):
+        """Inhalts-Hash des Bildes (Schlüssel für den Feature-Cache)."""
+        return self.hole("inhalt_hash", lambda: self.hash_funktion(self.bild))
+
+    # ---------------------- Farbräume ---------------------- #
+    @property
+    def gray(self):
+        return self.hole("gray", lambda: cv2.cvtColor(self.bild, cv2.COLOR_BGR2GRAY))
+
+    @property
+    def hsv(self):
+        return self.hole("hsv", lambda: cv2.cvtColor(self.bild, cv2.COLOR_BGR2HSV))
+
+    @property
+    def lab(self):
+        return self.hole("lab", lambda: cv2.cvtColor(self.bild, cv2.COLOR_BGR2Lab))
+
+    # ---------------------- Masken ---------------------- #
+    @property
+    def chroma(self):
+        """Buntheit sqrt(a² + b²) pro Pixel im Lab-Raum."""
+        def berechnung():
+            a = self.lab[:, :, 1].astype(np.int16) - 128
+            b = self.lab[:, :, 2].astype(np.int16) - 128
+            return np.sqrt(a**2 + b**2)
+        return self.hole("chroma", berechnung)
+
+    def chroma_maske(self, farbschwelle):
+        return self.hole(("chroma_maske", farbschwelle), lambda: self.chroma > farbschwelle)
+
+    def saettigungs_maske(self, sättigungs_schwelle):
+        return self.hole(("saettigungs_maske", sättigungs_schwelle), lambda: self.hsv[:, :, 1] > sättigungs_schwelle)
+
+    # ---------------------- Kanten ---------------------- #
+    @property
+    def laplacian(self):
+        return self.hole("laplacian", lambda: cv2.Laplacian(self.gray, cv2.CV_64F))
+
+    @property
+    def laplacian_8u(self):
+        # Entspricht cv2.Laplacian(gray, cv2.CV_8U): ganzzahlige Antwort, auf 0–255 gesättigt
+        return self.hole("laplacian_8u", lambda: np.clip(self.laplacian, 0, 255).astype(np.uint8))
+
+    # ---------------------- Spektrum ---------------------- #
+    @property
+    def spektrum(self):
+        """Frequenzspektrum (eine rfft2 des Graustufenbildes)."""
+        return self.hole("spektrum", lambda: Frequenzspektrum(self.gray))
+
+    def kontext_fuer(self, metrik):
+        """Gleiche Schnittstelle wie AnalysePyramide: ein einzelner Kontext gilt für alle Metriken."""
+        return self
+
+    # ---------------------- Speicher ---------------------- #
+    def freigeben(self):
+        """Verwirft alle berechneten Ebenen (das Originalbild bleibt erhalten)."""
+        with self._sperre:
+            self._ebenen.clear()
+            self._sperren.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.freigeben()
+
+class VollbildQuelle:
+    """
+    Analysequelle ohne Pyramide (Schnittstelle wie AnalysePyramide): alle Metriken laufen auf dem
+    verkleinerten Analysekontext, nur die in vollbild_metriken genannten auf dem vollen Bild.
+    """
+
+    def __init__(self, analyse_kontext, image, vollbild_metriken, hash_funktion=bild_hash):
+        self.analyse = als_kontext(analyse_kontext)
+        self.vollbild = AnalyseKontext(image, hash_funktion)
+        self.vollbild_metriken = set(vollbild_metriken)
+
+    def kontext_fuer(self, metrik):
+        return self.vollbild if metrik in self.vollbild_metriken else self.analyse
+
+    def freigeben(self):
+        self.analyse.freigeben()
+        self.vollbild.freigeben()
+
+def als_kontext(image):
+    """Gibt einen vorhandenen Kontext unverändert zurück oder legt für ein Bild einen neuen an."""
+    if isinstance(image, AnalyseKontext):
+        return image
+    return AnalyseKontext(image)
@@ -0,0 +1,154 @@
+#-----------------------------------------------------------
+ # DRAWTONE
+ # Copyright (c) 2026 Dave Kronawitter & Malte Mittrowann.
+ # All rights reserved.
+ #
+ # This code is proprietary and not open source.
+ # Unauthorized copying of this file is strictly prohibited.
+#------------------------------------------------------------
+
+
+import argparse
+import os
+import threading
+import time
+import cv2
+import numpy as np
+
+from analysen.analysis_context import AnalyseKontext
+from analysen.feature_cache import bild_hash
+from analysen.image_analysis import (
+    berechne_durchschnittshelligkeit,
+    berechne_farbanteile,
+    berechne_segmentierungsgrad,
+    berechne_frequenz_index,
+    berechne_farbharmonie,
+    berechne_bildrausch_index,
+    berechne_farbschwerpunkt_index
+)
+
+# Pyramidenstufe pro Metrik (0 = volle Auflösung des Crops, jede Stufe halbiert Breite und Höhe).
+# Metriken, die hier fehlen, laufen auf STANDARD_STUFE.
+AUFLOESUNGS_POLITIK = {
+    "helligkeit": 3,
+    "farbanteile": 2,
+    "segmentierung": 2,
+    "frequenz": 2,
+    "farbharmonie": 2,
+    "farbschwerpunkt": 3,
+    "bildrauschen": 1,
+    "clip": 1,
+    "farbhistogramm": 0,  # nur mit histogramm_analyse in main.py; das Histogramm fasst den vollen Crop zusammen
+    "projektion": 2,
+}
+STANDARD_STUFE = 2
+
+# ---------------------- Auflösungspyramide ---------------------- #
+class AnalysePyramide:
+    """
+    Gauß-Pyramide einer Aufnahme. Jede Stufe wird erst bei Bedarf erzeugt und bekommt einen
+    eigenen AnalyseKontext; kontext_fuer(metrik) liefert die Stufe laut Auflösungs-Politik.
+    """
+
+    def __init__(self, image, politik=None, max_stufe=5, hash_funktion=bild_hash):
+        self.politik = AUFLOESUNGS_POLITIK if politik is None else politik
+        self.max_stufe = max_stufe
+        self.hash_funktion = hash_funktion
+        self._stufen = {0: AnalyseKontext(image, hash_funktion)}
+        self._sperre = threading.Lock()
+
+    def stufe(self, nummer):
+        """AnalyseKontext der Pyramidenstufe nummer (0 = Original)."""
+        nummer = max(0, min(nummer, self.max_stufe))
+        with self._sperre:
+            for n in range(1, nummer + 1):
+                if n not in self._stufen:
+                    self._stufen[n] = AnalyseKontext(cv2.pyrDown(self._stufen[n - 1].bild), self.hash_funktion)
+            return self._stufen[nummer]
+
+    def kontext_fuer(self, metrik):
+        return self.stufe(self.politik.get(metrik, STANDARD_STUFE))
+
+    def freigeben(self):
+        for kontext in self._stufen.values():
+            kontext.freigeben()
+        self._stufen = {0: self._stufen[0]}
+
+# ---------------------- Drift-Bericht ---------------------- #
+def _metriken(mit_clip=False):
+    """Skalare Kennwerte pro Metrik (ohne Visualisierungen)."""
+    metriken = {
+        "helligkeit": lambda k: berechne_durchschnittshelligkeit(k),
+        "farbanteile": lambda k: berechne_farbanteile(k, 75, 25)["weiß"],
+        "segmentierung": lambda k: berechne_segmentierungsgrad(k, modus="schnell", mit_visualisierung=False)[0],
+        "frequenz": lambda k: berechne_frequenz_index(k, mit_visualisierung=False)[0],
+        "farbharmonie": lambda k: berechne_farbharmonie(k, 20, 20, modus="schnell", mit_visualisierung=False)[0],
+        "farbschwerpunkt": lambda k: berechne_farbschwerpunkt_index(k, 20, mit_visualisierung=False)[0],
+        "bildrauschen": lambda k: berechne_bildrausch_index(k)[0],
+    }
+    if mit_clip:
+        from analysen.image_classification import klassifiziere_bild_clip
+        metriken["clip"] = lambda k: klassifiziere_bild_clip(k.bild, mit_genre=True)[1]
+    return metriken
+
+def berichte_aufloesungsdrift(bilder, stufen=(0, 1, 2, 3, 4), mit_clip=False, referenz_groesse=(320, 240)):
+    """
+    Misst für jede Metrik und Pyramidenstufe die Abweichung gegenüber Stufe 0 (volle Auflösung)
+    und die Laufzeit. Zusätzlich wird die bisherige feste Verkleinerung (referenz_groesse) als Zeile geführt.
+    Gibt {metrik: {stufe: (mittlere abs. Abweichung, mittlere rel. Abweichung, mittlere Zeit ms)}} zurück.
+    """
+    metriken = _metriken(mit_clip)
+    spalten = list(stufen) + ["fest"]
+    messungen = {m: {s: [] for s in spalten} for m in metriken}
+
+    for bild in bilder:
+        pyramide = AnalysePyramide(bild)
+        kontexte = {s: pyramide.stufe(s) for s in stufen}
+        kontexte["fest"] = AnalyseKontext(cv2.resize(bild, referenz_groesse))
+
+        for name, metrik in metriken.items():
+            referenz = float(metrik(pyramide.stufe(0)))
+            for s in spalten:
+                kontexte[s].freigeben()  # Zeit inkl. Farbraum-Konvertierungen der Stufe messen
+                start = time.perf_counter()
+                wert = float(metrik(kontexte[s]))
+                dauer = (time.perf_counter() - start) * 1000
+                abweichung = abs(wert - referenz)
+                messungen[name][s].append((abweichung, abweichung / (abs(referenz) + 1e-9), dauer))
+
+    bericht = {}
+    print(f"Auflösungs-Drift über {len(bilder)} Bild(er) (Referenz: Stufe 0 = volle Auflösung)")
+    for name, pro_stufe in messungen.items():
+        bericht[name] = {}
+        print(f"\n  {name}")
+        for s, werte in pro_stufe.items():
+            if not werte:
+                continue
+            abweichung, relativ, dauer = np.mean(np.array(werte), axis=0)
+            bericht[name][s] = (abweichung, relativ, dauer)
+            markierung = " ←" if AUFLOESUNGS_POLITIK.get(name, STANDARD_STUFE) == s else ""
+            print(f"    Stufe {str(s):>4}: Abweichung {abweichung:10.4f} ({relativ:6.1%}) | {dauer:8.1f} ms{markierung}")
+    return bericht
+
+def lade_bilder(pfad, maximal=None):
+    """Lädt ein einzelnes Bild oder alle JPG/PNG-Bilder eines Ordners."""
+    if os.path.isdir(pfad):
+        dateien = sorted(os.path.join(pfad, f) for f in os.listdir(pfad) if f.lower().endswith((".jpg", ".jpeg", ".png")))
+    else:
+        dateien = [pfad]
+    bilder = [cv2.imread(f) for f in dateien[:maximal]]
+    return [b for b in bilder if b is not None]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drift und Laufzeit der Metriken pro Pyramidenstufe")
+    parser.add_argument("pfad", nargs="?", default=os.path.join("captured_images", "tests"))
+    parser.add_argument("--stufen", type=int, nargs="+", default=[0, 1, 2, 3, 4])
+    parser.add_argument("--maximal", type=int, default=20, help="höchstens so viele Bilder auswerten")
+    parser.add_argument("--clip", action="store_true", help="CLIP-Genre mit auswerten")
+    argumente = parser.parse_args()
+
+    bilder = lade_bilder(argumente.pfad, argumente.maximal)
+    if not bilder:
+        print("❌ Keine Bilder gefunden:", argumente.pfad)
+    else:
+        berichte_aufloesungsdrift(bilder, argumente.stufen, argumente.clip)
@@ -0,0 +1,142 @@
+#-----------------------------------------------------------
+ # DRAWTONE
+ # Copyright (c) 2026 Dave Kronawitter & Malte Mittrowann.
+ # All rights reserved.
+ #
+ # This code is proprietary and not open source.
+ # Unauthorized copying of this file is strictly prohibited.
+#------------------------------------------------------------
+
+
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from analysen.analysis_context import als_kontext
+
+# Ebenen des AnalyseKontexts, die als Eingaben deklariert werden können
+KONTEXT_EBENEN = ("gray", "hsv", "lab", "chroma", "laplacian", "spektrum")
+
+# ---------------------- Ergebnis ---------------------- #
+class AnalyseErgebnis:
+    """Werte, Fehler und Laufzeiten (ms) aller Knoten eines Durchlaufs."""
+
+    def __init__(self):
+        self.werte = {}
+        self.fehler = {}
+        self.zeiten = {}
+        self.gesamt_ms = 0.0
+
+    def __getitem__(self, name):
+        if name in self.fehler:
+            raise self.fehler[name]
+        return self.werte[name]
+
+    def __contains__(self, name):
+        return name in self.werte
+
+    def zeitbericht(self):
+        """Laufzeit pro Knoten, Summe und tatsächliche Gesamtzeit (Wand-Uhr)."""
+        zeilen = [f"  {name:<22} {ms:8.1f} ms" for name, ms in sorted(self.zeiten.items(), key=lambda e: -e[1])]
+        summe = sum(self.zeiten.values())
+        zeilen.append(f"  {'Summe (seriell)':<22} {summe:8.1f} ms")
+        zeilen.append(f"  {'Gesamt (parallel)':<22} {self.gesamt_ms:8.1f} ms")
+        return "\n".join(zeilen)
+
+def _ebene_berechnen(ebene, kontexte):
+    for kontext in kontexte:
+        getattr(kontext, ebene)
+
+# ---------------------- Scheduler ---------------------- #
+class AnalyseScheduler:
+    """
+    Führt Analysen als Knoten eines Abhängigkeitsgraphen auf einem begrenzten Thread-Pool aus.
+    Die meisten Analysen sind OpenCV/NumPy/Torch-Aufrufe, die den GIL freigeben,
+    unabhängige Knoten laufen daher tatsächlich parallel.
+    """
+
+    def __init__(self, max_threads=4):
+        self.max_threads = max_threads
+        self._knoten = {}
+
+    def knoten(self, name, funktion, eingaben=()):
+        """
+        Registriert einen Knoten. funktion(kontext, **ergebnisse) bekommt den AnalyseKontext und
+        die Ergebnisse der Knoten aus eingaben als Schlüsselwort-Argumente.
+        eingaben dürfen auch Kontext-Ebenen (KONTEXT_EBENEN) sein; diese werden vorab einmal berechnet.
+        """
+        for eingabe in eingaben:
+            if eingabe not in self._knoten and eingabe not in KONTEXT_EBENEN:
+                raise ValueError(f"Unbekannte Eingabe '{eingabe}' für Knoten '{name}'")
+        self._knoten[name] = (funktion, tuple(eingaben))
+        return self
+
+    def _graph(self, quelle):
+        """
+        Knoten inkl. der benötigten Kontext-Ebenen als eigene Knoten. Jeder Knoten bekommt den
+        Kontext, den quelle.kontext_fuer(name) liefert (bei einer AnalysePyramide die Stufe laut Politik);
+        eine Ebene wird auf jedem Kontext berechnet, den ihre Abnehmer brauchen.
+        """
+        graph = {}
+        abnehmer = {}
+        for name, (funktion, eingaben) in self._knoten.items():
+            kontext = quelle.kontext_fuer(name)
+            for eingabe in eingaben:
+                if eingabe in KONTEXT_EBENEN:
+                    abnehmer.setdefault(eingabe, []).append(kontext)
+            graph[name] = (partial(funktion, kontext), eingaben)
+
+        for ebene, kontexte in abnehmer.items():
+            eindeutig = list({id(k): k for k in kontexte}.values())
+            graph[ebene] = (partial(_ebene_berechnen, ebene, eindeutig), ())
+        return graph
+
+    def ausfuehren(self, image):
+        """
+        Führt alle Knoten aus und gibt ein AnalyseErgebnis zurück.
+        image: BGR-Bild, AnalyseKontext oder AnalysePyramide.
+        """
+        quelle = image if hasattr(image, "kontext_fuer") else als_kontext(image)
+        graph = self._graph(quelle)
+        ergebnis = AnalyseErgebnis()
+        offen = dict(graph)
+        laufend = {}
+
+        def ausfuehren_knoten(name, funktion, argumente):
+            start = time.perf_counter()
+            try:
+                return funktion(**argumente)
+            finally:
+                ergebnis.zeiten[name] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="analyse") as pool:
+            while offen or laufend:
+                # Alle Knoten starten, deren Eingaben fertig sind
+                for name, (funktion, eingaben) in list(offen.items()):
+                    if any(e in offen or e in laufend.values() for e in eingaben):
+                        continue
+                    del offen[name]
+                    fehlgeschlagen = [e for e in eingaben if e in ergebnis.fehler]
+                    if fehlgeschlagen:
+                        ergebnis.fehler[name] = RuntimeError(f"Eingabe '{fehlgeschlagen[0]}' fehlgeschlagen")
+                        continue
+                    argumente = {e: ergebnis.werte[e] for e in eingaben if e in self._knoten}
+                    laufend[pool.submit(ausfuehren_knoten, name, funktion, argumente)] = name
+
+                if not laufend:
+                    continue
+
+                fertig, _ = wait(laufend, return_when=FIRST_COMPLETED)
+                for future in fertig:
+                    name = laufend.pop(future)
+                    try:
+                        wert = future.result()
+                    except Exception as e:
+                        ergebnis.fehler[name] = e
+                        continue
+                    if name in self._knoten:  # Kontext-Ebenen bleiben im Kontext, nicht im Ergebnis
+                        ergebnis.werte[name] = wert
+
+        ergebnis.gesamt_ms = (time.perf_counter() - start) * 1000
+        return ergebnis
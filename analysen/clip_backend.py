@@ -0,0 +1,196 @@
+#-----------------------------------------------------------
+ # DRAWTONE
+ # Copyright (c) 2026 Dave Kronawitter & Malte Mittrowann.
+ # All rights reserved.
+ #
+ # This code is proprietary and not open source.
+ # Unauthorized copying of this file is strictly prohibited.
+#------------------------------------------------------------
+
+
+import argparse
+import os
+import time
+import numpy as np
+from contextlib import contextmanager
+import torch
+
+from analysen.feature_cache import STANDARD_PFAD
+
+BACKENDS = ("eager", "torchscript", "onnx")
+EXPORT_ORDNER = os.path.dirname(STANDARD_PFAD)
+EINGABE_GROESSE = 224  # ViT-B/32 erwartet 224x224
+
+# ---------------------- Bild-Encoder ---------------------- #
+class EagerEncoder:
+    """Bild-Encoder des geladenen CLIP-Modells in PyTorch (Referenz)."""
+
+    name = "eager"
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, image_input):
+        with torch.no_grad():
+            return self.model.encode_image(image_input).float().cpu().numpy()
+
+class TorchScriptEncoder:
+    """Eingefrorener TorchScript-Trace des Bild-Encoders (CPU, float32, optional dynamisch int8-quantisiert)."""
+
+    def __init__(self, model, quantisieren=False, modell_name="ViT-B-32"):
+        self.name = "torchscript-int8" if quantisieren else "torchscript"
+        pfad = os.path.join(EXPORT_ORDNER, f"clip_visual_{modell_name}_{self.name}.pt")
+        if not os.path.exists(pfad):
+            visual = _cpu_visual(model, quantisieren)
+            with torch.no_grad():
+                trace = torch.jit.trace(visual, _probe_eingabe())
+            with _atomar(pfad) as temp:
+                torch.jit.save(torch.jit.freeze(trace), temp)
+        self.modul = torch.jit.optimize_for_inference(torch.jit.load(pfad, map_location="cpu"))
+
+    def __call__(self, image_input):
+        with torch.no_grad():
+            return self.modul(image_input.cpu().float()).numpy()
+
+class OnnxEncoder:
+    """
+    Bild-Encoder als ONNX-Modell in onnxruntime (CPU), optional mit dynamischer int8-Quantisierung der Gewichte.
+    onnxruntime ist optional (requirements.txt); fehlt es, wirft der Konstruktor ImportError.
+    """
+
+    def __init__(self, model, quantisieren=False, modell_name="ViT-B-32", threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError as fehler:
+            raise ImportError("Für das ONNX-Backend wird onnxruntime benötigt (pip install onnxruntime)") from fehler
+
+        self.name = "onnx-int8" if quantisieren else "onnx"
+        pfad = os.path.join(EXPORT_ORDNER, f"clip_visual_{modell_name}.onnx")
+        if not os.path.exists(pfad):
+            with _atomar(pfad) as temp:
+                torch.onnx.export(_cpu_visual(model), _probe_eingabe(), temp, input_names=["bild"], output_names=["features"],
+                                  dynamic_axes={"bild": {0: "batch"}, "features": {0: "batch"}}, opset_version=17)
+        if quantisieren:
+            quantisiert = os.path.join(EXPORT_ORDNER, f"clip_visual_{modell_name}_int8.onnx")
+            if not os.path.exists(quantisiert):
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+                with _atomar(quantisiert) as temp:
+                    quantize_dynamic(pfad, temp, weight_type=QuantType.QInt8)
+            pfad = quantisiert
+
+        optionen = ort.SessionOptions()
+        optionen.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            optionen.intra_op_num_threads = threads
+        self.sitzung = ort.InferenceSession(pfad, optionen, providers=["CPUExecutionProvider"])
+
+    def __call__(self, image_input):
+        eingabe = image_input.cpu().float().numpy() if torch.is_tensor(image_input) else np.asarray(image_input, dtype=np.float32)
+        return self.sitzung.run(["features"], {"bild": eingabe})[0]
+
+def _cpu_visual(model, quantisieren=False):
+    """Kopie des Bild-Encoders in float32 auf der CPU (für Export und Quantisierung)."""
+    import copy
+    visual = copy.deepcopy(model.visual).float().cpu().eval()
+    if quantisieren:
+        visual = torch.ao.quantization.quantize_dynamic(visual, {torch.nn.Linear}, dtype=torch.qint8)
+    return visual
+
+@contextmanager
+def _atomar(pfad):
+    """Export in eine temporäre Datei und erst danach umbenennen – parallele Prozesse sehen nie eine halbe Datei."""
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    basis, endung = os.path.splitext(pfad)
+    temp = f"{basis}.{os.getpid()}.tmp{endung}"
+    try:
+        yield temp
+        os.replace(temp, pfad)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+def _probe_eingabe():
+    return torch.zeros(1, 3, EINGABE_GROESSE, EINGABE_GROESSE)
+
+def erstelle_bild_encoder(model, backend="eager", quantisieren=False, modell_name="ViT-B/32"):
+    """Bild-Encoder für backend ("eager", "torchscript", "onnx"); exportierte Modelle liegen im Cache-Ordner."""
+    modell_name = modell_name.replace("/", "-")
+    if backend == "eager":
+        if quantisieren:
+            raise ValueError("Quantisierung gibt es nur für die Backends torchscript und onnx")
+        return EagerEncoder(model)
+    if backend == "torchscript":
+        return TorchScriptEncoder(model, quantisieren, modell_name)
+    if backend == "onnx":
+        return OnnxEncoder(model, quantisieren, modell_name)
+    raise ValueError(f"Unbekanntes CLIP-Backend: {backend}")
+
+# ---------------------- Paritätsprüfung ---------------------- #
+def vergleiche_backends(bilder, varianten=(("torchscript", False), ("torchscript", True), ("onnx", False), ("onnx", True)), wiederholungen=3):
+    """
+    Vergleicht jedes Backend mit dem Eager-Modell: Übereinstimmung der Top-3-Labels (gleiche Reihenfolge),
+    des Top-1-Labels, des Genre-Werts und die Latenz pro Bild (Median, nur Bild-Encoder).
+    Gibt {backend: {"top3", "top1", "genre", "latenz_ms"}} zurück.
+    """
+    from analysen import image_classification as ic
+
+    ic.lade_clip_im_hintergrund().result()
+    eingaben = [ic.bereite_bild_vor(bild).cpu().float() for bild in bilder]
+
+    def auswerten(encoder):
+        ergebnisse, latenzen = [], []  # (Top 3, Genre-Wert) pro Bild
+        for eingabe in eingaben:
+            for _ in range(wiederholungen):
+                start = time.perf_counter()
+                features = encoder(eingabe)
+                latenzen.append((time.perf_counter() - start) * 1000)
+            embedding = features[0] / np.linalg.norm(features[0])
+            ergebnisse.append(ic.klassifiziere_embedding(embedding, mit_genre=True))
+        return ergebnisse, float(np.median(latenzen))
+
+    referenz, referenz_ms = auswerten(EagerEncoder(_cpu_visual_modell(ic.model)))
+    referenz_genre = [genre for _, genre in referenz]
+    referenz = [top for top, _ in referenz]
+    bericht = {"eager": {"top3": 1.0, "top1": 1.0, "genre": 1.0, "latenz_ms": referenz_ms}}
+
+    print(f"CLIP-Backends auf {len(bilder)} Bild(ern), Referenz: eager ({referenz_ms:.1f} ms/Bild)")
+    for backend, quantisieren in varianten:
+        try:
+            encoder = erstelle_bild_encoder(ic.model, backend, quantisieren, ic.CLIP_MODELL)
+        except ImportError as fehler:
+            print(f"  {backend}{'-int8' if quantisieren else ''}: übersprungen ({fehler})")
+            continue
+        ergebnisse, latenz = auswerten(encoder)
+        top3 = [top for top, _ in ergebnisse]
+        labels = lambda t: [label for label, _ in t]
+        bericht[encoder.name] = {
+            "top3": np.mean([labels(a) == labels(b) for a, b in zip(top3, referenz)]),
+            "top1": np.mean([a[0][0] == b[0][0] for a, b in zip(top3, referenz)]),
+            "genre": np.mean([genre == g for (_, genre), g in zip(ergebnisse, referenz_genre)]),
+            "latenz_ms": latenz,
+        }
+        werte = bericht[encoder.name]
+        print(f"  {encoder.name:<17} Top-3: {werte['top3']:6.1%} | Top-1: {werte['top1']:6.1%} | Genre: {werte['genre']:6.1%} | "
+              f"{latenz:7.1f} ms/Bild (×{referenz_ms / latenz:.2f})")
+    return bericht
+
+def _cpu_visual_modell(model):
+    # Referenz auf der CPU in float32, damit alle Backends unter gleichen Bedingungen laufen
+    if next(model.parameters()).device.type == "cpu":
+        return model
+    import copy
+    return copy.deepcopy(model).float().cpu()
+
+if __name__ == "__main__":
+    from analysen.analysis_pyramid import lade_bilder
+
+    parser = argparse.ArgumentParser(description="Top-3-/Genre-Übereinstimmung und Latenz der CLIP-CPU-Backends")
+    parser.add_argument("pfad", nargs="?", default=os.path.join("captured_images", "tests"))
+    parser.add_argument("--maximal", type=int, default=50, help="höchstens so viele Bilder auswerten")
+    argumente = parser.parse_args()
+
+    bilder = lade_bilder(argumente.pfad, argumente.maximal)
+    if not bilder:
+        print("❌ Keine Bilder gefunden:", argumente.pfad)
+    else:
+        vergleiche_backends(bilder)
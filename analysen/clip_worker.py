@@ -0,0 +1,215 @@
+#-----------------------------------------------------------
+ # DRAWTONE
+ # Copyright (c) 2026 Dave Kronawitter & Malte Mittrowann.
+ # All rights reserved.
+ #
+ # This code is proprietary and not open source.
+ # Unauthorized copying of this file is strictly prohibited.
+#------------------------------------------------------------
+
+
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import cv2
+import numpy as np
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+# ---------------------- Worker-Prozess ---------------------- #
+def _worker_schleife(speicher_name, slot_bytes, auftraege, ergebnisse, backend, quantisieren, cache_pfad):
+    """Läuft im CLIP-Prozess: Modell laden, dann Aufträge aus dem Shared Memory klassifizieren."""
+    from analysen.feature_cache import FeatureCache
+    from analysen.image_classification import clip_analyse, lade_clip_im_hintergrund
+
+    cv2.setNumThreads(1)
+    speicher = shared_memory.SharedMemory(name=speicher_name)
+    cache = FeatureCache(cache_pfad) if cache_pfad else None
+    try:
+        try:
+            ergebnisse.put(("bereit", lade_clip_im_hintergrund(backend, quantisieren).result()))
+        except Exception as fehler:
+            # Ohne Modell hilft auch ein Neustart nicht
+            ergebnisse.put(("ladefehler", repr(fehler)))
+            return
+        while True:
+            auftrag = auftraege.get()
+            if auftrag is None:
+                break
+            auftrag_id, slot, form, inhalt_hash = auftrag
+            try:
+                # Kopie aus dem Slot, danach darf der Hauptprozess ihn wiederverwenden
+                bild = np.ndarray(form, dtype=np.uint8, buffer=speicher.buf, offset=slot * slot_bytes).copy()
+                ergebnisse.put((auftrag_id, clip_analyse(bild, cache, inhalt_hash), None))
+            except Exception as fehler:
+                ergebnisse.put((auftrag_id, None, repr(fehler)))
+    finally:
+        if cache is not None:
+            cache.schliessen()
+        speicher.close()
+
+# ---------------------- Hauptprozess ---------------------- #
+class KeinFreierSlot(RuntimeError):
+    """Alle Shared-Memory-Slots sind noch mit offenen Aufträgen belegt."""
+
+class ClipWorker:
+    """
+    CLIP-Klassifizierung in einem eigenen Prozess. Bilder gehen über Shared Memory (slots Puffer fester Größe)
+    an den Worker, klassifiziere() gibt sofort ein Future mit dem Ergebnis von clip_analyse zurück.
+    Stürzt der Worker ab, wird er neu gestartet und offene Aufträge werden einmal wiederholt.
+    """
+
+    def __init__(self, max_form=(480, 640, 3), slots=2, backend="eager", quantisieren=False, cache_pfad=None, max_versuche=2):
+        self.max_form = tuple(max_form)
+        self.slot_bytes = int(np.prod(self.max_form))
+        self.backend = backend
+        self.quantisieren = quantisieren
+        self.cache_pfad = cache_pfad
+        self.max_versuche = max_versuche
+        self.neustarts = 0
+        self.bereit = Future()  # erfüllt mit den Ladezeiten, sobald der erste Worker das Modell geladen hat
+
+        self._kontext = mp.get_context("spawn")
+        self._speicher = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+        self._freie_slots = queue.Queue()
+        for slot in range(slots):
+            self._freie_slots.put(slot)
+        self._ids = itertools.count()
+        self._offen = {}  # auftrag_id → [Future, Slot, Form, Inhalts-Hash, Versuche]
+        self._sperre = threading.Lock()
+        self._beendet = False
+        self._ladefehler = None
+
+        self._starte_prozess()
+        self._leser = threading.Thread(target=self._lese_ergebnisse, name="clip-ergebnisse", daemon=True)
+        self._leser.start()
+
+    def _starte_prozess(self):
+        self._auftraege = self._kontext.Queue()
+        self._ergebnisse = self._kontext.Queue()
+        self._prozess = self._kontext.Process(
+            target=_worker_schleife, name="clip-worker", daemon=True,
+            args=(self._speicher.name, self.slot_bytes, self._auftraege, self._ergebnisse,
+                  self.backend, self.quantisieren, self.cache_pfad))
+        self._prozess.start()
+
+    def klassifiziere(self, bild, inhalt_hash=None):
+        """
+        Übergibt ein BGR-Bild an den Worker; Future → clip_analyse-Dict. Blockiert nie: sind alle Slots belegt,
+        ist das Future sofort mit KeinFreierSlot fehlgeschlagen (der Aufrufer nimmt dann den Fallback).
+        inhalt_hash: optionaler Feature-Cache-Schlüssel des Bildes (sonst bild_hash im Worker).
+        """
+        if self._ladefehler is not None:
+            future = Future()
+            future.set_exception(RuntimeError(f"CLIP-Worker konnte das Modell nicht laden: {self._ladefehler}"))
+            return future
+
+        try:
+            slot = self._freie_slots.get_nowait()
+        except queue.Empty:
+            future = Future()
+            future.set_exception(KeinFreierSlot(f"CLIP-Worker ausgelastet ({len(self._offen)} Aufträge offen)"))
+            return future
+
+        bild = self._passend(bild)
+        ziel = np.ndarray(bild.shape, dtype=np.uint8, buffer=self._speicher.buf, offset=slot * self.slot_bytes)
+        ziel[...] = bild
+
+        future = Future()
+        with self._sperre:
+            if self._ladefehler is not None:
+                self._freie_slots.put(slot)
+                future.set_exception(RuntimeError(f"CLIP-Worker konnte das Modell nicht laden: {self._ladefehler}"))
+                return future
+            auftrag_id = next(self._ids)
+            self._offen[auftrag_id] = [future, slot, bild.shape, inhalt_hash, 1]
+            self._auftraege.put((auftrag_id, slot, bild.shape, inhalt_hash))
+        return future
+
+    def _passend(self, bild):
+        """uint8, zusammenhängend und höchstens max_form groß (größere Bilder werden seitentreu verkleinert)."""
+        h, w = bild.shape[:2]
+        faktor = min(self.max_form[0] / h, self.max_form[1] / w, 1.0)
+        if faktor < 1.0:
+            bild = cv2.resize(bild, (max(1, int(w * faktor)), max(1, int(h * faktor))), interpolation=cv2.INTER_AREA)
+        return np.ascontiguousarray(bild, dtype=np.uint8)
+
+    def _lese_ergebnisse(self):
+        while not self._beendet:
+            try:
+                nachricht = self._ergebnisse.get(timeout=0.5)
+            except queue.Empty:
+                if not self._beendet and self._ladefehler is None and not self._prozess.is_alive():
+                    self._neustart()
+                continue
+            except (EOFError, OSError):
+                if not self._beendet and self._ladefehler is None:
+                    self._neustart()
+                continue
+
+            if nachricht[0] == "bereit":
+                if not self.bereit.done():
+                    self.bereit.set_result(nachricht[1])
+                continue
+            if nachricht[0] == "ladefehler":
+                self._ladefehler = nachricht[1]
+                fehler = RuntimeError(f"CLIP-Worker konnte das Modell nicht laden: {self._ladefehler}")
+                if not self.bereit.done():
+                    self.bereit.set_exception(fehler)
+                with self._sperre:
+                    offen, self._offen = self._offen, {}
+                for future, slot, *_ in offen.values():
+                    self._freie_slots.put(slot)
+                    future.set_exception(fehler)
+                continue
+
+            auftrag_id, ergebnis, fehler = nachricht
+            with self._sperre:
+                eintrag = self._offen.pop(auftrag_id, None)
+            if eintrag is None:
+                continue
+            future, slot = eintrag[0], eintrag[1]
+            self._freie_slots.put(slot)
+            if fehler is None:
+                future.set_result(ergebnis)
+            else:
+                future.set_exception(RuntimeError(f"CLIP-Worker: {fehler}"))
+
+    def _neustart(self):
+        """Neuer Worker-Prozess; offene Aufträge (ihre Bilder liegen noch im Slot) werden erneut gesendet."""
+        self.neustarts += 1
+        print(f"⚠️ CLIP-Worker beendet (Exitcode {self._prozess.exitcode}) – Neustart #{self.neustarts}")
+        self._starte_prozess()
+        with self._sperre:
+            for auftrag_id, eintrag in list(self._offen.items()):
+                future, slot, form, inhalt_hash, versuche = eintrag
+                if versuche >= self.max_versuche:
+                    del self._offen[auftrag_id]
+                    self._freie_slots.put(slot)
+                    future.set_exception(RuntimeError("CLIP-Worker ist bei diesem Bild wiederholt abgestürzt"))
+                else:
+                    eintrag[4] += 1
+                    self._auftraege.put((auftrag_id, slot, form, inhalt_hash))
+
+    def schliessen(self, timeout=5):
+        self._beendet = True
+        try:
+            self._auftraege.put(None)
+            self._prozess.join(timeout)
+        finally:
+            if self._prozess.is_alive():
+                self._prozess.terminate()
+            self._leser.join(timeout)
+            with self._sperre:
+                for future, *_ in self._offen.values():
+                    future.cancel()
+                self._offen.clear()
+            self._speicher.close()
+            self._speicher.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.schliessen()
@@ -0,0 +1,152 @@
+#-----------------------------------------------------------
+ # DRAWTONE
+ # Copyright (c) 2026 Dave Kronawitter & Malte Mittrowann.
+ # All rights reserved.
+ #
+ # This code is proprietary and not open source.
+ # Unauthorized copying of this file is strictly prohibited.
+#------------------------------------------------------------
+
+
+import numpy as np
+
+# ---------------------- Stichprobe ---------------------- #
+def stratifizierte_stichprobe(anzahl_pixel, stichproben_groesse, rng=None):
+    """
+    Teilt die Pixel (in Rasterreihenfolge) in gleich große Schichten und zieht aus jeder Schicht
+    genau einen Pixel. So ist jede Bildregion in der Stichprobe vertreten.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    if stichproben_groesse >= anzahl_pixel:
+        return np.arange(anzahl_pixel)
+
+    grenzen = np.linspace(0, anzahl_pixel, stichproben_groesse + 1)
+    start = grenzen[:-1].astype(np.int64)
+    breite = np.maximum(grenzen[1:].astype(np.int64) - start, 1)
+    return start + (rng.random(stichproben_groesse) * breite).astype(np.int64)
+
+# ---------------------- Zuordnung ---------------------- #
+def naechste_zentren(pixel, zentren, blockgroesse=65536):
+    """Ordnet jeden Pixel dem nächsten Zentrum zu (quadrierter euklidischer Abstand), blockweise."""
+    pixel = np.asarray(pixel, dtype=np.float32)
+    zentren = np.asarray(zentren, dtype=np.float32)
+    zentren_norm = np.sum(zentren**2, axis=1)
+
+    labels = np.empty(len(pixel), dtype=np.int32)
+    for start in range(0, len(pixel), blockgroesse):
+        block = pixel[start:start + blockgroesse]
+        # |x - c|² = |x|² - 2 x·c + |c|²  (|x|² ist pro Zeile konstant und entfällt im argmin)
+        abstand = zentren_norm - 2.0 * (block @ zentren.T)
+        labels[start:start + blockgroesse] = np.argmin(abstand, axis=1)
+    return labels
+
+# ---------------------- Initialisierung ---------------------- #
+def kmeans_plusplus(pixel, anzahl_cluster, rng=None):
+    """k-means++-Startzentren aus den übergebenen Pixeln."""
+    if rng is None:
+        rng = np.random.default_rng()
+    pixel = np.asarray(pixel, dtype=np.float32)
+
+    zentren = np.empty((anzahl_cluster, pixel.shape[1]), dtype=np.float32)
+    zentren[0] = pixel[rng.integers(len(pixel))]
+    min_abstand = np.sum((pixel - zentren[0])**2, axis=1)
+
+    for i in range(1, anzahl_cluster):
+        summe = min_abstand.sum()
+        if summe <= 0:
+            zentren[i] = pixel[rng.integers(len(pixel))]
+        else:
+            zentren[i] = pixel[rng.choice(len(pixel), p=min_abstand / summe)]
+        min_abstand = np.minimum(min_abstand, np.sum((pixel - zentren[i])**2, axis=1))
+    return zentren
+
+# ---------------------- Mini-Batch-KMeans ---------------------- #
+def minibatch_kmeans(pixel, anzahl_cluster, start_zentren=None, batch_groesse=1024, iterationen=30, rng=None):
+    """
+    Mini-Batch-KMeans (Sculley 2010): pro Iteration ein zufälliger Batch, Zentren werden mit
+    einer Lernrate von 1/(Anzahl bisheriger Zuordnungen) nachgeführt.
+    start_zentren: optionaler Warmstart (z. B. Zentren der vorherigen Aufnahme).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    pixel = np.asarray(pixel, dtype=np.float32)
+
+    if start_zentren is not None and np.shape(start_zentren) == (anzahl_cluster, pixel.shape[1]):
+        zentren = np.array(start_zentren, dtype=np.float32)
+    else:
+        zentren = kmeans_plusplus(pixel, anzahl_cluster, rng)
+
+    zaehler = np.zeros(anzahl_cluster, dtype=np.float32)
+    batch_groesse = min(batch_groesse, len(pixel))
+
+    for _ in range(iterationen):
+        batch = pixel[rng.integers(0, len(pixel), batch_groesse)]
+        labels = naechste_zentren(batch, zentren)
+
+        # Summen und Anzahlen pro Zentrum im Batch
+        anzahl = np.bincount(labels, minlength=anzahl_cluster).astype(np.float32)
+        summen = np.zeros_like(zentren)
+        np.add.at(summen, labels, batch)
+
+        belegt = anzahl > 0
+        zaehler[belegt] += anzahl[belegt]
+        lernrate = anzahl[belegt] / zaehler[belegt]
+        mittel = summen[belegt] / anzahl[belegt, None]
+        zentren[belegt] += lernrate[:, None] * (mittel - zentren[belegt])
+
+    return zentren
+
+# ---------------------- Gewichtetes KMeans ---------------------- #
+def gewichtetes_kmeans(punkte, gewichte, anzahl_cluster, iterationen=50, neustarts=10, epsilon=0.2, rng=None):
+    """
+    KMeans auf gewichteten Punkten (z. B. Histogramm-Bins mit Pixelanzahl als Gewicht).
+    Gibt (Zentren, Labels der Punkte, Gewicht pro Zentrum) des Neustarts mit der kleinsten
+    gewichteten Fehlerquadratsumme zurück.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    punkte = np.asarray(punkte, dtype=np.float32)
+    gewichte = np.asarray(gewichte, dtype=np.float64)
+    gewichtete_punkte = punkte * gewichte[:, None]
+
+    bestes = None
+    for _ in range(neustarts):
+        zentren = _gewichtetes_kmeans_plusplus(punkte, gewichte, anzahl_cluster, rng)
+        for _ in range(iterationen):
+            labels = naechste_zentren(punkte, zentren)
+            summen = np.stack([np.bincount(labels, weights=gewichtete_punkte[:, d], minlength=anzahl_cluster)
+                               for d in range(punkte.shape[1])], axis=1)
+            cluster_gewicht = np.bincount(labels, weights=gewichte, minlength=anzahl_cluster)
+
+            neu = zentren.copy()
+            belegt = cluster_gewicht > 0
+            neu[belegt] = (summen[belegt] / cluster_gewicht[belegt, None]).astype(np.float32)
+            verschiebung = np.max(np.sum((neu - zentren)**2, axis=1))
+            zentren = neu
+            if verschiebung <= epsilon**2:
+                break
+
+        labels = naechste_zentren(punkte, zentren)
+        fehler = np.sum(gewichte * np.sum((punkte - zentren[labels])**2, axis=1))
+        if bestes is None or fehler < bestes[0]:
+            bestes = (fehler, zentren, labels)
+
+    _, zentren, labels = bestes
+    return zentren, labels, np.bincount(labels, weights=gewichte, minlength=anzahl_cluster)
+
+def _gewichtetes_kmeans_plusplus(punkte, gewichte, anzahl_cluster, rng):
+    """k-means++ mit Ziehwahrscheinlichkeit proportional zu Gewicht × Abstand²."""
+    zentren = np.empty((anzahl_cluster, punkte.shape[1]), dtype=np.float32)
+    zentren[0] = punkte[rng.choice(len(punkte), p=gewichte / gewichte.sum())]
+    min_abstand = np.sum((punkte - zentren[0])**2, axis=1)
+
+    for i in range(1, anzahl_cluster):
+        p = gewichte * min_abstand
+        summe = p.sum()
+        if summe <= 0:
+            zentren[i] = punkte[rng.integers(len(punkte))]
+        else:
+            zentren[i] = punkte[rng.choice(len(punkte), p=p / summe)]
+        min_abstand = np.minimum(min_abstand, np.sum((punkte - zentren[i])**2, axis=1))
+    return zentren
@@ -0,0 +1,214 @@
+#-----------------------------------------------------------
+ # DRAWTONE
+ # Copyright (c) 2026 Dave Kronawitter & Malte Mittrowann.
+ # All rights reserved.
+ #
+ # This code is proprietary and not open source.
+ # Unauthorized copying of this file is strictly prohibited.
+#------------------------------------------------------------
+
+
+import cv2
+import numpy as np
+import time
+
+from analysen.analysis_context import als_kontext
+from analysen.clustering import gewichtetes_kmeans
+from analysen.image_analysis import (
+    FARBKLASSEN,
+    farbklassen_lut,
+    zeichne_farbschwerpunkt,
+    berechne_farbanteile,
+    berechne_farbharmonie,
+    berechne_farbschwerpunkt_index,
+    berechne_segmentierungsgrad
+)
+
+# ---------------------- Farbhistogramm ---------------------- #
+class Farbhistogramm:
+    """
+    Quantisiertes 3D-BGR-Histogramm einer Aufnahme (stufen³ Bins). Pro belegtem Bin werden
+    Pixelanzahl und mittlere Farbe gespeichert. Farbanteile, Farbschwerpunkt, Farbharmonie und
+    Segmentierung arbeiten danach nur noch auf den Bins. Die beiden KMeans-Analysen clustern höchstens
+    max_bins Bins: sind mehr belegt (verrauschte Aufnahmen), wird das Raster dafür vergröbert.
+    Nach dem Aufbau hängt der Aufwand damit nicht mehr von der Auflösung ab.
+    """
+
+    def __init__(self, image, stufen=32, max_bins=2048):
+        if stufen not in (8, 16, 32, 64, 128, 256):
+            raise ValueError("stufen muss eine Zweierpotenz zwischen 8 und 256 sein")
+        bild = als_kontext(image).bild
+        self.shape = bild.shape
+        self.stufen = stufen
+        self.max_bins = max_bins
+        self._grob = None
+
+        # Ein Durchlauf über alle Pixel: Bin-Index, Anzahl und Farbsummen pro Bin
+        pixels = bild.reshape(-1, 3)
+        verschiebung = 8 - int(np.log2(stufen))
+        q = pixels >> verschiebung
+        index = (q[:, 0].astype(np.int32) * stufen + q[:, 1]) * stufen + q[:, 2]
+        anzahl = np.bincount(index, minlength=stufen**3)
+
+        self._belegt = np.flatnonzero(anzahl)
+        self._pixel_index = index
+        self.anzahl = anzahl[self._belegt]
+        self.gesamt = len(pixels)
+
+        summen = np.stack([np.bincount(index, weights=pixels[:, c], minlength=stufen**3)[self._belegt] for c in range(3)], axis=1)
+        self.farben = (summen / self.anzahl[:, None]).astype(np.float32)  # mittlere BGR-Farbe pro Bin
+
+        bgr = np.rint(self.farben).astype(np.uint8).reshape(-1, 1, 3)
+        self.bgr = bgr.reshape(-1, 3)
+        self.hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV).reshape(-1, 3)
+        self.lab = cv2.cvtColor(bgr, cv2.COLOR_BGR2Lab).reshape(-1, 3)
+
+    def _grobe_bins(self):
+        """
+        (BGR, HSV, Lab, Anzahl, Bin → Grob-Bin) mit höchstens max_bins belegten Bins. Solange es mehr sind,
+        wird das Raster halbiert und die Bins werden mit ihrer Pixelanzahl gewichtet zusammengelegt.
+        """
+        if self._grob is not None:
+            return self._grob
+        stufen, farben, anzahl = self.stufen, self.farben, self.anzahl
+        zuordnung = np.arange(len(anzahl))
+        while len(anzahl) > self.max_bins and stufen > 2:
+            stufen //= 2
+            q = np.rint(farben).astype(np.int32) >> (8 - int(np.log2(stufen)))
+            _, grob = np.unique((q[:, 0] * stufen + q[:, 1]) * stufen + q[:, 2], return_inverse=True)
+            grob = grob.reshape(-1)
+            grob_anzahl = np.bincount(grob, weights=anzahl)
+            farben = (np.stack([np.bincount(grob, weights=farben[:, c] * anzahl) for c in range(3)], axis=1)
+                      / grob_anzahl[:, None]).astype(np.float32)
+            anzahl = grob_anzahl.astype(np.int64)
+            zuordnung = grob[zuordnung]
+
+        bgr = np.rint(farben).astype(np.uint8).reshape(-1, 1, 3)
+        self._grob = (bgr.reshape(-1, 3), cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV).reshape(-1, 3),
+                      cv2.cvtColor(bgr, cv2.COLOR_BGR2Lab).reshape(-1, 3), anzahl, zuordnung)
+        return self._grob
+
+    # ---------------------- Farbanteile ---------------------- #
+    def farbanteile(self, thresholdWhite=75, thresholdBlack=25):
+        """Wie berechne_farbanteile, klassifiziert wird die mittlere Farbe jedes Bins."""
+        b, g, r = (self.bgr[:, c].astype(np.int32) for c in range(3))
+        klassen = farbklassen_lut(thresholdWhite, thresholdBlack)[(b << 16) | (g << 8) | r]
+        counts = np.bincount(klassen, weights=self.anzahl, minlength=len(FARBKLASSEN) + 1)
+        return {farbe: counts[i] / self.gesamt for i, farbe in enumerate(FARBKLASSEN)}
+
+    # ---------------------- Farbschwerpunkt ---------------------- #
+    def farbschwerpunkt_index(self, sättigungs_schwelle=20, mit_visualisierung=True):
+        """Gewichteter zirkulärer Mittelwert über die Farbtöne der Bins (wie berechne_farbschwerpunkt_index)."""
+        farbschwerpunkt = np.average(self.hsv, axis=0, weights=self.anzahl)
+
+        auswahl = self.hsv[:, 1] > sättigungs_schwelle
+        if not np.any(auswahl):
+            visualisierung = np.ones((300, 300, 3), dtype=np.uint8) * 255 if mit_visualisierung else None
+            return 0.0, farbschwerpunkt, visualisierung
+
+        hue_rad = np.deg2rad(self.hsv[auswahl, 0] * 2)  # uint8 wie berechne_farbschwerpunkt_index
+        gewichte = self.anzahl[auswahl]
+        mean_x = np.average(np.cos(hue_rad), weights=gewichte)
+        mean_y = np.average(np.sin(hue_rad), weights=gewichte)
+        konzentration = np.sqrt(mean_x**2 + mean_y**2)
+        schwerpunkt_index = max(0.0, min(1.0, 1.0 - konzentration))
+
+        if not mit_visualisierung:
+            return schwerpunkt_index, farbschwerpunkt, None
+
+        # Linien der (bis zu) 500 häufigsten Farbton-Bins
+        haeufigste = np.argsort(-gewichte)[:500]
+        return schwerpunkt_index, farbschwerpunkt, zeichne_farbschwerpunkt(hue_rad[haeufigste], mean_x, mean_y)
+
+    # ---------------------- Farbharmonie ---------------------- #
+    def farbpalette(self, anzahl_cluster=6, sättigungs_schwelle=20):
+        """Gewichtetes HSV-KMeans auf den gesättigten (groben) Bins → (Zentren, Pixel pro Zentrum) oder None."""
+        _, hsv, _, anzahl, _ = self._grobe_bins()
+        auswahl = hsv[:, 1] > sättigungs_schwelle
+        if np.count_nonzero(auswahl) < anzahl_cluster:
+            return None
+        zentren, _, gewichte = gewichtetes_kmeans(hsv[auswahl], anzahl[auswahl], anzahl_cluster, 50, 10, 0.2)
+        return zentren, np.rint(gewichte).astype(np.int64)
+
+    def farbharmonie(self, anzahl_cluster=6, sättigungs_schwelle=20, mit_visualisierung=True):
+        palette = self.farbpalette(anzahl_cluster, sättigungs_schwelle)
+        if palette is None:
+            dummy_balken = np.zeros((100, 300, 3), dtype=np.uint8) if mit_visualisierung else None
+            return 0.0, dummy_balken
+        return berechne_farbharmonie(None, palette=palette, mit_visualisierung=mit_visualisierung)
+
+    # ---------------------- Segmentierung ---------------------- #
+    def segmentierungsgrad(self, anzahl_cluster=20, farbschwelle=25, mit_visualisierung=True):
+        """Gewichtetes Lab-KMeans auf den bunten (groben) Bins (wie berechne_segmentierungsgrad)."""
+        _, _, lab, anzahl, zuordnung = self._grobe_bins()
+        a = lab[:, 1].astype(np.int16) - 128
+        b = lab[:, 2].astype(np.int16) - 128
+        auswahl = np.sqrt(a**2 + b**2) > farbschwelle
+
+        if np.count_nonzero(auswahl) < anzahl_cluster:
+            dummy_bild = np.zeros(self.shape, dtype=np.uint8) if mit_visualisierung else None
+            return 0.0, dummy_bild
+
+        zentren, labels, gewichte = gewichtetes_kmeans(lab[auswahl], anzahl[auswahl], anzahl_cluster, 100, 10, 1.0)
+        counts = gewichte[gewichte > 0]
+        segmentierungsgrad = counts.std() / counts.mean()
+
+        if not mit_visualisierung:
+            return segmentierungsgrad, None
+
+        # Cluster jedes Bins zurück auf die Pixel abbilden (nicht bunte Bins bleiben schwarz)
+        grob_label = np.full(len(anzahl), -1, dtype=np.int32)
+        grob_label[auswahl] = labels
+        bin_label = np.full(self.stufen**3, -1, dtype=np.int32)
+        bin_label[self._belegt] = grob_label[zuordnung]
+        pixel_label = bin_label[self._pixel_index]
+
+        clustered = np.zeros((len(pixel_label), 3), dtype=np.uint8)
+        bunt = pixel_label >= 0
+        clustered[bunt] = zentren[pixel_label[bunt]]
+        clustered_bgr = cv2.cvtColor(clustered.reshape(self.shape), cv2.COLOR_Lab2BGR)
+        return segmentierungsgrad, clustered_bgr
+
+# ---------------------- Zugriff über den Kontext ---------------------- #
+def berechne_farbhistogramm(image, stufen=32, max_bins=2048):
+    """Farbhistogramm der Aufnahme, im AnalyseKontext gemerkt (einmal pro Aufnahme und Parametersatz)."""
+    kontext = als_kontext(image)
+    return kontext.hole(("farbhistogramm", stufen, max_bins), lambda: Farbhistogramm(kontext, stufen, max_bins))
+
+def vergleiche_mit_pixelanalyse(image, stufen=32, anzahl_cluster=20, max_bins=2048):
+    """
+    Stellt die Histogramm-Kennwerte den pixelbasierten gegenüber (Wert und Laufzeit),
+    um die Quantisierung (stufen) für eine Auflösung zu wählen.
+    """
+    zeilen = []
+
+    def messen(funktion):
+        start = time.perf_counter()
+        wert = funktion()
+        return wert, (time.perf_counter() - start) * 1000
+
+    pixel_kontext = als_kontext(image)
+    hist, hist_ms = messen(lambda: Farbhistogramm(pixel_kontext, stufen, max_bins))
+    zeilen.append(("Histogramm aufbauen", None, None, None, hist_ms))
+
+    paare = [
+        ("Weißanteil", lambda: berechne_farbanteile(pixel_kontext)["weiß"], lambda: hist.farbanteile()["weiß"]),
+        ("Farbschwerpunkt", lambda: berechne_farbschwerpunkt_index(pixel_kontext, 20, mit_visualisierung=False)[0],
+                            lambda: hist.farbschwerpunkt_index(20, mit_visualisierung=False)[0]),
+        ("Farbharmonie", lambda: berechne_farbharmonie(pixel_kontext, anzahl_cluster, 20, mit_visualisierung=False)[0],
+                         lambda: hist.farbharmonie(anzahl_cluster, 20, mit_visualisierung=False)[0]),
+        ("Segmentierungsgrad", lambda: berechne_segmentierungsgrad(pixel_kontext, anzahl_cluster, mit_visualisierung=False)[0],
+                               lambda: hist.segmentierungsgrad(anzahl_cluster, mit_visualisierung=False)[0]),
+    ]
+    for name, pixel_funktion, hist_funktion in paare:
+        pixel_wert, pixel_ms = messen(pixel_funktion)
+        hist_wert, hist_ms = messen(hist_funktion)
+        zeilen.append((name, pixel_wert, hist_wert, pixel_ms, hist_ms))
+
+    print(f"Histogramm {stufen}³ | {len(hist.anzahl)} belegte Bins, {len(hist._grobe_bins()[3])} für KMeans | Bild {pixel_kontext.shape[1]}x{pixel_kontext.shape[0]}")
+    for name, pixel_wert, hist_wert, pixel_ms, hist_ms in zeilen:
+        if pixel_wert is None:
+            print(f"  {name:<20} {'':>27} {hist_ms:8.1f} ms")
+        else:
+            print(f"  {name:<20} Pixel: {pixel_wert:.3f} | Hist: {hist_wert:.3f} | {pixel_ms:8.1f} ms → {hist_ms:8.1f} ms")
+    return zeilen
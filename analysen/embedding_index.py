@@ -0,0 +1,206 @@
+#-----------------------------------------------------------
+ # DRAWTONE
+ # Copyright (c) 2026 Dave Kronawitter & Malte Mittrowann.
+ # All rights reserved.
+ #
+ # This code is proprietary and not open source.
+ # Unauthorized copying of this file is strictly prohibited.
+#------------------------------------------------------------
+
+
+import argparse
+import json
+import os
+import threading
+import time
+import numpy as np
+
+from analysen.clustering import minibatch_kmeans, naechste_zentren, stratifizierte_stichprobe
+from analysen.feature_cache import STANDARD_PFAD
+
+STANDARD_ORDNER = os.path.join(os.path.dirname(STANDARD_PFAD), "embeddings")
+
+# ---------------------- Embedding-Index ---------------------- #
+class EmbeddingIndex:
+    """
+    Persistenter Speicher normierter CLIP-Bild-Embeddings mit k-NN-Suche (Kosinus-Ähnlichkeit).
+    Die Vektoren liegen als float32-Rohdaten in embeddings.f32 und werden per np.memmap gelesen,
+    die Metadaten (Datei, Genre, Top-1 …) zeilenweise in eintraege.jsonl.
+    Exakte Suche ist ein blockweises Matrix-Vektor-Produkt; nach baue_ivf() ist zusätzlich eine
+    ungefähre Suche möglich, die nur die nprobe nächsten KMeans-Listen durchsucht.
+    """
+
+    def __init__(self, ordner=STANDARD_ORDNER, dimension=512):
+        self.ordner = ordner
+        self.dimension = dimension
+        self._vektor_pfad = os.path.join(ordner, "embeddings.f32")
+        self._meta_pfad = os.path.join(ordner, "eintraege.jsonl")
+        self._ivf_pfad = os.path.join(ordner, "ivf.npz")
+        self._sperre = threading.Lock()
+        self._matrix = None
+        self._ivf = None
+
+        os.makedirs(ordner, exist_ok=True)
+        self.eintraege = []
+        meta_defekt = False
+        if os.path.exists(self._meta_pfad):
+            with open(self._meta_pfad, encoding="utf-8") as f:
+                zeilen = [zeile for zeile in f if zeile.strip()]
+            for nummer, zeile in enumerate(zeilen):
+                try:
+                    self.eintraege.append(json.loads(zeile))
+                except json.JSONDecodeError:
+                    # Nur die letzte Zeile kann von einem abgebrochenen Schreiben stammen
+                    if nummer < len(zeilen) - 1:
+                        raise
+                    meta_defekt = True
+
+        # Nach einem Abbruch zwischen Vektor und Metadaten gilt der kürzere Stand;
+        # eine halb geschriebene Vektorzeile wird immer abgeschnitten, sonst landen spätere Zeilen versetzt
+        zeilenbytes = 4 * dimension
+        groesse = os.path.getsize(self._vektor_pfad) if os.path.exists(self._vektor_pfad) else 0
+        anzahl = min(groesse // zeilenbytes, len(self.eintraege))
+        if groesse != anzahl * zeilenbytes:
+            with open(self._vektor_pfad, "r+b") as f:
+                f.truncate(anzahl * zeilenbytes)
+        if meta_defekt or anzahl != len(self.eintraege):
+            self.eintraege = self.eintraege[:anzahl]
+            with open(self._meta_pfad, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(e, ensure_ascii=False, default=float) + "\n" for e in self.eintraege)
+
+        if os.path.exists(self._ivf_pfad):
+            daten = np.load(self._ivf_pfad)
+            self._ivf = (daten["zentren"], daten["listen"], daten["grenzen"], int(daten["anzahl"]))
+
+    def __len__(self):
+        return len(self.eintraege)
+
+    # ---------------------- Schreiben ---------------------- #
+    def hinzufuegen(self, embedding, **meta):
+        """Hängt ein Embedding an (wird normiert) und gibt seine Nummer zurück."""
+        vektor = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if len(vektor) != self.dimension:
+            raise ValueError(f"Embedding hat Dimension {len(vektor)}, erwartet {self.dimension}")
+        vektor = vektor / (np.linalg.norm(vektor) + 1e-12)
+
+        with self._sperre:
+            nummer = len(self.eintraege)
+            eintrag = {"id": nummer, "zeit": time.time(), **meta}
+            with open(self._vektor_pfad, "ab") as f:
+                f.write(vektor.tobytes())
+            with open(self._meta_pfad, "a", encoding="utf-8") as f:
+                f.write(json.dumps(eintrag, ensure_ascii=False, default=float) + "\n")
+            self.eintraege.append(eintrag)
+            self._matrix = None  # beim nächsten Lesen neu einblenden
+        return nummer
+
+    def _vektoren(self):
+        if self._matrix is None or len(self._matrix) != len(self.eintraege):
+            if not self.eintraege:
+                return np.empty((0, self.dimension), dtype=np.float32)
+            self._matrix = np.memmap(self._vektor_pfad, dtype=np.float32, mode="r", shape=(len(self.eintraege), self.dimension))
+        return self._matrix
+
+    # ---------------------- Suche ---------------------- #
+    def suche(self, embedding, k=5, ungefaehr=False, nprobe=8, blockgroesse=65536):
+        """
+        Die k ähnlichsten gespeicherten Embeddings → Liste von (Ähnlichkeit, Eintrag), absteigend sortiert.
+        ungefaehr=True nutzt den IVF-Index (falls gebaut); später hinzugefügte Vektoren werden exakt durchsucht.
+        """
+        anfrage = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        anfrage = anfrage / (np.linalg.norm(anfrage) + 1e-12)
+        with self._sperre:
+            matrix = self._vektoren()
+            ivf = self._ivf
+        if len(matrix) == 0:
+            return []
+
+        if ungefaehr and ivf is not None:
+            zentren, listen, grenzen, anzahl = ivf
+            naechste = np.argsort(-(zentren @ anfrage))[:nprobe]
+            kandidaten = np.concatenate([listen[grenzen[l]:grenzen[l + 1]] for l in naechste] +
+                                        [np.arange(anzahl, len(matrix))])
+            kandidaten.sort()  # aufsteigend lesen: weniger Seitenwechsel im memmap
+            aehnlichkeit = matrix[kandidaten] @ anfrage
+        else:
+            kandidaten = None
+            aehnlichkeit = np.concatenate([matrix[start:start + blockgroesse] @ anfrage
+                                           for start in range(0, len(matrix), blockgroesse)])
+
+        k = min(k, len(aehnlichkeit))
+        beste = np.argpartition(-aehnlichkeit, k - 1)[:k]
+        beste = beste[np.argsort(-aehnlichkeit[beste])]
+        zeilen = beste if kandidaten is None else kandidaten[beste]
+        return [(float(aehnlichkeit[b]), self.eintraege[z]) for b, z in zip(beste, zeilen)]
+
+    def naechstes_duplikat(self, embedding, schwelle=0.95):
+        """Eintrag der ähnlichsten Zeichnung, falls ihre Kosinus-Ähnlichkeit ≥ schwelle ist, sonst None."""
+        treffer = self.suche(embedding, 1)
+        if treffer and treffer[0][0] >= schwelle:
+            return treffer[0]
+        return None
+
+    # ---------------------- Ungefähre Suche ---------------------- #
+    def baue_ivf(self, anzahl_listen=None, stichprobe=20000):
+        """
+        Invertierte Listen (IVF): Mini-Batch-KMeans auf einer Stichprobe der Embeddings, jede Zeile
+        kommt in die Liste ihres nächsten Zentrums. Wird in ivf.npz gespeichert.
+        """
+        with self._sperre:
+            matrix = np.asarray(self._vektoren())
+        anzahl = len(matrix)
+        if anzahl == 0:
+            return
+        anzahl_listen = anzahl_listen or max(1, int(np.sqrt(anzahl)))
+
+        auswahl = stratifizierte_stichprobe(anzahl, stichprobe)
+        zentren = minibatch_kmeans(matrix[auswahl], anzahl_listen)
+        zentren /= np.linalg.norm(zentren, axis=1, keepdims=True) + 1e-12
+        labels = naechste_zentren(matrix, zentren)
+
+        listen = np.argsort(labels, kind="stable")
+        grenzen = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=anzahl_listen))))
+        np.savez(self._ivf_pfad, zentren=zentren, listen=listen, grenzen=grenzen, anzahl=anzahl)
+        with self._sperre:
+            self._ivf = (zentren, listen, grenzen, anzahl)
+
+# ---------------------- Messung ---------------------- #
+def miss_suchzeit(index, anfragen=100, k=5, nprobe=8):
+    """Mittlere Suchzeit (ms) exakt und ungefähr sowie der Recall@k der ungefähren Suche."""
+    matrix = index._vektoren()
+    rng = np.random.default_rng()
+    proben = matrix[rng.integers(0, len(matrix), anfragen)] + rng.normal(0, 0.01, (anfragen, index.dimension)).astype(np.float32)
+
+    def messen(**optionen):
+        start = time.perf_counter()
+        ergebnisse = [[e["id"] for _, e in index.suche(p, k, **optionen)] for p in proben]
+        return ergebnisse, (time.perf_counter() - start) * 1000 / anfragen
+
+    exakt, exakt_ms = messen()
+    print(f"{len(index)} Embeddings | exakt: {exakt_ms:.2f} ms/Anfrage", end="")
+    if index._ivf is not None:
+        ungefaehr, ungefaehr_ms = messen(ungefaehr=True, nprobe=nprobe)
+        recall = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(exakt, ungefaehr)])
+        print(f" | ungefähr (nprobe {nprobe}): {ungefaehr_ms:.2f} ms/Anfrage, Recall@{k} {recall:.1%}")
+        return exakt_ms, ungefaehr_ms, recall
+    print()
+    return exakt_ms, None, None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding-Index: IVF bauen, ähnliche Zeichnungen finden, Suchzeit messen")
+    parser.add_argument("--ordner", default=STANDARD_ORDNER)
+    parser.add_argument("--ivf", action="store_true", help="IVF-Index für die ungefähre Suche (neu) bauen")
+    parser.add_argument("--nummer", type=int, help="ähnlichste Zeichnungen zu diesem Eintrag ausgeben")
+    parser.add_argument("-k", type=int, default=5)
+    argumente = parser.parse_args()
+
+    index = EmbeddingIndex(argumente.ordner)
+    if len(index) == 0:
+        print("❌ Index ist leer:", argumente.ordner)
+    else:
+        if argumente.ivf:
+            index.baue_ivf()
+        if argumente.nummer is not None:
+            for aehnlichkeit, eintrag in index.suche(index._vektoren()[argumente.nummer], argumente.k + 1)[1:]:
+                print(f"  #{eintrag['id']:<6} {aehnlichkeit:.3f}  {eintrag.get('datei', '')}  Genre {eintrag.get('genre', '?')}")
+        miss_suchzeit(index, k=argumente.k)
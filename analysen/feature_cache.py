@@ -0,0 +1,217 @@
+#-----------------------------------------------------------
+ # DRAWTONE
+ # Copyright (c) 2026 Dave Kronawitter & Malte Mittrowann.
+ # All rights reserved.
+ #
+ # This code is proprietary and not open source.
+ # Unauthorized copying of this file is strictly prohibited.
+#------------------------------------------------------------
+
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import cv2
+import numpy as np
+
+# Standard-Speicherort: <Projekt>/cache/features.sqlite
+STANDARD_PFAD = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "features.sqlite")
+STANDARD_MAX_BYTES = 256 * 1024 * 1024
+_FEHLT = object()
+
+# ---------------------- Schlüssel ---------------------- #
+def bild_hash(bild):
+    """Inhalts-Hash eines Bildes (Form, Datentyp und Pixeldaten)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{bild.shape}|{bild.dtype}".encode())
+    h.update(np.ascontiguousarray(bild).data)
+    return h.hexdigest()
+
+class LiveSchluessel:
+    """
+    Inhalts-Schlüssel für Kamerabilder. Eine erneute Aufnahme derselben Zeichnung unterscheidet sich durch
+    Sensorrauschen in jedem Pixel, bild_hash träfe nie. Verglichen wird daher ein stark verkleinertes
+    Vorschaubild (INTER_AREA mittelt das Rauschen weg): weicht es in keinem Pixel um mehr als toleranz
+    von einem der letzten merken Bilder gleicher Form ab, wird dessen Schlüssel wiederverwendet.
+    Bei 1920×1080 mittelt ein Vorschaupixel aber über 60×45 Pixel, ein kleiner Strich bliebe unter der
+    Toleranz. Deshalb wird ein Treffer zusätzlich auf Blöcken von fein_block×fein_block Pixeln bestätigt
+    (fein_toleranz gilt pro Block). Die Zuordnung gilt pro Programmlauf; Archivbilder behalten den exakten bild_hash.
+    Prüfung: pruefe_live_schluessel().
+    """
+
+    def __init__(self, groesse=(32, 24), toleranz=5, merken=64, fein_block=8, fein_toleranz=12):
+        self.groesse = groesse
+        self.toleranz = toleranz
+        self.merken = merken
+        self.fein_block = fein_block
+        self.fein_toleranz = fein_toleranz
+        self._letzte = []  # (Form, Vorschau, Feinbild, Schlüssel), neueste zuletzt
+        self._sperre = threading.Lock()
+
+    def __call__(self, bild):
+        vorschau = cv2.resize(bild, self.groesse, interpolation=cv2.INTER_AREA).astype(np.int16)
+        fein = None
+        with self._sperre:
+            for nummer in range(len(self._letzte) - 1, -1, -1):
+                form, frueher, frueher_fein, schluessel = self._letzte[nummer]
+                if form != bild.shape or np.max(np.abs(frueher - vorschau)) > self.toleranz:
+                    continue
+                if fein is None:
+                    fein = self._feinbild(bild)
+                if cv2.norm(frueher_fein, fein, cv2.NORM_INF) <= self.fein_toleranz:
+                    # Nach hinten holen, damit oft wiederholte Zeichnungen nicht herausfallen
+                    self._letzte.append(self._letzte.pop(nummer))
+                    return schluessel
+            if fein is None:
+                fein = self._feinbild(bild)
+            schluessel = "live:" + bild_hash(np.concatenate([np.array(bild.shape, dtype=np.int16), vorschau.reshape(-1)]))
+            if any(eintrag[3] == schluessel for eintrag in self._letzte):
+                # Gleiche Vorschau, aber anderes Feinbild: eigener Schlüssel
+                schluessel += ":" + bild_hash(fein)[:12]
+            self._letzte.append((bild.shape, vorschau, fein, schluessel))
+            del self._letzte[:-self.merken]
+        return schluessel
+
+    def _feinbild(self, bild):
+        h, w = bild.shape[:2]
+        return cv2.resize(bild, (max(1, w // self.fein_block), max(1, h // self.fein_block)), interpolation=cv2.INTER_AREA)
+
+def pruefe_live_schluessel(hoehe=1080, breite=1920, rauschen=4.0, seed=0):
+    """
+    Selbstprüfung des LiveSchluessel auf einer synthetischen Zeichnung: eine verrauschte zweite Aufnahme muss
+    denselben Schlüssel liefern, ein kleiner Strich (2×30 Pixel) einen neuen.
+    """
+    rng = np.random.default_rng(seed)
+    zeichnung = np.full((hoehe, breite, 3), 235, np.uint8)
+    cv2.circle(zeichnung, (breite // 3, hoehe // 2), hoehe // 5, (40, 60, 200), -1)
+    cv2.line(zeichnung, (breite // 2, hoehe // 4), (breite - 100, hoehe - 100), (30, 30, 30), 6)
+
+    def aufnahme(bild):
+        return np.clip(bild + rng.normal(0, rauschen, bild.shape), 0, 255).astype(np.uint8)
+
+    mit_strich = zeichnung.copy()
+    cv2.line(mit_strich, (breite // 4 * 3, hoehe // 6), (breite // 4 * 3 + 30, hoehe // 6), (30, 30, 30), 2)
+
+    schluessel = LiveSchluessel()
+    erster = schluessel(aufnahme(zeichnung))
+    wiederholung = schluessel(aufnahme(zeichnung))
+    strich = schluessel(aufnahme(mit_strich))
+    return {"wiederholung_trifft": wiederholung == erster, "strich_neu": strich not in (erster, wiederholung)}
+
+def cache_schluessel(inhalt_hash, analyse, version, parameter=None):
+    """Schlüssel aus Bild-Hash, Analyse-Name, Analyse-Version und Parametern (Clusterzahl, Schwellen, Prompts …)."""
+    beschreibung = json.dumps([inhalt_hash, analyse, str(version), parameter or {}], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(beschreibung.encode(), digest_size=20).hexdigest()
+
+# ---------------------- Serialisierung ---------------------- #
+def _kodieren(wert):
+    """NumPy-Arrays (z. B. CLIP-Embeddings) binär als float16, alles andere als JSON."""
+    if isinstance(wert, np.ndarray):
+        puffer = io.BytesIO()
+        if wert.dtype in (np.float32, np.float64):
+            wert = wert.astype(np.float16)
+        np.save(puffer, wert, allow_pickle=False)
+        return b"N" + puffer.getvalue()
+    return b"J" + json.dumps(wert, ensure_ascii=False, default=float).encode()
+
+def _dekodieren(daten):
+    art, inhalt = daten[:1], daten[1:]
+    if art == b"N":
+        wert = np.load(io.BytesIO(inhalt), allow_pickle=False)
+        return wert.astype(np.float32) if wert.dtype == np.float16 else wert
+    return json.loads(inhalt.decode())
+
+# ---------------------- Cache ---------------------- #
+class FeatureCache:
+    """
+    Inhaltsadressierter Cache für Kennwerte und CLIP-Ergebnisse in einer SQLite-Datei.
+    Überschreitet der Cache max_bytes, werden die am längsten nicht genutzten Einträge gelöscht (LRU).
+    Lesen schreibt nicht: Zugriffszeiten werden gesammelt und mit dem nächsten Schreiben,
+    spätestens nach zugriffe_puffer Treffern oder beim Schließen in einer Transaktion nachgetragen.
+    Mehrere Threads und Prozesse dürfen dieselbe Datei verwenden.
+    """
+
+    def __init__(self, pfad=STANDARD_PFAD, max_bytes=STANDARD_MAX_BYTES, zugriffe_puffer=64):
+        self.pfad = pfad
+        self.max_bytes = max_bytes
+        self.zugriffe_puffer = zugriffe_puffer
+        self.treffer = 0
+        self.fehlschlaege = 0
+        self._zugriffe = {}  # schluessel → Zeitpunkt des letzten Lesens, noch nicht in der Datei
+        self._sperre = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(pfad)), exist_ok=True)
+        self._db = sqlite3.connect(pfad, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS eintraege (
+                                schluessel TEXT PRIMARY KEY,
+                                wert BLOB NOT NULL,
+                                groesse INTEGER NOT NULL,
+                                zugriff REAL NOT NULL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS eintraege_zugriff ON eintraege (zugriff)")
+        self._db.commit()
+
+    def hole(self, schluessel, standard=None):
+        """Gespeicherter Wert oder standard."""
+        with self._sperre:
+            zeile = self._db.execute("SELECT wert FROM eintraege WHERE schluessel = ?", (schluessel,)).fetchone()
+            if zeile is None:
+                self.fehlschlaege += 1
+                return standard
+            self._zugriffe[schluessel] = time.time()
+            if len(self._zugriffe) >= self.zugriffe_puffer:
+                self._zugriffe_schreiben()
+                self._db.commit()
+            self.treffer += 1
+        return _dekodieren(zeile[0])
+
+    def _zugriffe_schreiben(self):
+        """Gesammelte Zugriffszeiten nachtragen (ohne commit, läuft unter self._sperre)."""
+        if self._zugriffe:
+            self._db.executemany("UPDATE eintraege SET zugriff = ? WHERE schluessel = ?",
+                                 [(zeit, schluessel) for schluessel, zeit in self._zugriffe.items()])
+            self._zugriffe.clear()
+
+    def lege_ab(self, schluessel, wert):
+        daten = _kodieren(wert)
+        with self._sperre:
+            self._db.execute("INSERT OR REPLACE INTO eintraege VALUES (?, ?, ?, ?)",
+                             (schluessel, sqlite3.Binary(daten), len(daten), time.time()))
+            self._zugriffe_schreiben()
+            self._aufraeumen()
+            self._db.commit()
+
+    def merke(self, bild, analyse, version, parameter, berechnung, inhalt_hash=None):
+        """Wert aus dem Cache holen oder mit berechnung() erzeugen und ablegen."""
+        schluessel = cache_schluessel(inhalt_hash or bild_hash(bild), analyse, version, parameter)
+        wert = self.hole(schluessel, _FEHLT)
+        if wert is _FEHLT:
+            wert = berechnung()
+            self.lege_ab(schluessel, wert)
+        return wert
+
+    def groesse(self):
+        with self._sperre:
+            return self._db.execute("SELECT COALESCE(SUM(groesse), 0) FROM eintraege").fetchone()[0]
+
+    def _aufraeumen(self):
+        """Älteste Einträge löschen, bis der Cache wieder unter 90 % von max_bytes liegt."""
+        gesamt = self._db.execute("SELECT COALESCE(SUM(groesse), 0) FROM eintraege").fetchone()[0]
+        if gesamt <= self.max_bytes:
+            return
+        ziel = 0.9 * self.max_bytes
+        for schluessel, groesse in self._db.execute("SELECT schluessel, groesse FROM eintraege ORDER BY zugriff").fetchall():
+            if gesamt <= ziel:
+                break
+            self._db.execute("DELETE FROM eintraege WHERE schluessel = ?", (schluessel,))
+            gesamt -= groesse
+
+    def schliessen(self):
+        with self._sperre:
+            self._zugriffe_schreiben()
+            self._db.commit()
+            self._db.close()
@@ -0,0 +1,117 @@
+#-----------------------------------------------------------
+ # DRAWTONE
+ # Copyright (c) 2026 Dave Kronawitter & Malte Mittrowann.
+ # All rights reserved.
+ #
+ # This code is proprietary and not open source.
+ # Unauthorized copying of this file is strictly prohibited.
+#------------------------------------------------------------
+
+
+import numpy as np
+from functools import lru_cache
+
+# ---------------------- Geometrie pro Bildgröße ---------------------- #
+@lru_cache(maxsize=8)
+def _spektrum_geometrie(hoehe, breite):
+    """
+    Alles, was nur von der Bildgröße abhängt, einmal pro Form berechnen:
+    Vielfachheit jedes rfft2-Bins im Vollspektrum, Gewichte der Tiefpass-Maske, Radius-Bins
+    und die Indizes zum Spiegeln des Halbspektrums auf das volle (fftshift-)Spektrum.
+    """
+    halbe_breite = breite // 2 + 1
+    zeilen = np.arange(hoehe)[:, None]
+    spalten = np.arange(halbe_breite)[None, :]
+
+    # Spalten, deren Spiegelbild (-u, -k) selbst im Halbspektrum liegt, zählen einfach
+    selbst_gespiegelt = (spalten == 0) | ((breite % 2 == 0) & (spalten == breite // 2))
+    vielfachheit = np.where(selbst_gespiegelt, 1.0, 2.0) * np.ones((hoehe, 1))
+
+    # Tiefpass-Kreis wie bisher im verschobenen Spektrum: Mittelpunkt (mitte, mitte) mit mitte = Höhe // 2
+    # (bewusst beibehalten, damit der Frequenz-Index zum bestehenden OSC-Mapping passt)
+    mitte = hoehe // 2
+    radius = mitte // 4
+    y, x = np.ogrid[:hoehe, :breite]
+    maske_verschoben = (x - mitte)**2 + (y - mitte)**2 <= radius**2
+    maske = np.fft.ifftshift(maske_verschoben)
+
+    spiegel_zeilen = (-zeilen) % hoehe
+    spiegel_spalten = (-spalten) % breite
+    gewicht_tief = maske[zeilen, spalten].astype(np.float64)
+    gewicht_tief += np.where(selbst_gespiegelt, False, maske[spiegel_zeilen, spiegel_spalten])
+
+    # Radius jedes Bins (in Frequenz-Indizes) für das radial gemittelte Spektrum
+    fy = np.fft.fftfreq(hoehe) * hoehe
+    radius_bin = np.rint(np.sqrt(fy[:, None]**2 + spalten**2)).astype(np.int64).reshape(-1)
+    bins_pro_radius = np.bincount(radius_bin, weights=vielfachheit.reshape(-1))
+
+    # Halbspektrum → Vollspektrum: rechte Spalten sind komplex konjugierte Spiegelungen
+    rechts = np.arange(halbe_breite, breite)
+    voll_zeilen = (-np.arange(hoehe)[:, None]) % hoehe
+    voll_spalten = (breite - rechts)[None, :]
+
+    return {
+        "vielfachheit": vielfachheit,
+        "gewicht_tief": gewicht_tief,
+        "radius_bin": radius_bin,
+        "bins_pro_radius": bins_pro_radius,
+        "voll_index": (voll_zeilen, voll_spalten),
+    }
+
+# ---------------------- Spektrum einer Aufnahme ---------------------- #
+class Frequenzspektrum:
+    """
+    Eine einzige reelle FFT (rfft2) des Graustufenbildes. Frequenz-Index, Projektionsspektrum
+    und radial gemitteltes Leistungsspektrum werden alle aus dieser Transformation abgeleitet.
+    """
+
+    def __init__(self, gray):
+        self.shape = gray.shape
+        self.geometrie = _spektrum_geometrie(*gray.shape)
+        self.betrag = np.abs(np.fft.rfft2(gray))
+        self.log_betrag = np.log1p(self.betrag)
+
+    def tiefe_frequenzen(self):
+        """Summe des Log-Betrags unter der Tiefpass-Maske."""
+        return np.sum(self.log_betrag * self.geometrie["gewicht_tief"])
+
+    def ohne_tiefe_frequenzen(self):
+        """
+        True, wenn unter der Tiefpass-Maske nur Rundungsrauschen liegt (z. B. gleichmäßig graues Bild).
+        Die rfft2 liefert dort anders als die bisherige fft2 keine exakten Nullen.
+        """
+        return self.tiefe_frequenzen() <= 1e-6 * self.shape[0] * self.shape[1]
+
+    def frequenz_index(self):
+        """Verhältnis hoher zu tiefer Frequenzen (Log-Betrag), identisch zur bisherigen Definition."""
+        low_freq = self.tiefe_frequenzen()
+        high_freq = np.sum(self.log_betrag * self.geometrie["vielfachheit"]) - low_freq
+        if self.ohne_tiefe_frequenzen():
+            return 0
+        return (high_freq ** 1.2) / (low_freq + 1e-6)
+
+    def log_spektrum(self):
+        """Volles, zentriertes Log-Betragsspektrum (für die Projektion)."""
+        hoehe, breite = self.shape
+        halbe_breite = self.log_betrag.shape[1]
+        voll = np.empty((hoehe, breite), dtype=np.float32)
+        voll[:, :halbe_breite] = self.log_betrag
+        voll[:, halbe_breite:] = self.log_betrag[self.geometrie["voll_index"]]
+        return np.fft.fftshift(voll)
+
+    def radiales_leistungsspektrum(self):
+        """Mittlere Leistung |F|² pro ganzzahligem Frequenzradius (Index 0 = Gleichanteil)."""
+        leistung = (self.betrag**2 * self.geometrie["vielfachheit"]).reshape(-1)
+        summe = np.bincount(self.geometrie["radius_bin"], weights=leistung)
+        return summe / np.maximum(self.geometrie["bins_pro_radius"], 1)
+
+    def bandenergien(self, anzahl_baender=8):
+        """
+        Relativer Anteil der Leistung in bis zu anzahl_baender logarithmisch verteilten
+        Frequenzbändern (ohne Gleichanteil). Bänder schmaler als ein Radius-Bin werden zusammengelegt.
+        """
+        radial = self.radiales_leistungsspektrum() * self.geometrie["bins_pro_radius"]
+        grenzen = np.unique(np.geomspace(1, len(radial), anzahl_baender + 1).astype(int))
+        energien = np.add.reduceat(radial[:grenzen[-1]], grenzen[:-1]) if len(grenzen) > 1 else np.zeros(0)
+        gesamt = energien.sum()
+        return energien / gesamt if gesamt > 0 else energien
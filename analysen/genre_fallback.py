@@ -0,0 +1,237 @@
+#-----------------------------------------------------------
+ # DRAWTONE
+ # Copyright (c) 2026 Dave Kronawitter & Malte Mittrowann.
+ # All rights reserved.
+ #
+ # This code is proprietary and not open source.
+ # Unauthorized copying of this file is strictly prohibited.
+#------------------------------------------------------------
+
+
+import argparse
+import csv
+import os
+import threading
+import time
+import numpy as np
+
+from analysen.feature_cache import STANDARD_PFAD
+from analysen.image_analysis import ANALYSE_VERSION
+from analysen.image_classification import GENRE_WERTE, NEUTRALES_GENRE
+from analysen.main_analyseArchiv import SPALTEN
+
+# Kennwerte aus image_analysis, in der Reihenfolge der Feature-CSV
+MERKMALE = [spalte for spalte in SPALTEN if spalte != "datei"]
+STANDARD_MODELL = os.path.join(os.path.dirname(STANDARD_PFAD), "genre_fallback.npz")
+ARTEN = ("knn", "linear")
+
+# ---------------------- Merkmale ---------------------- #
+def merkmale_aus_analyse(analyse):
+    """Merkmals-Dict (Namen wie in der Feature-CSV) aus dem Ergebnis des Analyse-Schedulers."""
+    merkmale = {"helligkeit": analyse["helligkeit"]}
+    merkmale.update(analyse["farbanteile"])
+    merkmale["segmentierungsgrad"] = analyse["segmentierung"][0]
+    merkmale["frequenz_index"] = analyse["frequenz"][0]
+    merkmale["farbharmonie"] = analyse["farbharmonie"][0]
+    merkmale["farbschwerpunkt_index"] = analyse["farbschwerpunkt"][0]
+    merkmale["bildrausch_index"], merkmale["bildrausch_varianz"] = analyse["bildrauschen"]
+    return merkmale
+
+def merkmalsvektor(merkmale):
+    """Dict oder Folge von Kennwerten → float32-Vektor in der Reihenfolge von MERKMALE."""
+    if isinstance(merkmale, dict):
+        merkmale = [merkmale.get(name, 0.0) for name in MERKMALE]
+    return np.asarray(merkmale, dtype=np.float32)
+
+def lade_trainingsdaten(csv_pfad):
+    """Merkmalsmatrix und CLIP-Genres aller Zeilen einer Feature-CSV (main_analyseArchiv --clip), die ein Genre haben."""
+    merkmale, genres = [], []
+    with open(csv_pfad, newline="", encoding="utf-8") as f:
+        for zeile in csv.DictReader(f):
+            if not zeile.get("genre"):
+                continue
+            try:
+                merkmale.append([float(zeile[name]) for name in MERKMALE])
+                genres.append(int(float(zeile["genre"])))
+            except (KeyError, ValueError):
+                continue
+    return np.array(merkmale, dtype=np.float32).reshape(-1, len(MERKMALE)), np.array(genres, dtype=np.int64)
+
+# ---------------------- Modell ---------------------- #
+class GenreFallback:
+    """
+    Günstiger Genre-Schätzer über die Kennwerte aus image_analysis, trainiert auf CLIP-Genres des Archivs.
+    art="knn": gewichtete Abstimmung der k nächsten Archivbilder; art="linear": multinomiale logistische Regression.
+    Beide arbeiten auf standardisierten Merkmalen und brauchen pro Bild deutlich unter einer Millisekunde.
+    """
+
+    def __init__(self, art="knn", k=7):
+        if art not in ARTEN:
+            raise ValueError(f"Unbekannte Fallback-Art: {art}")
+        self.art = art
+        self.k = k
+        self.genres = np.asarray(GENRE_WERTE, dtype=np.int64)
+        self.mittel = None
+        self.streuung = None
+        self._punkte = None  # knn: standardisierte Trainingsmerkmale
+        self._klassen = None  # knn: Genre-Index jedes Trainingspunkts
+        self._gewichte = None  # linear: (Merkmale + 1) x Genres
+
+        # Laufende Übereinstimmung mit CLIP im Betrieb
+        self.vergleiche = 0
+        self.uebereinstimmungen = 0
+        self._sperre = threading.Lock()
+
+    @property
+    def trainiert(self):
+        return self.mittel is not None
+
+    def trainiere(self, merkmale, genres, epochen=500, lernrate=0.5, regularisierung=1e-3):
+        merkmale = np.asarray(merkmale, dtype=np.float32)
+        klassen = np.searchsorted(self.genres, genres)
+        if len(merkmale) == 0 or np.any(self.genres[np.minimum(klassen, len(self.genres) - 1)] != genres):
+            raise ValueError("Trainingsdaten leer oder Genre außerhalb von GENRE_WERTE")
+
+        self.mittel = merkmale.mean(axis=0)
+        self.streuung = merkmale.std(axis=0) + 1e-6
+        z = self._standardisiert(merkmale)
+
+        if self.art == "knn":
+            self._punkte, self._klassen = z, klassen
+            return self
+
+        # Softmax-Regression mit vollem Gradientenabstieg – bei wenigen tausend Zeilen in Sekundenbruchteilen
+        x = np.hstack([z, np.ones((len(z), 1), dtype=np.float32)])
+        ziel = np.eye(len(self.genres), dtype=np.float32)[klassen]
+        self._gewichte = np.zeros((x.shape[1], len(self.genres)), dtype=np.float32)
+        for _ in range(epochen):
+            p = _softmax(x @ self._gewichte)
+            gradient = x.T @ (p - ziel) / len(x) + regularisierung * self._gewichte
+            self._gewichte -= lernrate * gradient
+        return self
+
+    def _standardisiert(self, merkmale):
+        return (merkmale - self.mittel) / self.streuung
+
+    def wahrscheinlichkeiten(self, merkmale):
+        """Genre-Wahrscheinlichkeiten (Reihenfolge von self.genres) für eine Matrix von Merkmalsvektoren."""
+        z = self._standardisiert(np.atleast_2d(np.asarray(merkmale, dtype=np.float32)))
+        if self.art == "linear":
+            return _softmax(np.hstack([z, np.ones((len(z), 1), dtype=np.float32)]) @ self._gewichte)
+
+        # |a - b|² = |a|² - 2 a·b + |b|², nur die k kleinsten Abstände werden sortiert
+        abstand = np.sum(z**2, axis=1, keepdims=True) - 2.0 * (z @ self._punkte.T) + np.sum(self._punkte**2, axis=1)
+        k = min(self.k, len(self._punkte))
+        nachbarn = np.argpartition(abstand, k - 1, axis=1)[:, :k]
+        gewicht = 1.0 / (np.sqrt(np.maximum(np.take_along_axis(abstand, nachbarn, axis=1), 0.0)) + 1e-3)
+        stimmen = np.zeros((len(z), len(self.genres)), dtype=np.float32)
+        np.add.at(stimmen, (np.arange(len(z))[:, None], self._klassen[nachbarn]), gewicht)
+        return stimmen / stimmen.sum(axis=1, keepdims=True)
+
+    def vorhersage(self, merkmale):
+        """(Genre, Sicherheit) für ein Bild (Merkmals-Dict oder -Vektor); ohne Training das neutrale Genre."""
+        if not self.trainiert:
+            return NEUTRALES_GENRE, 0.0
+        p = self.wahrscheinlichkeiten(merkmalsvektor(merkmale))[0]
+        beste = int(np.argmax(p))
+        return int(self.genres[beste]), float(p[beste])
+
+    def notiere_clip(self, fallback_genre, clip_genre):
+        """Vergleicht die eigene Vorhersage mit dem CLIP-Genre derselben Aufnahme; gibt die laufende Übereinstimmung zurück."""
+        with self._sperre:
+            self.vergleiche += 1
+            self.uebereinstimmungen += int(fallback_genre == clip_genre)
+            return self.uebereinstimmungen / self.vergleiche
+
+    # ---------------------- Speichern ---------------------- #
+    def speichern(self, pfad=STANDARD_MODELL):
+        os.makedirs(os.path.dirname(os.path.abspath(pfad)), exist_ok=True)
+        daten = {"art": self.art, "k": self.k, "genres": self.genres, "merkmale": np.array(MERKMALE),
+                 "analyse_version": ANALYSE_VERSION, "mittel": self.mittel, "streuung": self.streuung}
+        if self.art == "knn":
+            daten.update(punkte=self._punkte, klassen=self._klassen)
+        else:
+            daten.update(gewichte=self._gewichte)
+        np.savez(pfad, **daten)
+
+    @classmethod
+    def laden(cls, pfad=STANDARD_MODELL):
+        """
+        Gespeichertes Modell oder None, falls keines existiert oder Merkmale bzw. ANALYSE_VERSION nicht mehr passen.
+        Modelle ohne gespeicherte Version stammen von vor der Prüfung und beruhen auf unveränderten Kennwerten.
+        """
+        if not os.path.exists(pfad):
+            return None
+        daten = np.load(pfad)
+        if list(daten["merkmale"]) != MERKMALE:
+            print(f"⚠️ Genre-Fallback passt nicht zu den aktuellen Kennwerten – neu trainieren: {pfad}")
+            return None
+        if "analyse_version" in daten and int(daten["analyse_version"]) != ANALYSE_VERSION:
+            print(f"⚠️ Genre-Fallback wurde mit ANALYSE_VERSION {int(daten['analyse_version'])} trainiert "
+                  f"(aktuell {ANALYSE_VERSION}) – neu trainieren: {pfad}")
+            return None
+        modell = cls(str(daten["art"]), int(daten["k"]))
+        modell.genres, modell.mittel, modell.streuung = daten["genres"], daten["mittel"], daten["streuung"]
+        if modell.art == "knn":
+            modell._punkte, modell._klassen = daten["punkte"], daten["klassen"]
+        else:
+            modell._gewichte = daten["gewichte"]
+        return modell
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    e = np.exp(logits)
+    return e / e.sum(axis=1, keepdims=True)
+
+# ---------------------- Bewertung ---------------------- #
+def bewerte(merkmale, genres, art="knn", k=7, test_anteil=0.2, rng=None):
+    """
+    Trainiert auf (1 - test_anteil) der Zeilen und misst auf dem Rest die Übereinstimmung mit CLIP
+    (gesamt und pro Genre) sowie die Latenz einer Einzelvorhersage. Gibt ein Dict mit den Werten zurück.
+    """
+    if rng is None:
+        rng = np.random.default_rng(0)
+    reihenfolge = rng.permutation(len(genres))
+    anzahl_test = max(1, int(len(genres) * test_anteil))
+    test, training = reihenfolge[:anzahl_test], reihenfolge[anzahl_test:]
+
+    modell = GenreFallback(art, k).trainiere(merkmale[training], genres[training])
+    vorhersagen = modell.genres[np.argmax(modell.wahrscheinlichkeiten(merkmale[test]), axis=1)]
+    uebereinstimmung = float(np.mean(vorhersagen == genres[test]))
+
+    latenzen = []
+    for zeile in merkmale[test[:200]]:
+        start = time.perf_counter()
+        modell.vorhersage(zeile)
+        latenzen.append((time.perf_counter() - start) * 1000)
+    latenz = float(np.median(latenzen))
+
+    # Vergleichswert: immer das häufigste Trainings-Genre tippen
+    mehrheit = float(np.mean(genres[test] == np.bincount(genres[training]).argmax()))
+    print(f"{art:<6} | Übereinstimmung mit CLIP: {uebereinstimmung:6.1%} (Mehrheitsgenre: {mehrheit:.1%}) | "
+          f"{latenz:.3f} ms/Bild | {len(training)} Training / {len(test)} Test")
+    pro_genre = {}
+    for genre in modell.genres:
+        maske = genres[test] == genre
+        if maske.any():
+            pro_genre[int(genre)] = float(np.mean(vorhersagen[maske] == genre))
+            print(f"    Genre {genre}: {pro_genre[int(genre)]:6.1%} von {int(maske.sum())}")
+    return {"uebereinstimmung": uebereinstimmung, "mehrheit": mehrheit, "latenz_ms": latenz, "pro_genre": pro_genre}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genre-Fallback aus den Kennwerten trainieren (Labels: CLIP-Genre der Feature-CSV)")
+    parser.add_argument("csv", nargs="?", default=os.path.join("captured_images", "tests", "features.csv"),
+                        help="Feature-CSV von python -m analysen.main_analyseArchiv --clip")
+    parser.add_argument("--art", choices=ARTEN, default="knn")
+    parser.add_argument("-k", type=int, default=7, help="Nachbarn für knn")
+    parser.add_argument("--modell", default=STANDARD_MODELL, help="Zieldatei des trainierten Modells")
+    argumente = parser.parse_args()
+
+    merkmale, genres = lade_trainingsdaten(argumente.csv)
+    if len(genres) < 10:
+        print("❌ Zu wenige Zeilen mit CLIP-Genre (mit --clip analysieren):", argumente.csv)
+    else:
+        for art in ARTEN:
+            bewerte(merkmale, genres, art, argumente.k)
+        GenreFallback(argumente.art, argumente.k).trainiere(merkmale, genres).speichern(argumente.modell)
+        print(f"✅ Genre-Fallback ({argumente.art}, {len(genres)} Bilder) gespeichert: {argumente.modell}")
@@ -10,81 +10,113 @@
 
 import cv2
 import numpy as np
+import time
+from functools import lru_cache
+
+from analysen.analysis_context import als_kontext
+from analysen.clustering import minibatch_kmeans, naechste_zentren, stratifizierte_stichprobe
+
+# Bei jeder Änderung an einer Kennwert-Berechnung erhöhen – alte Einträge im Feature-Cache gelten dann nicht mehr
+ANALYSE_VERSION = 2
 
 # ---------------------- Helligkeit ---------------------- #
 def berechne_durchschnittshelligkeit(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    return np.mean(gray)
+    return np.mean(als_kontext(image).gray)
 
 # ---------------------- Farbanteile ---------------------- #
+FARBKLASSEN = ("rot", "grün", "blau", "gelb", "weiß", "schwarz")
+_KLASSE_IGNORIERT = len(FARBKLASSEN)  # Pixel ohne eindeutige Zuordnung
+
+@lru_cache(maxsize=4)
+def farbklassen_lut(thresholdWhite, thresholdBlack):
+    """
+    Lookup-Tabelle über alle 256³ BGR-Farben → Index in FARBKLASSEN.
+    Index der Tabelle: (b << 16) | (g << 8) | r. Wird pro Threshold-Paar einmal gebaut (16 MB).
+    """
+    lut = np.empty((256, 256, 256), dtype=np.uint8)
+    g, r = np.meshgrid(np.arange(256, dtype=np.int16), np.arange(256, dtype=np.int16), indexing="ij")
+
+    # Ebene für Ebene (Blaukanal) aufbauen, damit der Speicherbedarf klein bleibt
+    for b in range(256):
+        maximum = np.maximum(np.maximum(r, g), b)
+        minimum = np.minimum(np.minimum(r, g), b)
+
+        # Gleiche Reihenfolge der Regeln wie in der ursprünglichen Pixel-Schleife
+        klasse = np.full(r.shape, _KLASSE_IGNORIERT, dtype=np.uint8)
+        klasse[(r > g) & (r > b)] = 0                                   # rot
+        klasse[(b > r) & (b > g)] = 2                                   # blau
+        klasse[(g > r) & (g > b)] = 1                                   # grün
+        klasse[(np.abs(r - g) < 65) & (b < np.minimum(r, g))] = 3       # gelb
+        klasse[minimum > 255 - thresholdWhite] = 4                      # weiß
+        klasse[maximum < thresholdBlack] = 5                            # schwarz
+        lut[b] = klasse
+
+    return lut.reshape(-1)
+
 def berechne_farbanteile(image, thresholdWhite=75, thresholdBlack=25):
     """
     Bestimmt den Anteil von Rot, Grün, Blau, Gelb, Weiß und Schwarz im Bild.
     Threshold: Empfindlichkeit für Schwarz und Weiß (0–255).
+    Jeder Pixel wird über die Lookup-Tabelle klassifiziert, gezählt wird mit np.bincount.
     """
+    image = als_kontext(image).bild
     h, w, _ = image.shape
     total_pixels = h * w
 
-    # Bild zu float konvertieren
-    img = image.astype(np.float32)
-
-    # Zähler für Farben
-    farben = {
-        "rot": 0,
-        "grün": 0,
-        "blau": 0,
-        "gelb": 0,
-        "weiß": 0,
-        "schwarz": 0
-    }
-
-    for row in img:
-        for pixel in row:
-            b, g, r = pixel
-
-            # Weiß- und Schwarz-Erkennung
-            if max(r, g, b) < thresholdBlack:
-                farben["schwarz"] += 1
-            elif min(r, g, b) > 255 - thresholdWhite:
-                farben["weiß"] += 1
-            else:
-                # Farberkennung: max-Kanal bestimmt Grundfarbe
-                if abs(r - g) < 65 and b < min(r, g):
-                    farben["gelb"] += 1
-                elif g > r and g > b:
-                    farben["grün"] += 1
-                elif b > r and b > g:
-                    farben["blau"] += 1
-                elif r > g and r > b:
-                    farben["rot"] += 1
-                else:
-                    # Wenn nichts klar zugeordnet: ignorieren
-                    pass
+    lut = farbklassen_lut(thresholdWhite, thresholdBlack)
+
+    # BGR-Pixel → LUT-Index
+    pixels = image.reshape(-1, 3)
+    index = pixels[:, 0].astype(np.int32) << 16
+    index |= pixels[:, 1].astype(np.int32) << 8
+    index |= pixels[:, 2]
+
+    counts = np.bincount(lut[index], minlength=len(FARBKLASSEN) + 1)
 
     # Prozentuale Anteile berechnen
-    farbanteile = {farbe: count / total_pixels for farbe, count in farben.items()}
+    farbanteile = {farbe: int(counts[i]) / total_pixels for i, farbe in enumerate(FARBKLASSEN)}
     return farbanteile
 
 # ------------------------- Segmentierungsgrad ------------------------- #
-def berechne_segmentierungsgrad(image, anzahl_cluster=20, farbschwelle=25):
-    lab = cv2.cvtColor(image, cv2.COLOR_BGR2Lab)
-    pixels = lab.reshape((-1, 3))
+# Zentren der letzten schnellen Segmentierung pro Clusteranzahl (Warmstart für die nächste Aufnahme)
+_segmentierung_warmstart = {}
 
-    a = pixels[:, 1].astype(np.int16) - 128
-    b = pixels[:, 2].astype(np.int16) - 128
-    chroma = np.sqrt(a**2 + b**2)
+def berechne_segmentierungsgrad(image, anzahl_cluster=20, farbschwelle=25, modus="exakt", stichprobe=4096, mit_visualisierung=True):
+    """
+    modus="exakt":   cv2.kmeans auf allen bunten Pixeln (100 Iterationen, 10 Neustarts).
+    modus="schnell": stratifizierte Stichprobe (stichprobe Pixel) + Mini-Batch-KMeans mit Warmstart
+                     aus der vorherigen Aufnahme, danach ein Zuordnungsdurchlauf über alle bunten Pixel.
+    mit_visualisierung=False: nur der Wert, statt des Clusterbildes wird None zurückgegeben.
+    """
+    kontext = als_kontext(image)
+    lab = kontext.lab
+    pixels = lab.reshape((-1, 3))
 
-    mask = chroma > farbschwelle
+    mask = kontext.chroma_maske(farbschwelle).reshape(-1)
     relevante_pixel = pixels[mask]
 
     if len(relevante_pixel) < anzahl_cluster:
-        dummy_bild = np.zeros_like(image)  # oder image.copy(), wenn lieber das Original
+        dummy_bild = np.zeros_like(kontext.bild) if mit_visualisierung else None  # oder image.copy(), wenn lieber das Original
         return 0.0, dummy_bild
 
     relevante_pixel = relevante_pixel.astype(np.float32)
 
-    kriterien = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 1.0)
-    _, labels, zentren = cv2.kmeans(relevante_pixel, anzahl_cluster, None, kriterien, 10, cv2.KMEANS_RANDOM_CENTERS) # type: ignore
+    if modus == "schnell":
+        auswahl = stratifizierte_stichprobe(len(relevante_pixel), stichprobe)
+        zentren = minibatch_kmeans(relevante_pixel[auswahl], anzahl_cluster, _segmentierung_warmstart.get(anzahl_cluster))
+        _segmentierung_warmstart[anzahl_cluster] = zentren
+        labels = naechste_zentren(relevante_pixel, zentren)
+    elif modus == "exakt":
+        kriterien = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 1.0)
+        _, labels, zentren = cv2.kmeans(relevante_pixel, anzahl_cluster, None, kriterien, 10, cv2.KMEANS_RANDOM_CENTERS) # type: ignore
+    else:
+        raise ValueError(f"Unbekannter Segmentierungs-Modus: {modus}")
+
+    _, counts = np.unique(labels, return_counts=True)
+    segmentierungsgrad = counts.std() / counts.mean()
+
+    if not mit_visualisierung:
+        return segmentierungsgrad, None
 
     clustered = np.zeros_like(pixels)
     clustered_pixels = zentren[labels.flatten().astype(int)]
@@ -93,79 +125,145 @@ def berechne_segmentierungsgrad(image, anzahl_cluster=20, farbschwelle=25):
 
     clustered_bgr = cv2.cvtColor(clustered, cv2.COLOR_Lab2BGR)
 
-    _, counts = np.unique(labels, return_counts=True)
-    segmentierungsgrad = counts.std() / counts.mean()
-
     return segmentierungsgrad, clustered_bgr
 
+def vergleiche_segmentierungsmodi(image, anzahl_cluster=20, farbschwelle=25, stichproben=(1024, 4096, 16384)):
+    """
+    Misst Laufzeit und Abweichung des schnellen Modus gegenüber dem exakten Modus,
+    um einen Kompromiss zwischen Latenz und Genauigkeit zu wählen.
+    Gibt eine Liste von Dicts zurück (erste Zeile: exakter Modus als Referenz).
+    """
+    kontext = als_kontext(image)
+    kontext.chroma_maske(farbschwelle)  # Lab/Maske vorab berechnen, damit nur das Clustering gemessen wird
+
+    start = time.perf_counter()
+    referenz, _ = berechne_segmentierungsgrad(kontext, anzahl_cluster, farbschwelle, "exakt", mit_visualisierung=False)
+    ergebnisse = [{"modus": "exakt", "stichprobe": None, "segmentierungsgrad": referenz,
+                   "abweichung": 0.0, "dauer_ms": (time.perf_counter() - start) * 1000}]
+
+    for stichprobe in stichproben:
+        _segmentierung_warmstart.pop(anzahl_cluster, None)  # Kaltstart, damit Durchläufe vergleichbar bleiben
+        start = time.perf_counter()
+        grad, _ = berechne_segmentierungsgrad(kontext, anzahl_cluster, farbschwelle, "schnell", stichprobe, mit_visualisierung=False)
+        ergebnisse.append({"modus": "schnell", "stichprobe": stichprobe, "segmentierungsgrad": grad,
+                           "abweichung": abs(grad - referenz), "dauer_ms": (time.perf_counter() - start) * 1000})
+
+    for e in ergebnisse:
+        print(f"{e['modus']:>8} | Stichprobe: {str(e['stichprobe']):>6} | Grad: {e['segmentierungsgrad']:.3f} "
+              f"| Abweichung: {e['abweichung']:.3f} | {e['dauer_ms']:.1f} ms")
+    return ergebnisse
+
 # ---------------------- Bildfrequenzanalyse ---------------------- #
-def berechne_frequenz_index(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    f = np.fft.fft2(gray)
-    fshift = np.fft.fftshift(f)
-    magnitude_spectrum = np.abs(fshift)
-    magnitude_spectrum = np.log1p(magnitude_spectrum)  # Log-Skalierung
-
-    # Berechnung für Projektion
-    dft = cv2.dft(np.float32(gray), flags=cv2.DFT_COMPLEX_OUTPUT) # type: ignore
-    dft_shift = np.fft.fftshift(dft)
-    magnitude = cv2.magnitude(dft_shift[:, :, 0], dft_shift[:, :, 1])
-    spectrum = np.log1p(magnitude)
-
-    mitte = magnitude_spectrum.shape[0] // 2
-    radius = mitte // 4
-    y, x = np.ogrid[:magnitude_spectrum.shape[0], :magnitude_spectrum.shape[1]]
-    mask = (x - mitte)**2 + (y - mitte)**2 <= radius**2
-
-    low_freq = np.sum(magnitude_spectrum[mask])
-    high_freq = np.sum(magnitude_spectrum[~mask])
-
-    if low_freq == 0:
-        dummy_spectrum = np.zeros_like(gray, dtype=np.float32)
+def berechne_frequenz_index(image, mit_visualisierung=True):
+    """
+    Frequenz-Index und Log-Spektrum für die Projektion – beides aus einer einzigen rfft2
+    (Masken und Bin-Indizes werden pro Bildgröße zwischengespeichert).
+    mit_visualisierung=False: statt des Spektrums wird None zurückgegeben.
+    """
+    kontext = als_kontext(image)
+    spektrum = kontext.spektrum
+
+    freq_index = spektrum.frequenz_index()
+    if not mit_visualisierung:
+        return freq_index, None
+
+    if spektrum.ohne_tiefe_frequenzen():
+        dummy_spectrum = np.zeros_like(kontext.gray, dtype=np.float32)
         return 0, dummy_spectrum
 
-    freq_index = (high_freq ** 1.2) / (low_freq + 1e-6)
-    return freq_index, spectrum
+    return freq_index, spektrum.log_spektrum()
+
+def berechne_frequenzspektrum(image, anzahl_baender=8):
+    """Radial gemitteltes Leistungsspektrum und relative Bandenergien (gleiche FFT wie der Frequenz-Index)."""
+    spektrum = als_kontext(image).spektrum
+    return spektrum.radiales_leistungsspektrum(), spektrum.bandenergien(anzahl_baender)
 
 
 # --------------------------- Farbharmonie --------------------------- #
-def berechne_farbharmonie(image, anzahl_cluster=6, sättigungs_schwelle=20):
-    # Bild in HSV konvertieren
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    pixels = hsv.reshape((-1, 3))
-
-    # Nur farbige Pixel verwenden (Sättigung > Schwelle)
-    pixels = pixels[pixels[:, 1] > sättigungs_schwelle]
-    if len(pixels) < anzahl_cluster:
-        dummy_balken = np.zeros((100, 300, 3), dtype=np.uint8)
+def berechne_farbpalette(image, anzahl_cluster=6, sättigungs_schwelle=20, modus="exakt", stichprobe=4096):
+    """
+    HSV-KMeans auf den farbigen Pixeln → (Zentren, Pixel pro Zentrum) oder None bei zu wenigen Pixeln.
+    Wird im Kontext gemerkt, sodass pro Aufnahme und Parametersatz nur ein Clustering läuft.
+    modus wie bei berechne_segmentierungsgrad ("exakt" oder "schnell", ohne Warmstart).
+    """
+    kontext = als_kontext(image)
+
+    def berechnung():
+        pixels = kontext.hsv.reshape((-1, 3))
+
+        # Nur farbige Pixel verwenden (Sättigung > Schwelle)
+        pixels = pixels[kontext.saettigungs_maske(sättigungs_schwelle).reshape(-1)]
+        if len(pixels) < anzahl_cluster:
+            return None
+
+        pixels = np.float32(pixels)
+
+        if modus == "schnell":
+            auswahl = stratifizierte_stichprobe(len(pixels), stichprobe)
+            centers = minibatch_kmeans(pixels[auswahl], anzahl_cluster)
+            labels = naechste_zentren(pixels, centers)
+        elif modus == "exakt":
+            # KMeans-Clustering auf farbige Pixel
+            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 50, 0.2)
+            _, labels, centers = cv2.kmeans(
+                pixels, anzahl_cluster, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS) # type: ignore
+        else:
+            raise ValueError(f"Unbekannter Paletten-Modus: {modus}")
+
+        # Cluster-Häufigkeiten
+        counts = np.bincount(labels.flatten(), minlength=anzahl_cluster)
+        return centers, counts
+
+    return kontext.hole(("farbpalette", anzahl_cluster, sättigungs_schwelle, modus, stichprobe), berechnung)
+
+def zeichne_farbbalken(centers, counts, breite=300, hoehe=100):
+    """Balken der Palette, nach Häufigkeit sortiert – eine HSV→BGR-Konvertierung für alle Zentren."""
+    sort_idx = np.argsort(-counts)
+    sorted_counts = counts[sort_idx]
+    bgr_farben = cv2.cvtColor(centers[sort_idx].astype(np.uint8).reshape(-1, 1, 3), cv2.COLOR_HSV2BGR).reshape(-1, 3)
+
+    # Segmentbreiten wie bisher abgerundet; jedes Segment reicht inklusive bis start + breite
+    segment_breiten = (breite * sorted_counts / np.sum(counts)).astype(int)
+    starts = np.concatenate(([0], np.cumsum(segment_breiten)[:-1]))
+    ende = min(starts[-1] + segment_breiten[-1], breite - 1)
+
+    # Pro Spalte gewinnt das zuletzt gezeichnete Segment, das dort beginnt
+    spalten = np.arange(ende + 1)
+    besitzer = np.searchsorted(starts, spalten, side="right") - 1
+
+    farbbalken = np.zeros((hoehe, breite, 3), dtype=np.uint8)
+    farbbalken[:, :ende + 1] = bgr_farben[besitzer]
+    return farbbalken
+
+def berechne_farbharmonie(image, anzahl_cluster=6, sättigungs_schwelle=20, palette=None, modus="exakt", mit_visualisierung=True):
+    """
+    Harmonie = 1 - gewichteter mittlerer HS-Abstand aller Clusterpaare.
+    palette: optional (Zentren, Häufigkeiten) einer bereits berechneten HSV-Palette,
+    sonst wird die (im Kontext gemerkte) Palette aus berechne_farbpalette verwendet.
+    mit_visualisierung=False: statt des Farbbalkens wird None zurückgegeben.
+    """
+    if palette is None:
+        palette = berechne_farbpalette(image, anzahl_cluster, sättigungs_schwelle, modus)
+    if palette is None:
+        dummy_balken = np.zeros((100, 300, 3), dtype=np.uint8) if mit_visualisierung else None
         return 0.0, dummy_balken
 
-    pixels = np.float32(pixels)
-
-    # KMeans-Clustering auf farbige Pixel
-    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 50, 0.2)
-    _, labels, centers = cv2.kmeans(
-        pixels, anzahl_cluster, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS) # type: ignore
-
-    # Cluster-Häufigkeiten
-    counts = np.bincount(labels.flatten())
-    total_weight = 0
-    total_distance = 0
-
-    # HS-Abstand zwischen allen Clusterpaaren berechnen (gewichtet)
-    for i in range(len(centers)):
-        for j in range(i + 1, len(centers)):
-            h1, s1 = centers[i][0], centers[i][1]
-            h2, s2 = centers[j][0], centers[j][1]
-            dh = min(abs(h1 - h2), 180 - abs(h1 - h2)) / 180.0
-            ds = abs(s1 - s2) / 255.0
-            dist = np.sqrt(dh**2 + ds**2)
-            weight = counts[i] * counts[j]
-            total_distance += dist * weight
-            total_weight += weight
+    centers, counts = palette
+    zentren = np.asarray(centers, dtype=np.float64)
+
+    # HS-Abstand zwischen allen Clusterpaaren als Matrix (gewichtet mit counts[i] * counts[j])
+    dh = np.abs(zentren[:, None, 0] - zentren[None, :, 0])
+    dh = np.minimum(dh, 180 - dh) / 180.0
+    ds = np.abs(zentren[:, None, 1] - zentren[None, :, 1]) / 255.0
+    dist = np.sqrt(dh**2 + ds**2)
+    gewichte = np.outer(counts, counts).astype(np.float64)
+
+    paare = np.triu_indices(len(zentren), k=1)
+    total_weight = gewichte[paare].sum()
+    total_distance = (dist[paare] * gewichte[paare]).sum()
 
     if total_weight == 0:
-        dummy_balken = np.zeros((100, 300, 3), dtype=np.uint8)
+        dummy_balken = np.zeros((100, 300, 3), dtype=np.uint8) if mit_visualisierung else None
         return 0.0, dummy_balken
 
     durchschnittliche_distanz = total_distance / total_weight
@@ -175,28 +273,95 @@ def berechne_farbharmonie(image, anzahl_cluster=6, sättigungs_schwelle=20):
     harmonie_index = max(0.0, min(1.0, harmonie_index))
 
     # Balken-Visualisierung der Farben
-    sort_idx = np.argsort(-counts)
-    sorted_centers = centers[sort_idx]
-    sorted_counts = counts[sort_idx]
-    farbbalken = np.zeros((100, 300, 3), dtype=np.uint8)
-    start_x = 0
-
-    for i in range(len(sorted_centers)):
-        color = np.uint8([[sorted_centers[i]]]) # type: ignore
-        bgr_color = cv2.cvtColor(color, cv2.COLOR_HSV2BGR)[0][0].tolist() # type: ignore
-        breite = int(300 * sorted_counts[i] / np.sum(counts))
-        cv2.rectangle(farbbalken, (start_x, 0), (start_x + breite, 100), bgr_color, -1)
-        start_x += breite
+    farbbalken = zeichne_farbbalken(centers, counts) if mit_visualisierung else None
 
     return harmonie_index, farbbalken
 
+# ---------------------- Gemeinsame Palette ---------------------- #
+def berechne_gemeinsame_palette(image, anzahl_cluster=20, farbschwelle=25, sättigungs_schwelle=20, modus="exakt", stichprobe=4096):
+    """
+    Ein Lab-KMeans für Segmentierung und Farbharmonie statt zweier getrennter Clusterings.
+    Geclustert werden alle Pixel, die bunt (Chroma > farbschwelle) oder gesättigt (S > sättigungs_schwelle) sind;
+    die Segmentierung zählt danach nur die bunten, die Farbharmonie nur die gesättigten Pixel pro Cluster.
+    Gibt ein Dict (zentren, labels, bunt, gesaettigt, maske) oder None bei zu wenigen Pixeln zurück, im Kontext gemerkt.
+    """
+    kontext = als_kontext(image)
+
+    def berechnung():
+        bunt = kontext.chroma_maske(farbschwelle).reshape(-1)
+        gesaettigt = kontext.saettigungs_maske(sättigungs_schwelle).reshape(-1)
+        maske = bunt | gesaettigt
+        pixels = kontext.lab.reshape((-1, 3))[maske].astype(np.float32)
+        if len(pixels) < anzahl_cluster:
+            return None
+
+        if modus == "schnell":
+            auswahl = stratifizierte_stichprobe(len(pixels), stichprobe)
+            zentren = minibatch_kmeans(pixels[auswahl], anzahl_cluster)
+            labels = naechste_zentren(pixels, zentren)
+        elif modus == "exakt":
+            kriterien = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 1.0)
+            _, labels, zentren = cv2.kmeans(pixels, anzahl_cluster, None, kriterien, 10, cv2.KMEANS_RANDOM_CENTERS) # type: ignore
+        else:
+            raise ValueError(f"Unbekannter Paletten-Modus: {modus}")
+
+        return {"zentren": zentren, "labels": labels.reshape(-1), "bunt": bunt[maske], "gesaettigt": gesaettigt[maske], "maske": maske}
+
+    return kontext.hole(("gemeinsame_palette", anzahl_cluster, farbschwelle, sättigungs_schwelle, modus, stichprobe), berechnung)
+
+def segmentierungsgrad_aus_palette(image, palette, anzahl_cluster=20, mit_visualisierung=True):
+    """Segmentierungsgrad (wie berechne_segmentierungsgrad) aus den bunten Pixeln der gemeinsamen Palette."""
+    kontext = als_kontext(image)
+    if palette is None or np.count_nonzero(palette["bunt"]) < anzahl_cluster:
+        return 0.0, (np.zeros_like(kontext.bild) if mit_visualisierung else None)
+
+    labels = palette["labels"][palette["bunt"]]
+    counts = np.bincount(labels, minlength=len(palette["zentren"]))
+    counts = counts[counts > 0]
+    segmentierungsgrad = counts.std() / counts.mean()
+    if not mit_visualisierung:
+        return segmentierungsgrad, None
+
+    bunt = np.zeros(palette["maske"].shape, dtype=bool)
+    bunt[palette["maske"]] = palette["bunt"]
+    clustered = np.zeros((len(bunt), 3), dtype=np.uint8)
+    clustered[bunt] = palette["zentren"][labels]
+    return segmentierungsgrad, cv2.cvtColor(clustered.reshape(kontext.bild.shape), cv2.COLOR_Lab2BGR)
+
+def farbpalette_aus_palette(palette, anzahl_cluster=20):
+    """HSV-Zentren und Anzahl gesättigter Pixel pro Cluster der gemeinsamen Palette (für berechne_farbharmonie) oder None."""
+    if palette is None or np.count_nonzero(palette["gesaettigt"]) < anzahl_cluster:
+        return None
+    lab = np.clip(np.rint(palette["zentren"]), 0, 255).astype(np.uint8).reshape(-1, 1, 3)
+    zentren = cv2.cvtColor(cv2.cvtColor(lab, cv2.COLOR_Lab2BGR), cv2.COLOR_BGR2HSV).reshape(-1, 3).astype(np.float32)
+    counts = np.bincount(palette["labels"][palette["gesaettigt"]], minlength=len(zentren))
+    return zentren, counts
+
+def vergleiche_gemeinsame_palette(image, anzahl_cluster=20, modus="exakt"):
+    """Segmentierung und Farbharmonie getrennt geclustert gegenüber der gemeinsamen Palette (Wert und Laufzeit)."""
+    def messen(funktion):
+        start = time.perf_counter()
+        wert = funktion()
+        return wert, (time.perf_counter() - start) * 1000
+
+    kontext = als_kontext(image)
+    kontext.chroma_maske(25), kontext.saettigungs_maske(20)  # Farbräume und Masken vorab, gemessen wird das Clustering
+    segmentierung, segmentierung_ms = messen(lambda: berechne_segmentierungsgrad(kontext, anzahl_cluster, 25, modus, mit_visualisierung=False)[0])
+    harmonie, harmonie_ms = messen(lambda: berechne_farbharmonie(kontext, anzahl_cluster, 20, modus=modus, mit_visualisierung=False)[0])
+    palette, palette_ms = messen(lambda: berechne_gemeinsame_palette(kontext, anzahl_cluster, 25, 20, modus))
+    gemeinsam_segmentierung = segmentierungsgrad_aus_palette(kontext, palette, anzahl_cluster, mit_visualisierung=False)[0]
+    gemeinsam_harmonie = berechne_farbharmonie(None, palette=farbpalette_aus_palette(palette, anzahl_cluster), mit_visualisierung=False)[0]
+
+    print(f"Segmentierung: getrennt {segmentierung:.3f} | gemeinsam {gemeinsam_segmentierung:.3f}")
+    print(f"Farbharmonie:  getrennt {harmonie:.3f} | gemeinsam {gemeinsam_harmonie:.3f}")
+    print(f"Clustering:    getrennt {segmentierung_ms + harmonie_ms:.1f} ms → gemeinsam {palette_ms:.1f} ms")
+    return {"segmentierung": (segmentierung, gemeinsam_segmentierung), "farbharmonie": (harmonie, gemeinsam_harmonie),
+            "getrennt_ms": segmentierung_ms + harmonie_ms, "gemeinsam_ms": palette_ms}
+
 # ------------------------- Bildrausch-Index -------------------------- #
 def berechne_bildrausch_index(image):
-    # In Graustufen konvertieren
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
-    # Laplace-Operator anwenden
-    laplacian = cv2.Laplacian(gray, cv2.CV_64F)
+    # Laplace-Operator auf dem Graustufenbild (aus dem Kontext)
+    laplacian = als_kontext(image).laplacian
 
     # Varianz der Laplace-Antwort als Maß für Bildrauschen/Unruhe
     varianz = np.var(laplacian)
@@ -209,20 +374,23 @@ def berechne_bildrausch_index(image):
     return index, varianz
 
 # ------------------------- Farbschwerpunkt-Index -------------------------- #
-def berechne_farbschwerpunkt_index(image, sättigungs_schwelle=20):
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    pixels = hsv.reshape((-1, 3))
+def berechne_farbschwerpunkt_index(image, sättigungs_schwelle=20, mit_visualisierung=True):
+    """mit_visualisierung=False: statt des Pfeil-Diagramms wird None zurückgegeben."""
+    kontext = als_kontext(image)
+    pixels = kontext.hsv.reshape((-1, 3))
 
     # Vorläufiger Schwerpunkt auf allen Pixeln (wird ggf. bei Fehlerfall gebraucht)
     farbschwerpunkt = np.mean(pixels, axis=0)
 
     # Nur gesättigte Farben berücksichtigen
-    pixels = pixels[pixels[:, 1] > sättigungs_schwelle]
+    pixels = pixels[kontext.saettigungs_maske(sättigungs_schwelle).reshape(-1)]
 
     if len(pixels) == 0:
-        visualisierung = np.ones((300, 300, 3), dtype=np.uint8) * 255
+        visualisierung = np.ones((300, 300, 3), dtype=np.uint8) * 255 if mit_visualisierung else None
         return 0.0, farbschwerpunkt, visualisierung
 
+    # OpenCV-Hue 0–179 → Grad wie bisher in uint8: Werte ab 128 laufen über (h*2 − 256). Trainierte Fallback-Modelle
+    # und gespeicherte CSVs beruhen auf diesem Kennwert; eine Korrektur braucht eine neue ANALYSE_VERSION.
     hue = pixels[:, 0] * 2
     hue_rad = np.deg2rad(hue)
     x = np.cos(hue_rad)
@@ -233,17 +401,25 @@ def berechne_farbschwerpunkt_index(image, sättigungs_schwelle=20):
     schwerpunkt_index = 1.0 - konzentration
     schwerpunkt_index = max(0.0, min(1.0, schwerpunkt_index))
 
+    if not mit_visualisierung:
+        return schwerpunkt_index, farbschwerpunkt, None
+
+    visualisierung = zeichne_farbschwerpunkt(hue_rad[::len(hue_rad)//500 + 1], mean_x, mean_y)
+
+    return schwerpunkt_index, farbschwerpunkt, visualisierung
+
+def zeichne_farbschwerpunkt(hue_rad, mean_x, mean_y):
+    """Farbkreis mit einer Linie pro (Stichproben-)Farbton und dem mittleren Farbvektor als Pfeil."""
     visualisierung = np.ones((300, 300, 3), dtype=np.uint8) * 255
     center = (150, 150)
     scale = 100
-    for angle in hue_rad[::len(hue_rad)//500 + 1]:
+    for angle in hue_rad:
         end = (int(center[0] + scale * np.cos(angle)), int(center[1] + scale * np.sin(angle)))
         cv2.line(visualisierung, center, end, (200, 200, 200), 1)
 
     end_mean = (int(center[0] + scale * mean_x), int(center[1] + scale * mean_y))
     cv2.arrowedLine(visualisierung, center, end_mean, (0, 0, 255), 2, tipLength=0.1)
     cv2.circle(visualisierung, center, scale, (0, 0, 0), 1)
-
-    return schwerpunkt_index, farbschwerpunkt, visualisierung
+    return visualisierung
 
 
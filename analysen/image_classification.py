@@ -8,89 +8,262 @@
 #------------------------------------------------------------
 
 
-import torch
-from PIL import Image
-import torchvision.transforms as T
-import clip
 import cv2
-
-# Lade das CLIP-Modell
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model, preprocess = clip.load("ViT-B/32", device=device)
+import itertools
+import numpy as np
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from analysen.feature_cache import STANDARD_PFAD, cache_schluessel
+
+CLIP_MODELL = "ViT-B/32"
+CLIP_VERSION = 3  # erhöhen, wenn sich Vorverarbeitung oder Ähnlichkeitsberechnung ändern (Feature-Cache)
+
+# Torch, CLIP und das Modell werden erst von lade_clip_im_hintergrund() geladen (siehe unten)
+torch = None
+clip = None
+Image = None
+device = None
+model = None
+preprocess = None
+
+# Bild-Encoder: "eager" (PyTorch) oder ein exportiertes CPU-Backend aus clip_backend ("torchscript", "onnx", optional int8)
+clip_backend = "eager"
+_bild_encoder = None
+
+# Vorverarbeitung: "pil" (CLIP-Referenz) oder "numpy" (OpenCV-Resize + Normierung per Lookup-Tabelle direkt aus BGR).
+# "numpy" erst als Standard, wenn die Prüfung auf echten Aufnahmen Top-3 und Genre bestätigt:
+# python -m analysen.image_classification <Bildordner> --vergleiche-vorverarbeitung
+clip_vorverarbeitung = "pil"
+VORVERARBEITUNG_SCHWELLEN = {"top3": 0.95, "genre": 0.98}  # Mindest-Übereinstimmung mit "pil"
 
 #--------------------------- Bild-KI-Analyse --------------------------------#
-# Liste von möglichen Bildbeschreibungen
-beschreibungen = [
+# Prompt-Bank: mögliche Bildbeschreibungen pro Genre (1 – 7). Jedes Genre ist ein Ensemble seiner Prompts,
+# sein Score ist der Mittelwert der Softmax-Scores dieser Prompts (siehe GENRE_MATRIX) – Genres mit vielen Prompts
+# bekommen so keinen Vorsprung.
+genre_prompts = {
     # 1 – Sehr harmonisch, ruhig, ästhetisch --> Keine Drums!
-    "blank",
-    "empty",
-    "white canvas",
+    1: ["blank", "empty", "white canvas"],
 
     # 2 – Harmonisch mit Energie --> Kick-Only
-    "minimal",
-    "basic",
-    "peaceful",
-    "harmonious",
-    "calm",
-    "soothing",
-    "balanced",
-    "relaxing",
-    "meditative",
-    "elegant",
+    2: ["minimal", "basic", "peaceful", "harmonious", "calm", "soothing", "balanced", "relaxing", "meditative", "elegant"],
 
     # 3 – Neutral, technisch, durchschnittlich --> Trap (Half-Time-Groove)
-    "average",
-    "neutral",
-    "schematic",
-    "technical",
-    "basic",
-    "unremarkable",
+    3: ["average", "neutral", "schematic", "technical", "basic", "unremarkable"],
     #"colorful composition",
 
     # 4 – Leicht unruhig, erste Dissonanz --> House
-    "vivid",
-    "expressive",
-    "dynamic",
-    "energetic",
-    "structured",
+    4: ["vivid", "expressive", "dynamic", "energetic"],
 
     # 5 – Deutlich unruhig, stressig --> Techno
-    "geometric",
-    "pattern",
-    "repetitive",
-    "dark",
+    5: ["geometric", "pattern", "repetitive", "dark"],
 
     # 6 – Unästhetisch, visuell störend --> D & B
-    "clashing",
-    "uneven",
-    "tense",
-    "chaotic sketch",
-    "disharmony",
+    6: ["clashing", "uneven", "tense", "chaotic sketch", "disharmony"],
 
     # 7 – Extrem negativ, verstörend --> Random
-    "stressful",
-    "chaotic",
-    "overwhelming",
-    "disorganized",
-
-    #"visual noise",
-    "ugly",
-    "harsh",
-    "distorted",
-    "unpleasant",
-    "painful",
-    "violent",
-    "aggressive",
-    "terrifying",
-    "destructive",
-    "angry",
-    "disturbing"
-]
-
-text_tokens = clip.tokenize(beschreibungen).to(device)
+    7: ["stressful", "chaotic", "overwhelming", "disorganized",
+        #"visual noise",
+        "ugly", "harsh", "distorted", "unpleasant", "painful",
+        "violent", "aggressive", "terrifying", "destructive", "angry", "disturbing"],
+}
 
-#----- Funktion zur KI-Klassifizierung -----#
-def klassifiziere_bild_clip(cv2_image):
+# Prompts ohne Genre-Zuordnung zählen für das neutrale Genre
+NEUTRALES_GENRE = 3
+ungemappte_prompts = ["structured"]
+
+# Vorlagen für Prompt-Ensembles: das Text-Embedding eines Prompts ist der Mittelwert über alle Vorlagen
+PROMPT_VORLAGEN = ["{}"]
+
+def kompiliere_prompt_bank(genre_prompts, ungemappte=(), neutral=NEUTRALES_GENRE):
+    """
+    Prompt-Liste (ohne Duplikate, in Reihenfolge) und Zuordnungsmatrix Prompts × Genres.
+    Ein Prompt, der in mehreren Genres steht (z. B. "basic" in 2 und 3), verteilt sein Gewicht gleichmäßig auf sie.
+    """
+    genres = sorted(genre_prompts)
+    zuordnung = {}
+    for genre in genres:
+        for prompt in genre_prompts[genre]:
+            zuordnung.setdefault(prompt, []).append(genre)
+    for prompt in ungemappte:
+        zuordnung.setdefault(prompt, [neutral])
+
+    prompts = list(zuordnung)
+    matrix = np.zeros((len(prompts), len(genres)), dtype=np.float32)
+    for zeile, prompt in enumerate(prompts):
+        for genre in zuordnung[prompt]:
+            matrix[zeile, genres.index(genre)] += 1.0 / len(zuordnung[prompt])
+    return prompts, np.array(genres), matrix
+
+beschreibungen, GENRE_WERTE, GENRE_ZUORDNUNG = kompiliere_prompt_bank(genre_prompts, ungemappte_prompts)
+# Jede Spalte durch die Prompt-Anzahl ihres Genres: Softmax-Scores × GENRE_MATRIX = mittlerer Score pro Genre
+GENRE_MATRIX = GENRE_ZUORDNUNG / GENRE_ZUORDNUNG.sum(axis=0, keepdims=True)
+
+#----- CLIP-Modell im Hintergrund laden -----#
+_laden = None
+_laden_konfiguration = None  # (backend, quantisieren), mit denen _laden gestartet wurde
+_laden_sperre = threading.Lock()
+
+def lade_clip_im_hintergrund(backend=None, quantisieren=None):
+    """
+    Startet (einmalig) das Laden von Torch und CLIP in einem Hintergrund-Thread und gibt ein Future zurück.
+    Das Future ist erfüllt, sobald Modell, Bild-Encoder (backend), Text-Embeddings und eine Probe-Inferenz fertig sind;
+    sein Ergebnis sind die Ladezeiten in ms ({"import", "modell", "backend", "aufwaermen"}).
+    Schlägt der Export des Backends fehl – auch mit ImportError, wenn für "onnx" onnxruntime nicht installiert ist –,
+    wird eine Warnung ausgegeben und CLIP läuft mit dem eager-Encoder weiter; clip_backend zeigt den tatsächlichen Encoder.
+    backend/quantisieren None: beim ersten Aufruf "eager" bzw. False, danach das bereits laufende Laden.
+    Spätere Aufrufe mit anderen Werten bekommen dasselbe Future und eine Warnung (Wechsel: setze_clip_backend).
+    """
+    global _laden, _laden_konfiguration
+    if backend == "eager" and quantisieren:
+        print("⚠️ int8-Quantisierung gibt es nur für die Backends torchscript und onnx – eager läuft unquantisiert")
+        quantisieren = False
+    with _laden_sperre:
+        if _laden is None:
+            _laden_konfiguration = (backend or "eager", bool(quantisieren) and backend not in (None, "eager"))
+            _laden = Future()
+            threading.Thread(target=_lade_clip, args=(_laden, *_laden_konfiguration), name="clip-laden", daemon=True).start()
+        else:
+            gestartet_backend, gestartet_quantisieren = _laden_konfiguration
+            if (backend is not None and backend != gestartet_backend) or (quantisieren is not None and bool(quantisieren) != gestartet_quantisieren):
+                print(f"⚠️ CLIP wird bereits mit backend={gestartet_backend}, quantisieren={gestartet_quantisieren} geladen – "
+                      f"backend={backend}, quantisieren={quantisieren} wird ignoriert (Wechsel mit setze_clip_backend)")
+    return _laden
+
+def clip_bereit():
+    return _laden is not None and _laden.done()
+
+def _warte_auf_clip():
+    # Klassifizierung vor Ende des Hintergrund-Ladens: blockiert, bis das Modell da ist
+    if model is None:
+        lade_clip_im_hintergrund().result()
+
+def _lade_clip(future, backend, quantisieren):
+    global torch, clip, Image, device, model, preprocess
+    try:
+        zeiten = {}
+        start = time.perf_counter()
+        import torch as _torch
+        import clip as _clip
+        from PIL import Image as _Image
+        torch, clip, Image = _torch, _clip, _Image
+        zeiten["import"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        geladenes_modell, preprocess = clip.load(CLIP_MODELL, device=device)
+        model = geladenes_modell
+        zeiten["modell"] = (time.perf_counter() - start) * 1000
+
+        # Export beim ersten Start dauert, danach wird die Datei aus dem Cache-Ordner geladen
+        start = time.perf_counter()
+        if backend != "eager":
+            try:
+                setze_clip_backend(backend, quantisieren)
+            except Exception as fehler:
+                print(f"⚠️ CLIP-Backend {backend}{'-int8' if quantisieren else ''} nicht verfügbar ({fehler}) – nutze eager")
+        zeiten["backend"] = (time.perf_counter() - start) * 1000
+
+        # Aufwärmen: Text-Embeddings bereitstellen und eine Probe-Inferenz, damit die erste Aufnahme nicht den Aufbau der Puffer bezahlt
+        start = time.perf_counter()
+        klassifiziere_embedding(berechne_bild_embedding(np.zeros((240, 320, 3), dtype=np.uint8)))
+        zeiten["aufwaermen"] = (time.perf_counter() - start) * 1000
+
+        future.set_result(zeiten)
+    except BaseException as fehler:
+        future.set_exception(fehler)
+
+def setze_clip_backend(backend="eager", quantisieren=False):
+    """
+    Wechselt den Bild-Encoder zur Laufzeit (siehe clip_backend.BACKENDS). Fehler werden hier nicht abgefangen:
+    ohne onnxruntime wirft "onnx" einen ImportError und der bisherige Encoder bleibt aktiv. Den Rückfall auf
+    eager übernimmt lade_clip_im_hintergrund.
+    """
+    global clip_backend, _bild_encoder, _laden_konfiguration
+    if model is None:
+        lade_clip_im_hintergrund().result()
+    if backend == "eager" and not quantisieren:
+        clip_backend, _bild_encoder = "eager", None
+        _laden_konfiguration = ("eager", False)
+        return clip_backend
+
+    from analysen.clip_backend import erstelle_bild_encoder
+    encoder = erstelle_bild_encoder(model, backend, quantisieren, CLIP_MODELL)
+    clip_backend, _bild_encoder = encoder.name, encoder
+    _laden_konfiguration = (backend, bool(quantisieren))
+    return clip_backend
+
+#----- Text-Embeddings der Prompts -----#
+# Einmal pro (Modell, Prompt-Liste) berechnet, im Speicher gehalten und als .npy im Cache-Ordner abgelegt
+TEXT_CACHE_ORDNER = os.path.dirname(STANDARD_PFAD)
+_text_embeddings = {}
+_text_sperre = threading.Lock()
+
+def text_embeddings(prompts=None, vorlagen=None):
+    """
+    Normierte Text-Features der Prompts als Tensor (Anzahl Prompts × Embedding-Dimension).
+    Bei mehreren Vorlagen ist jedes Prompt-Embedding der normierte Mittelwert über "vorlage.format(prompt)".
+    """
+    _warte_auf_clip()
+    prompts = tuple(beschreibungen if prompts is None else prompts)
+    vorlagen = tuple(PROMPT_VORLAGEN if vorlagen is None else vorlagen)
+    schluessel = (CLIP_MODELL, prompts, vorlagen)
+    if schluessel in _text_embeddings:
+        return _text_embeddings[schluessel]
+
+    with _text_sperre:
+        if schluessel not in _text_embeddings:
+            name = cache_schluessel("text", "clip_text", CLIP_VERSION, {"modell": CLIP_MODELL, "prompts": list(prompts), "vorlagen": list(vorlagen)})
+            pfad = os.path.join(TEXT_CACHE_ORDNER, f"clip_text_{name}.npy")
+            if os.path.exists(pfad):
+                features = np.load(pfad)
+            else:
+                texte = [vorlage.format(prompt) for prompt in prompts for vorlage in vorlagen]
+                with torch.no_grad():
+                    text_features = model.encode_text(clip.tokenize(texte).to(device)).float()
+                    text_features /= text_features.norm(dim=-1, keepdim=True)
+                    text_features = text_features.reshape(len(prompts), len(vorlagen), -1).mean(dim=1)
+                    text_features /= text_features.norm(dim=-1, keepdim=True)
+                features = text_features.cpu().numpy()
+                os.makedirs(TEXT_CACHE_ORDNER, exist_ok=True)
+                np.save(pfad, features)
+            _text_embeddings[schluessel] = torch.from_numpy(features).to(device)
+    return _text_embeddings[schluessel]
+
+#----- Vorverarbeitung -----#
+EINGABE_GROESSE = 224
+CLIP_MITTEL = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32)  # RGB
+CLIP_STREUUNG = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32)
+
+# (v / 255 - Mittel) / Streuung für alle 256 Werte, als 1 × 256 × 3-Tabelle in BGR-Reihenfolge wie das Kamerabild (für cv2.LUT)
+_NORMIERUNG_LUT = ((np.arange(256, dtype=np.float32)[None, :, None] / 255.0 - CLIP_MITTEL[::-1]) / CLIP_STREUUNG[::-1]).astype(np.float32)
+_puffer = threading.local()
+
+def _vorverarbeitung_numpy(cv2_image, ziel):
+    """
+    Wie CLIPs preprocess, aber ohne PIL: kürzere Seite auf 224 (lange Seite abgerundet wie torchvision.Resize),
+    dann die Mitte ausschneiden (gerundet wie CenterCrop). Normierung und BGR→RGB passieren beim Schreiben in ziel (3 × 224 × 224).
+    Verkleinert wird mit INTER_AREA als Näherung an PILs geglättetes BICUBIC, vergrößert mit INTER_CUBIC.
+    """
+    h, w = cv2_image.shape[:2]
+    if h <= w:
+        neu_h, neu_w = EINGABE_GROESSE, int(EINGABE_GROESSE * w / h)
+    else:
+        neu_h, neu_w = int(EINGABE_GROESSE * h / w), EINGABE_GROESSE
+    interpolation = cv2.INTER_AREA if min(h, w) > EINGABE_GROESSE else cv2.INTER_CUBIC
+    skaliert = cv2.resize(cv2_image, (neu_w, neu_h), interpolation=interpolation)
+    oben = int(round((neu_h - EINGABE_GROESSE) / 2.0))
+    links = int(round((neu_w - EINGABE_GROESSE) / 2.0))
+    ausschnitt = skaliert[oben:oben + EINGABE_GROESSE, links:links + EINGABE_GROESSE]
+
+    normiert = cv2.LUT(ausschnitt, _NORMIERUNG_LUT)
+    for kanal in range(3):  # ziel[0] = R = BGR-Kanal 2
+        ziel[kanal] = normiert[:, :, 2 - kanal]
+    return ziel
+
+def _bereite_bild_vor_pil(cv2_image):
     # BGR → RGB
     img_rgb = cv2.cvtColor(cv2_image, cv2.COLOR_BGR2RGB)
 
@@ -98,104 +271,248 @@ def klassifiziere_bild_clip(cv2_image):
     pil_img = Image.fromarray(img_rgb)
 
     # Preprocessen und auf Modell schicken
-    image_input = preprocess(pil_img).unsqueeze(0).to(device) # type: ignore
+    return preprocess(pil_img).unsqueeze(0).to(device) # type: ignore
+
+#----- Funktion zur KI-Klassifizierung -----#
+def bereite_bild_vor(cv2_image, ziel=None):
+    """
+    BGR-Bild → Eingabe-Tensor des Bild-Encoders (1 × 3 × 224 × 224).
+    ziel: optional vorbelegtes float32-Array 3 × 224 × 224 (z. B. eine Zeile eines Batch-Puffers), in das geschrieben wird.
+    """
+    _warte_auf_clip()
+    if clip_vorverarbeitung == "pil":
+        return _bereite_bild_vor_pil(cv2_image)
+    if ziel is None:
+        ziel = np.empty((3, EINGABE_GROESSE, EINGABE_GROESSE), dtype=np.float32)
+    _vorverarbeitung_numpy(cv2_image, ziel)
+    return torch.from_numpy(ziel).unsqueeze(0).to(device)
+
+def kodiere_bilder(image_input):
+    """Normierte Embeddings für einen Eingabe-Batch (N × 3 × 224 × 224) → float32-Array N × D."""
+    encoder = _bild_encoder
+    if encoder is not None:
+        features = np.asarray(encoder(image_input), dtype=np.float32)
+        return features / np.linalg.norm(features, axis=1, keepdims=True)
 
-    # Ähnlichkeiten berechnen
     with torch.no_grad():
         image_features = model.encode_image(image_input)
-        text_features = model.encode_text(text_tokens)
-
         image_features /= image_features.norm(dim=-1, keepdim=True)
-        text_features /= text_features.norm(dim=-1, keepdim=True)
-
-        ähnlichkeiten = (100.0 * image_features @ text_features.T).softmax(dim=-1)
 
-    # Top 3 Ergebnisse sortieren und zurückgeben
-    top3_indices = torch.topk(ähnlichkeiten[0], 3).indices
-    top3 = [(beschreibungen[i], ähnlichkeiten[0][i].item()) for i in top3_indices]
-
-    return top3
+    return image_features.float().cpu().numpy()
+
+def berechne_bild_embedding(cv2_image):
+    """Normiertes CLIP-Bild-Embedding (float32-Vektor)."""
+    # Ein Eingabe-Puffer pro Thread, wird für jede Aufnahme wiederverwendet
+    if not hasattr(_puffer, "eingabe"):
+        _puffer.eingabe = np.empty((3, EINGABE_GROESSE, EINGABE_GROESSE), dtype=np.float32)
+    return kodiere_bilder(bereite_bild_vor(cv2_image, _puffer.eingabe))[0]
+
+_genre_matrix = {}
+
+def genre_wahrscheinlichkeiten(ähnlichkeiten):
+    """Softmax-Scores (N × Prompts) → Wahrscheinlichkeit pro Genre (N × 7): Ensemble-Mittelwerte aus GENRE_MATRIX, auf 1 normiert."""
+    if ähnlichkeiten.device not in _genre_matrix:
+        _genre_matrix[ähnlichkeiten.device] = torch.from_numpy(GENRE_MATRIX).to(ähnlichkeiten.device)
+    mittelwerte = ähnlichkeiten @ _genre_matrix[ähnlichkeiten.device]
+    return mittelwerte / mittelwerte.sum(dim=-1, keepdim=True)
+
+def klassifiziere_embeddings(embeddings, top_k=3, mit_genre=False):
+    """
+    Top k (Beschreibung, Score) für jede Zeile eines Arrays normierter Bild-Embeddings.
+    mit_genre=True: stattdessen (Top k, Genre-Wert, Wahrscheinlichkeiten der Genres) pro Zeile,
+    das Genre kommt aus dem vollständigen Ähnlichkeitsvektor (genre_wahrscheinlichkeiten).
+    """
+    _warte_auf_clip()
+    # Ähnlichkeiten berechnen: ein Matrixprodukt mit den gemerkten Text-Features
+    with torch.no_grad():
+        image_features = torch.from_numpy(np.asarray(embeddings, dtype=np.float32).reshape(-1, text_embeddings().shape[1])).to(device)
+        ähnlichkeiten = (100.0 * image_features @ text_embeddings().T).softmax(dim=-1)
+        scores, indices = torch.topk(ähnlichkeiten, top_k, dim=-1)
+        genres = genre_wahrscheinlichkeiten(ähnlichkeiten).cpu().numpy() if mit_genre else None
+
+    # Top k Ergebnisse sortiert zurückgeben
+    tops = [[(beschreibungen[i], score) for i, score in zip(zeile_i, zeile_s)]
+            for zeile_i, zeile_s in zip(indices.tolist(), scores.tolist())]
+    if not mit_genre:
+        return tops
+    return [(top, int(GENRE_WERTE[np.argmax(p)]), p) for top, p in zip(tops, genres)]
+
+def klassifiziere_embedding(embedding, mit_genre=False):
+    """Top 3 (Beschreibung, Score) für ein normiertes Bild-Embedding; mit_genre=True → (Top 3, Genre-Wert)."""
+    ergebnis = klassifiziere_embeddings(embedding, mit_genre=mit_genre)[0]
+    return ergebnis[:2] if mit_genre else ergebnis
+
+def clip_analyse(cv2_image, cache=None, inhalt_hash=None):
+    """
+    CLIP-Ergebnis eines BGR-Bildes als Dict: "top3", "genre", "genre_wahrscheinlichkeiten" und das normierte "embedding".
+    cache: optionaler FeatureCache – das Bild-Embedding wird dann pro Bildinhalt nur einmal berechnet.
+    """
+    if cache is None:
+        embedding = berechne_bild_embedding(cv2_image)
+    else:
+        embedding = cache.merke(cv2_image, "clip_embedding", CLIP_VERSION, {"modell": CLIP_MODELL, "backend": clip_backend, "vorverarbeitung": clip_vorverarbeitung},
+                                lambda: berechne_bild_embedding(cv2_image), inhalt_hash)
+    top3, genre, wahrscheinlichkeiten = klassifiziere_embeddings(embedding, mit_genre=True)[0]
+    return {"top3": top3, "genre": genre, "genre_wahrscheinlichkeiten": wahrscheinlichkeiten, "embedding": embedding}
+
+def klassifiziere_bild_clip(cv2_image, cache=None, inhalt_hash=None, mit_genre=False):
+    """Top 3 CLIP-Kategorien eines BGR-Bildes; mit_genre=True → (Top 3, Genre-Wert)."""
+    ergebnis = clip_analyse(cv2_image, cache, inhalt_hash)
+    return (ergebnis["top3"], ergebnis["genre"]) if mit_genre else ergebnis["top3"]
+
+#----- Batch-Klassifizierung (Archive, mehrere Stationen) -----#
+def klassifiziere_bilder_clip_stream(bilder, batch_groesse=16, threads=4, top_k=3):
+    """
+    Klassifiziert eine Liste oder einen Strom von BGR-Bildern in Batches.
+    Die Vorverarbeitung läuft parallel in threads Threads und für den nächsten Batch schon während der Encoder rechnet.
+    Liefert pro Bild (Top k, Genre-Wert) in Eingabereihenfolge.
+    """
+    _warte_auf_clip()
+    bilder = iter(bilder)
+    # Zwei Batch-Puffer im Wechsel: einer wird vom Encoder gelesen, in den anderen schreibt die Vorverarbeitung
+    puffer = [np.empty((batch_groesse, 3, EINGABE_GROESSE, EINGABE_GROESSE), dtype=np.float32) for _ in range(2)]
+
+    def naechster_batch(pool, nummer):
+        batch = list(itertools.islice(bilder, batch_groesse))
+        ziel = puffer[nummer % 2]
+        if clip_vorverarbeitung == "pil":
+            return ziel, [pool.submit(bereite_bild_vor, bild) for bild in batch]
+        return ziel, [pool.submit(bereite_bild_vor, bild, ziel[i]) for i, bild in enumerate(batch)]
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="clip-vorbereitung") as pool:
+        nummer = 0
+        ziel, vorbereitet = naechster_batch(pool, nummer)
+        while vorbereitet:
+            eingaben = [future.result() for future in vorbereitet]
+            if clip_vorverarbeitung == "pil":
+                eingabe = torch.cat(eingaben)
+            else:
+                eingabe = torch.from_numpy(ziel[:len(eingaben)]).to(device)
+            nummer += 1
+            ziel_naechster, vorbereitet = naechster_batch(pool, nummer)
+            for top, genre, _ in klassifiziere_embeddings(kodiere_bilder(eingabe), top_k, mit_genre=True):
+                yield top, genre
+            ziel = ziel_naechster
+
+def klassifiziere_bilder_clip(bilder, batch_groesse=16, threads=4, top_k=3, mit_bericht=True):
+    """Wie klassifiziere_bilder_clip_stream, als Liste; mit_bericht gibt den Durchsatz in Bildern/s aus."""
+    start = time.perf_counter()
+    ergebnisse = list(klassifiziere_bilder_clip_stream(bilder, batch_groesse, threads, top_k))
+    dauer = time.perf_counter() - start
+    if mit_bericht and ergebnisse:
+        print(f"CLIP: {len(ergebnisse)} Bilder in {dauer:.2f} s ({len(ergebnisse) / dauer:.1f} Bilder/s, "
+              f"Batch {batch_groesse}, {threads} Threads, Backend {clip_backend})")
+    return ergebnisse
 
 #--------------------------- Kategorisierung --------------------------------#
-# Zuweisung der Analyse Prompts zu Genres ---> Werte von 1 - 7
-genre_mapping = {
-    # 1 – Sehr harmonisch, ruhig, ästhetisch
-    "blank": 1,
-    "empty": 1,
-    "white canvas": 1,
-
-    # 2 – Harmonisch mit Energie
-    "minimal": 2,
-    "basic": 2,
-    "peaceful": 2,
-    "harmonious": 2,
-    "calm": 2,
-    "soothing": 2,
-    "balanced": 2,
-    "relaxing": 2,
-    "meditative": 2,
-    "elegant": 2,
-
-    # 3 – Neutral, technisch, durchschnittlich
-    "average": 3,
-    "neutral": 3,
-    "schematic": 3,
-    "technical": 3,
-    "basic": 3,
-    "unremarkable": 3,
-    #"colorful composition": 3,
-
-    # 4 – Leicht unruhig, erste Dissonanz
-    "vivid": 4,
-    "expressive": 4,
-    "dynamic": 4,
-    "energetic": 4,
-    #"structured": 4,
-
-    # 5 – Deutlich unruhig, stressig
-    "geometric": 5,
-    "pattern": 5,
-    "repetitive": 5,
-    "dark": 5,
-
-    # 6 – Unästhetisch, visuell störend
-    "clashing": 6,
-    "uneven": 6,
-    "tense": 6,
-    "chaotic sketch": 6,
-    "disharmony": 6,
-
-    # 7 – Extrem negativ, verstörend
-    #"visual noise": 7,
-    "stressful": 7,
-    "chaotic": 7,
-    "overwhelming": 7,
-    "disorganized": 7,
-
-    "ugly": 7,
-    "harsh": 7,
-    "distorted": 7,
-    "unpleasant": 7,
-    "painful": 7,
-
-    "violent": 7,
-    "aggressive": 7,
-    "terrifying": 7,
-    "destructive": 7,
-    "angry": 7,
-    "disturbing": 7
-}
+# Zuweisung der Analyse Prompts zu Genres ---> Werte von 1 - 7 (Genre mit dem höchsten Gewicht pro Prompt)
+genre_mapping = {prompt: int(GENRE_WERTE[np.argmax(zeile)]) for prompt, zeile in zip(beschreibungen, GENRE_ZUORDNUNG)}
 
 #----- Funktion zur Zuwesiung der Prompts zu den Genre-Werten von 1-7 -----#
 def bestimme_genre_wert(top3_kategorien):
-    """Bestimme Genre-Wert basierend auf dem Beschreibungstext mit höchstem Score."""
+    """Genre-Wert nur aus der Beschreibung mit höchstem Score (ohne Ähnlichkeitsvektor, z. B. für gespeicherte Top 3)."""
     if not top3_kategorien:
-        return 3  # Neutraler Fallback
-
-    beste_beschreibung = top3_kategorien[0][0].lower()
-
-    for key, wert in genre_mapping.items():
-        if key in beste_beschreibung:
-            return wert
-
-    return 3  # Fallback auf neutral
\ No newline at end of file
+        return NEUTRALES_GENRE  # Neutraler Fallback
+
+    return genre_mapping.get(top3_kategorien[0][0].lower(), NEUTRALES_GENRE)
+
+class GenreAbweichung:
+    """Zählt, wie oft das Ensemble-Genre vom Genre der Top-1-Beschreibung (bestimme_genre_wert) abweicht."""
+
+    def __init__(self):
+        self.bilder = 0
+        self.abweichend = 0
+        self._sperre = threading.Lock()
+
+    def notiere(self, top_kategorien, genre):
+        """Gibt das Top-1-Genre zurück, falls es vom Ensemble-Genre abweicht, sonst None."""
+        top1_genre = bestimme_genre_wert(top_kategorien)
+        with self._sperre:
+            self.bilder += 1
+            self.abweichend += int(top1_genre != genre)
+        return top1_genre if top1_genre != genre else None
+
+    @property
+    def anteil(self):
+        return self.abweichend / self.bilder if self.bilder else 0.0
+
+    def bericht(self):
+        return f"Ensemble-Genre weicht in {self.abweichend} von {self.bilder} Bildern ({self.anteil:.1%}) vom Top-1-Genre ab"
+
+#--------------------------- Prüfung der Vorverarbeitung --------------------------------#
+def vergleiche_vorverarbeitung(bilder, wiederholungen=20):
+    """
+    Stellt die NumPy/OpenCV-Vorverarbeitung der CLIP-Referenz (PIL + torchvision) gegenüber:
+    größte und mittlere Abweichung der Eingabe-Tensoren, Kosinus-Ähnlichkeit der Embeddings,
+    Übereinstimmung der Top-3 und des Genres sowie die Zeit pro Bild. Gibt die Kennzahlen als Dict zurück,
+    "freigegeben" ist True, wenn beide Übereinstimmungen VORVERARBEITUNG_SCHWELLEN erreichen.
+    Ohne PIL (keine Referenz) wird die Prüfung übersprungen und None zurückgegeben.
+    """
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("⏭️ PIL nicht installiert – Vergleich der Vorverarbeitung übersprungen")
+        return None
+    _warte_auf_clip()
+    ziel = np.empty((3, EINGABE_GROESSE, EINGABE_GROESSE), dtype=np.float32)
+    max_abw, mittel_abw, kosinus, top3_gleich, genre_gleich = [], [], [], [], []
+
+    for bild in bilder:
+        referenz = _bereite_bild_vor_pil(bild)
+        schnell = torch.from_numpy(_vorverarbeitung_numpy(bild, ziel).copy()).unsqueeze(0).to(device)
+        differenz = (schnell - referenz.float()).abs()
+        max_abw.append(differenz.max().item())
+        mittel_abw.append(differenz.mean().item())
+
+        embeddings = kodiere_bilder(torch.cat([referenz, schnell.to(referenz.dtype)]))
+        kosinus.append(float(embeddings[0] @ embeddings[1]))
+        (top_referenz, genre_referenz, _), (top_schnell, genre_schnell, _) = klassifiziere_embeddings(embeddings, mit_genre=True)
+        top3_gleich.append([b for b, _ in top_referenz] == [b for b, _ in top_schnell])
+        genre_gleich.append(genre_referenz == genre_schnell)
+
+    def zeit_pro_bild(funktion):
+        start = time.perf_counter()
+        for _ in range(wiederholungen):
+            for bild in bilder:
+                funktion(bild)
+        return (time.perf_counter() - start) * 1000 / (wiederholungen * len(bilder))
+
+    pil_ms = zeit_pro_bild(_bereite_bild_vor_pil)
+    numpy_ms = zeit_pro_bild(lambda bild: _vorverarbeitung_numpy(bild, ziel))
+
+    ergebnis = {
+        "max_abweichung": max(max_abw), "mittlere_abweichung": float(np.mean(mittel_abw)),
+        "min_kosinus": min(kosinus), "top3": float(np.mean(top3_gleich)), "genre": float(np.mean(genre_gleich)),
+        "pil_ms": pil_ms, "numpy_ms": numpy_ms,
+    }
+    ergebnis["freigegeben"] = all(ergebnis[name] >= schwelle for name, schwelle in VORVERARBEITUNG_SCHWELLEN.items())
+    print(f"Vorverarbeitung auf {len(bilder)} Bild(ern): max. Abweichung {ergebnis['max_abweichung']:.3f} | "
+          f"mittlere Abweichung {ergebnis['mittlere_abweichung']:.4f} | min. Kosinus {ergebnis['min_kosinus']:.4f}")
+    print(f"  Top-3 gleich: {ergebnis['top3']:.1%} | Genre gleich: {ergebnis['genre']:.1%} | "
+          f"PIL {pil_ms:.2f} ms → NumPy {numpy_ms:.2f} ms pro Bild (×{pil_ms / numpy_ms:.1f})")
+    if ergebnis["freigegeben"]:
+        print('  ✅ "numpy" erreicht die Schwellen und kann als clip_vorverarbeitung verwendet werden')
+    else:
+        print(f'  ❌ "numpy" unter den Schwellen {VORVERARBEITUNG_SCHWELLEN} – bei "pil" bleiben')
+    return ergebnis
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ordner mit CLIP klassifizieren (Batch-Verarbeitung, mit Durchsatz)")
+    parser.add_argument("ordner")
+    parser.add_argument("--batch", type=int, default=16, help="Bilder pro Encoder-Aufruf")
+    parser.add_argument("--threads", type=int, default=4, help="Threads für die Vorverarbeitung")
+    parser.add_argument("--backend", choices=["eager", "torchscript", "onnx"], default="eager")
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--vergleiche-vorverarbeitung", action="store_true", help="NumPy- gegen PIL-Vorverarbeitung prüfen")
+    argumente = parser.parse_args()
+
+    dateien = sorted(f for f in os.listdir(argumente.ordner) if f.lower().endswith((".jpg", ".jpeg", ".png")))
+    lade_clip_im_hintergrund(argumente.backend, argumente.int8).result()
+    if argumente.vergleiche_vorverarbeitung:
+        vergleiche_vorverarbeitung([cv2.imread(os.path.join(argumente.ordner, f)) for f in dateien[:50]])
+    bilder = (cv2.imread(os.path.join(argumente.ordner, f)) for f in dateien)
+    for datei, (top, genre) in zip(dateien, klassifiziere_bilder_clip(bilder, argumente.batch, argumente.threads)):
+        print(f"{datei}: {top[0][0]} ({top[0][1]:.2%}) → Genre {genre}")
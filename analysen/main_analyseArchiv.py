@@ -0,0 +1,292 @@
+#-----------------------------------------------------------
+ # DRAWTONE
+ # Copyright (c) 2026 Dave Kronawitter & Malte Mittrowann.
+ # All rights reserved.
+ #
+ # This code is proprietary and not open source.
+ # Unauthorized copying of this file is strictly prohibited.
+#------------------------------------------------------------
+
+
+import argparse
+import csv
+import os
+import time
+import cv2
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from analysen.analysis_context import AnalyseKontext
+from analysen.feature_cache import FeatureCache, STANDARD_PFAD, bild_hash
+from analysen.image_analysis import (
+    ANALYSE_VERSION,
+    FARBKLASSEN,
+    berechne_durchschnittshelligkeit,
+    berechne_farbanteile,
+    berechne_segmentierungsgrad,
+    berechne_frequenz_index,
+    berechne_farbharmonie,
+    berechne_bildrausch_index,
+    berechne_farbschwerpunkt_index
+)
+
+# Spalten der Feature-Datei (eine Zeile pro Bild)
+SPALTEN = (["datei", "helligkeit"] + list(FARBKLASSEN) +
+           ["segmentierungsgrad", "frequenz_index", "farbharmonie", "farbschwerpunkt_index",
+            "bildrausch_index", "bildrausch_varianz"])
+CLIP_SPALTEN = ["clip_top1", "clip_score1", "genre"]
+
+BILD_ENDUNGEN = (".jpg", ".jpeg", ".png")
+
+# ---------------------- Worker (läuft im Prozess-Pool) ---------------------- #
+_cache = None  # FeatureCache des Worker-Prozesses
+_clip_variante = "eager"  # CLIP-Bild-Encoder des Worker-Prozesses (Teil des Cache-Schlüssels)
+
+def _worker_start(cache_pfad=None, clip_backend=None, quantisieren=False):
+    global _cache, _clip_variante
+    # Ein OpenCV-Thread pro Prozess: die Parallelität kommt vom Pool, nicht von OpenCV
+    cv2.setNumThreads(1)
+    # Jeder Prozess öffnet seine eigene Verbindung zur gemeinsamen Cache-Datei
+    _cache = FeatureCache(cache_pfad) if cache_pfad else None
+    if clip_backend:
+        from analysen import image_classification
+        try:
+            image_classification.lade_clip_im_hintergrund(clip_backend, quantisieren).result()
+        except Exception as fehler:
+            print(f"⚠️ CLIP konnte nicht geladen werden: {fehler}")
+        # Tatsächlich geladener Encoder (nach einem fehlgeschlagenen Export "eager")
+        _clip_variante = image_classification.clip_backend
+
+def analysiere_bild(datei, bild, anzahl_cluster=20, modus="schnell", mit_clip=False, cache=None):
+    """
+    Alle Kennwerte eines (bereits verkleinerten) Bildes als Dict – ohne Visualisierungen.
+    cache: optionaler FeatureCache; eine Zeile wird pro Bildinhalt und Parametersatz nur einmal berechnet.
+    """
+    if cache is None:
+        return _berechne_zeile(datei, bild, anzahl_cluster, modus, mit_clip)
+
+    parameter = {"anzahl_cluster": anzahl_cluster, "modus": modus, "clip": mit_clip}
+    version = ANALYSE_VERSION
+    if mit_clip:
+        from analysen.image_classification import CLIP_MODELL, CLIP_VERSION, PROMPT_VORLAGEN, beschreibungen, genre_prompts
+        parameter.update(modell=CLIP_MODELL, prompts=beschreibungen, vorlagen=PROMPT_VORLAGEN, genres=genre_prompts, backend=_clip_variante)
+        version = f"{ANALYSE_VERSION}/{CLIP_VERSION}"
+
+    inhalt_hash = bild_hash(bild)
+    zeile = cache.merke(bild, "archiv_zeile", version, parameter,
+                        lambda: _berechne_zeile(None, bild, anzahl_cluster, modus, mit_clip, cache, inhalt_hash), inhalt_hash)
+    return dict(zeile, datei=datei)
+
+def _berechne_zeile(datei, bild, anzahl_cluster, modus, mit_clip, cache=None, inhalt_hash=None):
+    kontext = AnalyseKontext(bild)
+    zeile = {"datei": datei, "helligkeit": berechne_durchschnittshelligkeit(kontext)}
+    zeile.update(berechne_farbanteile(kontext, 75, 25))
+    zeile["segmentierungsgrad"] = berechne_segmentierungsgrad(kontext, modus=modus, mit_visualisierung=False)[0]
+    zeile["frequenz_index"] = berechne_frequenz_index(kontext, mit_visualisierung=False)[0]
+    zeile["farbharmonie"] = berechne_farbharmonie(kontext, anzahl_cluster, 20, modus=modus, mit_visualisierung=False)[0]
+    zeile["farbschwerpunkt_index"] = berechne_farbschwerpunkt_index(kontext, 20, mit_visualisierung=False)[0]
+    zeile["bildrausch_index"], zeile["bildrausch_varianz"] = berechne_bildrausch_index(kontext)
+
+    if mit_clip:
+        # Erst hier importieren, damit Läufe ohne CLIP kein Torch laden
+        from analysen.image_classification import klassifiziere_bild_clip
+        top3, zeile["genre"] = klassifiziere_bild_clip(bild, cache, inhalt_hash, mit_genre=True)
+        zeile["clip_top1"], zeile["clip_score1"] = top3[0]
+
+    return {k: (float(v) if isinstance(v, (np.floating, np.integer)) else v) for k, v in zeile.items()}
+
+def _analysiere_aufgabe(aufgabe):
+    return analysiere_bild(*aufgabe, cache=_cache)
+
+# ---------------------- Dateien & Fortschritt ---------------------- #
+def finde_bilder(ordner):
+    """Alle Bilder unterhalb von ordner, als Pfade relativ zu ordner (sortiert)."""
+    dateien = []
+    for wurzel, _, namen in os.walk(ordner):
+        for name in namen:
+            if name.lower().endswith(BILD_ENDUNGEN):
+                dateien.append(os.path.relpath(os.path.join(wurzel, name), ordner))
+    return sorted(dateien)
+
+def entferne_unvollstaendige_zeile(ausgabe):
+    """Schneidet eine beim Abbruch nur halb geschriebene letzte Zeile (ohne Zeilenende) ab; gibt True zurück, wenn gekürzt wurde."""
+    if not os.path.exists(ausgabe) or os.path.getsize(ausgabe) == 0:
+        return False
+    with open(ausgabe, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) == b"\n":
+            return False
+        # Rückwärts bis zum letzten Zeilenende suchen
+        ende = f.seek(0, os.SEEK_END)
+        while ende > 0:
+            start = max(0, ende - 65536)
+            f.seek(start)
+            block = f.read(ende - start)
+            position = block.rfind(b"\n")
+            if position >= 0:
+                f.truncate(start + position + 1)
+                return True
+            ende = start
+        f.truncate(0)
+        return True
+
+def bereits_analysiert(ausgabe):
+    """
+    Dateinamen, die vollständig in der Feature-Datei stehen (für das Fortsetzen abgebrochener Läufe).
+    Zeilen mit fehlenden Spalten zählen nicht, diese Bilder werden erneut analysiert.
+    """
+    if not os.path.exists(ausgabe):
+        return set()
+    with open(ausgabe, newline="", encoding="utf-8") as f:
+        return {zeile["datei"] for zeile in csv.DictReader(f) if None not in zeile.values() and None not in zeile}
+
+def lade_und_verkleinere(pfad, groesse):
+    """Läuft in den Prefetch-Threads: JPEG dekodieren und auf Analysegröße bringen (wie main.py)."""
+    bild = cv2.imread(pfad)
+    if bild is None:
+        return None
+    return cv2.resize(bild, groesse)
+
+def exportiere_npz(ausgabe_csv, ausgabe_npz):
+    """Feature-CSV spaltenweise als NPZ speichern (eine Array-Spalte pro Kennwert)."""
+    with open(ausgabe_csv, newline="", encoding="utf-8") as f:
+        zeilen = list(csv.DictReader(f))
+    if not zeilen:
+        return
+    spalten = {}
+    for name in zeilen[0].keys():
+        werte = [z[name] for z in zeilen]
+        try:
+            spalten[name] = np.array(werte, dtype=np.float32)
+        except ValueError:
+            spalten[name] = np.array(werte)
+    np.savez_compressed(ausgabe_npz, **spalten)
+
+# ---------------------- Batch-Lauf ---------------------- #
+def analysiere_archiv(ordner, ausgabe, prozesse=None, prefetch=4, groesse=(320, 240),
+                      anzahl_cluster=20, modus="schnell", mit_clip=False, cache_pfad=STANDARD_PFAD,
+                      clip_backend="eager", quantisieren=False):
+    """
+    Analysiert alle Bilder in ordner und hängt die Kennwerte an die CSV-Datei ausgabe an.
+    Bereits enthaltene Dateien werden übersprungen, ein abgebrochener Lauf kann also einfach neu gestartet werden.
+    cache_pfad: Feature-Cache (None = ohne Cache); schon einmal analysierte Bildinhalte werden daraus gelesen.
+    clip_backend/quantisieren: CLIP-Bild-Encoder der Worker (siehe clip_backend.BACKENDS).
+    """
+    prozesse = prozesse or os.cpu_count() or 1
+    if entferne_unvollstaendige_zeile(ausgabe):
+        print(f"✂️ Unvollständige letzte Zeile aus {ausgabe} entfernt")
+    erledigt = bereits_analysiert(ausgabe)
+    offen = [d for d in finde_bilder(ordner) if d not in erledigt]
+    print(f"📂 {len(offen)} neue Bilder, {len(erledigt)} bereits analysiert | {prozesse} Prozesse, {prefetch} Prefetch-Threads")
+    if not offen:
+        return 0
+
+    spalten = SPALTEN + (CLIP_SPALTEN if mit_clip else [])
+    neu_anlegen = not os.path.exists(ausgabe) or os.path.getsize(ausgabe) == 0
+    if not neu_anlegen:
+        # Beim Fortsetzen die Spalten der vorhandenen Datei übernehmen
+        with open(ausgabe, newline="", encoding="utf-8") as f:
+            spalten = next(csv.reader(f))
+        if mit_clip and not set(CLIP_SPALTEN) <= set(spalten):
+            print("⚠️ Vorhandene Feature-Datei hat keine CLIP-Spalten – CLIP-Werte werden nicht gespeichert.")
+    start = time.perf_counter()
+    fertig = 0
+    fehlgeschlagen = 0
+    abweichung = None
+    if mit_clip:
+        from analysen.image_classification import GenreAbweichung
+        abweichung = GenreAbweichung()
+
+    with open(ausgabe, "a", newline="", encoding="utf-8") as f, \
+         ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="prefetch") as dekodierer, \
+         ProcessPoolExecutor(max_workers=prozesse, initializer=_worker_start, initargs=(cache_pfad, clip_backend if mit_clip else None, quantisieren)) as pool:
+        schreiber = csv.DictWriter(f, fieldnames=spalten, extrasaction="ignore")
+        if neu_anlegen:
+            schreiber.writeheader()
+
+        # Dekodieren läuft den Analysen voraus, aber nur begrenzt weit (Speicher)
+        dateien = iter(offen)
+        geladen = deque()
+        analysen = deque()
+        max_voraus = 2 * prozesse + prefetch
+
+        def nachladen():
+            while len(geladen) + len(analysen) < max_voraus:
+                datei = next(dateien, None)
+                if datei is None:
+                    return
+                geladen.append((datei, dekodierer.submit(lade_und_verkleinere, os.path.join(ordner, datei), groesse)))
+
+        nachladen()
+        while geladen or analysen:
+            # Fertig dekodierte Bilder an den Prozess-Pool geben
+            while geladen and (geladen[0][1].done() or not analysen):
+                datei, future = geladen.popleft()
+                bild = future.result()
+                if bild is None:
+                    print(f"⚠️ Bild konnte nicht geladen werden: {datei}")
+                    continue
+                analysen.append((datei, pool.submit(_analysiere_aufgabe, (datei, bild, anzahl_cluster, modus, mit_clip))))
+
+            if analysen:
+                datei, future = analysen.popleft()
+                try:
+                    zeile = future.result()
+                except BrokenProcessPool:
+                    raise  # Pool unbrauchbar; ein Neustart setzt nach der letzten geschriebenen Zeile fort
+                except Exception as fehler:
+                    # Ein fehlerhaftes Bild bricht den Lauf nicht ab; es fehlt in der CSV und wird beim nächsten Lauf erneut versucht
+                    fehlgeschlagen += 1
+                    print(f"⚠️ Analyse fehlgeschlagen: {datei} ({fehler!r})")
+                    nachladen()
+                    continue
+                schreiber.writerow(zeile)
+                if abweichung is not None and "genre" in zeile:
+                    abweichung.notiere([(zeile["clip_top1"], zeile["clip_score1"])], zeile["genre"])
+                fertig += 1
+                if fertig % 25 == 0:
+                    f.flush()
+                    rate = fertig / (time.perf_counter() - start)
+                    print(f"  {fertig}/{len(offen)} Bilder | {rate:.1f} Bilder/s")
+            nachladen()
+
+    dauer = time.perf_counter() - start
+    print(f"✅ {fertig} Bilder in {dauer:.1f} s ({fertig / dauer:.1f} Bilder/s) → {ausgabe}")
+    if fehlgeschlagen:
+        print(f"⚠️ {fehlgeschlagen} Bild(er) fehlgeschlagen – beim nächsten Lauf werden sie erneut versucht")
+    if abweichung is not None:
+        print("🎼 " + abweichung.bericht())
+    return fertig
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-Analyse aller Aufnahmen eines Ordners in eine Feature-Datei")
+    parser.add_argument("ordner", nargs="?", default=os.path.join("captured_images", "tests"))
+    parser.add_argument("--ausgabe", help="Feature-CSV (Standard: <ordner>/features.csv)")
+    parser.add_argument("--npz", action="store_true", help="zusätzlich spaltenweise als .npz exportieren")
+    parser.add_argument("--prozesse", type=int, default=None, help="Anzahl Analyse-Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--prefetch", type=int, default=4, help="Threads zum Dekodieren der Bilder")
+    parser.add_argument("--modus", choices=["schnell", "exakt"], default="schnell", help="KMeans-Modus für Segmentierung/Farbharmonie")
+    parser.add_argument("--clip", action="store_true", help="CLIP-Kategorien und Genre mit berechnen (lädt CLIP in jedem Prozess)")
+    parser.add_argument("--clip-backend", choices=["eager", "torchscript", "onnx"], default="eager", help="CLIP-Bild-Encoder auf der CPU")
+    parser.add_argument("--int8", action="store_true", help="Bild-Encoder dynamisch int8-quantisieren (torchscript/onnx)")
+    parser.add_argument("--cache", default=STANDARD_PFAD, help="Feature-Cache (SQLite-Datei)")
+    parser.add_argument("--ohne-cache", action="store_true", help="Feature-Cache weder lesen noch schreiben")
+    argumente = parser.parse_args()
+
+    if not os.path.isdir(argumente.ordner):
+        print("❌ Ordner existiert nicht:", argumente.ordner)
+        return
+
+    ausgabe = argumente.ausgabe or os.path.join(argumente.ordner, "features.csv")
+    analysiere_archiv(argumente.ordner, ausgabe, argumente.prozesse, argumente.prefetch,
+                      modus=argumente.modus, mit_clip=argumente.clip,
+                      cache_pfad=None if argumente.ohne_cache else argumente.cache,
+                      clip_backend=argumente.clip_backend, quantisieren=argumente.int8)
+
+    if argumente.npz:
+        exportiere_npz(ausgabe, os.path.splitext(ausgabe)[0] + ".npz")
+
+if __name__ == "__main__":
+    main()
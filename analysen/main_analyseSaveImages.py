@@ -14,7 +14,7 @@ import time
 import numpy as np
 from pythonosc.udp_client import SimpleUDPClient
 
-from image_analysis import (
+from analysen.image_analysis import (
     berechne_durchschnittshelligkeit,
     berechne_farbanteile,
     berechne_segmentierungsgrad,
@@ -53,10 +53,11 @@ def main():
     anzahl_cluster = 6
     helligkeit = berechne_durchschnittshelligkeit(frame)
     farbanteileRecieve = berechne_farbanteile(frame, 50)
-    segmentierungsgrad = berechne_segmentierungsgrad(frame, anzahl_cluster)
-    frequenz_index = berechne_frequenz_index(frame)
-    farbharmonie = berechne_farbharmonie(frame, anzahl_cluster)
-    bildrauschen = berechne_bildrausch_index(frame)
+    # Nur Kennwerte, keine Visualisierungen (hier wird nichts angezeigt)
+    segmentierungsgrad, _ = berechne_segmentierungsgrad(frame, anzahl_cluster, mit_visualisierung=False)
+    frequenz_index, _ = berechne_frequenz_index(frame, mit_visualisierung=False)
+    farbharmonie, _ = berechne_farbharmonie(frame, anzahl_cluster, mit_visualisierung=False)
+    bildrauschen, _ = berechne_bildrausch_index(frame)
 
     farbanteileSend = {
         "rot": farbanteileRecieve.get("rot", 0) + farbanteileRecieve.get("magenta", 0),     # Chords
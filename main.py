@@ -7,16 +7,28 @@
  # Unauthorized copying of this file is strictly prohibited.
 #------------------------------------------------------------
 
+import time
+PROGRAMM_START = time.perf_counter()
+
 from pythonosc.udp_client import SimpleUDPClient
 import cv2
 from datetime import datetime
 import os
 import numpy as np
-import time
-from analysen.image_analysis import berechne_durchschnittshelligkeit, berechne_farbanteile, berechne_segmentierungsgrad, berechne_frequenz_index, berechne_farbharmonie, berechne_bildrausch_index, berechne_farbschwerpunkt_index
-from analysen.image_classification import klassifiziere_bild_clip, bestimme_genre_wert
+import threading
+from functools import partial
+from analysen.analysis_context import AnalyseKontext, VollbildQuelle
+from analysen.analysis_scheduler import AnalyseScheduler
+from analysen.analysis_pyramid import AnalysePyramide
+from analysen.clip_worker import ClipWorker, KeinFreierSlot
+from analysen.color_histogram import berechne_farbhistogramm
+from analysen.feature_cache import FeatureCache, LiveSchluessel, STANDARD_PFAD
+from analysen.image_analysis import ANALYSE_VERSION, berechne_gemeinsame_palette, segmentierungsgrad_aus_palette, farbpalette_aus_palette, berechne_farbpalette, berechne_durchschnittshelligkeit, berechne_farbanteile, berechne_segmentierungsgrad, berechne_frequenz_index, berechne_farbharmonie, berechne_bildrausch_index, berechne_farbschwerpunkt_index
+from analysen.embedding_index import EmbeddingIndex
+from analysen.genre_fallback import GenreFallback, merkmale_aus_analyse
+from analysen.image_classification import GenreAbweichung, clip_analyse, lade_clip_im_hintergrund
 #from analysen.image_detection import erkenne_text, erkenne_gesichter
-from projektion.projection_old import projection
+from projektion.projection import ProjektionsRenderer
 
 #----------------------------- OSC-Send-Modul -------------------------------------#
 osc_ip = "192.168.0.123"  # <-- hier die IP-Adresse des Empfänger-Computers eintragen
@@ -39,6 +51,61 @@ morphtime_min = 20
 morphtime_max = 120
 morphtime_step = 1  # Schrittgröße pro Tastendruck
 
+# Segmentierung: "exakt" (cv2.kmeans, 10 Neustarts) oder "schnell" (Stichprobe + Mini-Batch + Warmstart)
+# "schnell" weicht auf synthetischen Bildern um 0.2 – 0.34 vom exakten Grad ab (verschiebt /segmentierungsgrad und /meloSpeed);
+# erst umstellen, wenn image_analysis.vergleiche_segmentierungsmodi(bild) auf echten Aufnahmen kleine Abweichungen zeigt
+segmentierungs_modus = "exakt"
+farbharmonie_modus = "exakt"  # gleiche Optionen für die HSV-Palette der Farbharmonie
+# Segmentierung und Farbharmonie aus einem gemeinsamen Lab-KMeans (image_analysis.berechne_gemeinsame_palette,
+# Modus = segmentierungs_modus) statt zweier Clusterings; Vergleich: image_analysis.vergleiche_gemeinsame_palette(bild).
+# Aus, weil das gemeinsame Clustering /segmentierungsgrad (und damit /meloSpeed) um bis zu ~0.35 verschiebt
+gemeinsame_palette = False
+
+# Auflösungspyramide: jede Metrik läuft auf ihrer Stufe laut analysis_pyramid.AUFLOESUNGS_POLITIK
+# statt alle auf dem festen 320x240-Bild. Drift/Laufzeit pro Stufe: python -m analysen.analysis_pyramid
+pyramiden_analyse = False
+
+# Farbanteile, Farbschwerpunkt, Farbharmonie und Segmentierung aus einem quantisierten Farbhistogramm
+# (histogramm_stufen³ Bins) des vollen Crops statt aus dem 320x240-Bild. Werte/Laufzeit gegenüber den
+# Pixelanalysen: color_histogram.vergleiche_mit_pixelanalyse(bild)
+histogramm_analyse = False
+histogramm_stufen = 32
+
+# CLIP-Bild-Encoder: "eager" (PyTorch), "torchscript" oder "onnx" (onnxruntime); clip_int8 quantisiert die Gewichte dynamisch.
+# Übereinstimmung und Latenz gegenüber eager: python -m analysen.clip_backend <Bildordner>
+clip_backend = "eager"
+clip_int8 = False
+
+# CLIP in einem eigenen Prozess: Vorschau, Tasten und die übrigen OSC-Werte warten nicht auf die Klassifizierung,
+# /genre wird gesendet, sobald das Ergebnis vorliegt
+clip_worker_aktiv = True
+
+# Embedding-Index (cache/embeddings): jede Aufnahme wird mit ihrem CLIP-Embedding gespeichert, die ähnlichste
+# frühere Zeichnung wird angezeigt. Ab duplikat_schwelle (Kosinus) gilt sie als dieselbe Zeichnung und ihr Genre wird übernommen.
+embedding_index_aktiv = True
+duplikat_schwelle = 0.95
+
+# Genre-Fallback (cache/genre_fallback.npz, trainieren mit: python -m analysen.genre_fallback <features.csv>): schätzt /genre
+# in unter 1 ms aus den Kennwerten, solange CLIP noch lädt, fehlschlägt oder länger als clip_budget Sekunden braucht.
+# /morph wartet höchstens bis zum Ende des Budgets auf /genre, damit die Klangseite das Genre wie bisher vor /morph bekommt.
+# Nur ohne trainierten Fallback kann ein verspätetes CLIP-Genre nach /morph ankommen.
+genre_fallback_aktiv = True
+clip_budget = 1.5
+
+# Projektion läuft in einem eigenen Thread weiter, während Vorschau und Aufnahme bedienbar bleiben.
+# Reihenfolge des Kachelaufbaus: "raster", "spirale" oder "zufall"; projektion_einblenden in Sekunden pro Kachel (0 = hart)
+projektion_reihenfolge = "raster"
+projektion_einblenden = 0.0
+projektion_fps = 60  # Ziel-Bildrate; nach dem Aufbau ruht der Renderer (Statistik mit Taste P)
+# "morph": über morphtime vom vorherigen Projektionsbild (inkl. Analysefelder) zum neuen überblenden – passend zum Audio-Morph;
+# "kacheln": neues Bild Kachel für Kachel über dem alten aufbauen
+projektion_uebergang = "morph"
+
+# Feature-Cache (cache/features.sqlite): CLIP-Embeddings und Farbpaletten werden pro Bildinhalt nur einmal berechnet.
+# Aufnahmen werden über ein verkleinertes Vorschaubild zugeordnet (LiveSchluessel), damit eine erneute Aufnahme
+# derselben Zeichnung trotz Sensorrauschen trifft.
+feature_cache_aktiv = True
+
 def apply_settings(cap):
 
     #---- Belichtung ----#
@@ -121,6 +188,145 @@ def finde_optimalen_weissabgleich(cap, thresholdWhite=75, thresholdBlack=25, sch
 
     return best_temp, best_tint
 
+#---------------------------- Startzeit-Bericht ----------------------------------#
+startzeiten = {}
+genre_abweichung = GenreAbweichung()  # Ensemble-Genre gegenüber dem früheren Top-1-Mapping
+
+def merke_startzeit(name):
+    """Zeitpunkt seit Programmstart (ms) für den Startzeit-Bericht."""
+    startzeiten.setdefault(name, (time.perf_counter() - PROGRAMM_START) * 1000)
+
+def drucke_startbericht(clip_laden):
+    print("⏱️ Startzeit-Bericht (ms seit Programmstart):")
+    for name, zeitpunkt in sorted(startzeiten.items(), key=lambda eintrag: eintrag[1]):
+        print(f"  {name:<22} {zeitpunkt:8.0f}")
+    if clip_laden.done() and clip_laden.exception() is None:
+        print("  CLIP im Hintergrund: " + " | ".join(f"{name} {dauer:.0f}" for name, dauer in clip_laden.result().items()))
+
+#---------------------------- Analyse-Scheduler ----------------------------------#
+def gecachte_farbpalette(kontext, anzahl_cluster, cache):
+    """HSV-Palette der Farbharmonie aus dem Feature-Cache (Zentren und Häufigkeiten reichen auch für den Farbbalken)."""
+    if cache is None:
+        return None
+
+    def berechnung():
+        palette = berechne_farbpalette(kontext, anzahl_cluster, 20, farbharmonie_modus)
+        return None if palette is None else [np.asarray(teil).tolist() for teil in palette]
+
+    parameter = {"anzahl_cluster": anzahl_cluster, "schwelle": 20, "modus": farbharmonie_modus}
+    palette = cache.merke(kontext.bild, "farbpalette", ANALYSE_VERSION, parameter, berechnung, kontext.inhalt_hash)
+    if palette is None:
+        return None
+    return np.array(palette[0], dtype=np.float32), np.array(palette[1], dtype=np.int64)
+
+def erstelle_analyse_scheduler(anzahl_cluster=20, max_threads=4, cache=None, mit_clip=True):
+    """
+    Deklariert jede Analyse als Knoten mit ihren Eingaben. Unabhängige Knoten laufen parallel,
+    die Latenz bis /morph liegt damit nahe an der langsamsten Einzelanalyse statt an der Summe.
+    cache: optionaler FeatureCache für Farbpalette und CLIP-Embedding.
+    mit_clip=False: CLIP und Genre laufen nicht im Scheduler (sondern im ClipWorker).
+    """
+    scheduler = AnalyseScheduler(max_threads)
+    scheduler.knoten("helligkeit", berechne_durchschnittshelligkeit, ["gray"])
+    scheduler.knoten("frequenz", berechne_frequenz_index, ["spektrum"])
+    if histogramm_analyse:
+        # Ein Durchlauf über alle Pixel des vollen Crops, die Farbmetriken arbeiten danach nur auf den Bins
+        scheduler.knoten("farbhistogramm", lambda k: berechne_farbhistogramm(k, histogramm_stufen))
+        scheduler.knoten("farbanteile", lambda k, farbhistogramm: farbhistogramm.farbanteile(75, 25), ["farbhistogramm"])
+        scheduler.knoten("segmentierung", lambda k, farbhistogramm: farbhistogramm.segmentierungsgrad(), ["farbhistogramm"])
+        scheduler.knoten("farbharmonie", lambda k, farbhistogramm: farbhistogramm.farbharmonie(anzahl_cluster, 20), ["farbhistogramm"])
+        scheduler.knoten("farbschwerpunkt", lambda k, farbhistogramm: farbhistogramm.farbschwerpunkt_index(20), ["farbhistogramm"])
+    elif gemeinsame_palette:
+        # Ein Lab-KMeans; Segmentierung zählt die bunten, die Farbharmonie die gesättigten Pixel pro Cluster
+        scheduler.knoten("farbanteile", lambda k: berechne_farbanteile(k, 75, 25))
+        scheduler.knoten("palette", lambda k: berechne_gemeinsame_palette(k, anzahl_cluster, 25, 20, segmentierungs_modus), ["lab", "hsv"])
+        scheduler.knoten("segmentierung", lambda k, palette: segmentierungsgrad_aus_palette(k, palette, anzahl_cluster), ["palette"])
+        scheduler.knoten("farbharmonie", lambda k, palette: berechne_farbharmonie(k, palette=farbpalette_aus_palette(palette, anzahl_cluster)),
+                         ["palette"])
+        scheduler.knoten("farbschwerpunkt", lambda k: berechne_farbschwerpunkt_index(k, 20), ["hsv"])
+    else:
+        scheduler.knoten("farbanteile", lambda k: berechne_farbanteile(k, 75, 25))
+        scheduler.knoten("segmentierung", lambda k: berechne_segmentierungsgrad(k, modus=segmentierungs_modus), ["lab", "chroma"])
+        scheduler.knoten("farbharmonie", lambda k: berechne_farbharmonie(k, anzahl_cluster, 20, gecachte_farbpalette(k, anzahl_cluster, cache),
+                                                                        modus=farbharmonie_modus), ["hsv"])
+        scheduler.knoten("farbschwerpunkt", lambda k: berechne_farbschwerpunkt_index(k, 20), ["hsv"])
+    scheduler.knoten("bildrauschen", berechne_bildrausch_index, ["laplacian"])
+    if mit_clip:
+        # clip liefert das clip_analyse-Dict, das Genre kommt aus dem vollständigen Ähnlichkeitsvektor
+        scheduler.knoten("clip", lambda k: clip_analyse(k.bild, cache, k.inhalt_hash if cache else None))
+        scheduler.knoten("genre", lambda k, clip: clip["genre"], ["clip"])
+    return scheduler
+
+class GenreAusgabe:
+    """/genre einer Aufnahme wird genau einmal gesendet: das CLIP-Genre oder, wenn CLIP fehlt oder zu spät kommt, der Fallback."""
+
+    def __init__(self, fallback_genre=None):
+        self.fallback_genre = fallback_genre
+        self.quelle = None
+        self.gesendet = threading.Event()
+        self._sperre = threading.Lock()
+
+    def senden(self, genre_wert, quelle):
+        with self._sperre:
+            if self.quelle is not None:
+                return False
+            self.quelle = quelle
+        client.send_message("/genre", genre_wert)
+        print(f"Senden...genre: {genre_wert:.2f}" + (" (Fallback)" if quelle == "fallback" else ""))
+        self.gesendet.set()
+        return True
+
+    def warte(self, timeout):
+        """True, sobald /genre gesendet wurde; False nach timeout Sekunden."""
+        return self.gesendet.wait(timeout)
+
+    def fallback(self, grund):
+        if self.fallback_genre is not None and self.senden(self.fallback_genre, "fallback"):
+            print(f"🪄 Genre aus den Kennwerten geschätzt ({grund})")
+
+def sende_clip_ergebnis(clip_ergebnis, dateiname=None, index=None, ausgabe=None, fallback=None):
+    top3_Kategorien, genre_wert = clip_ergebnis["top3"], clip_ergebnis["genre"]
+    print("→ KI-Analyse (Top 3 Kategorien):")
+    for beschreibung, score in top3_Kategorien:
+        print(f"  - {beschreibung}: {score:.2%}")
+    top1_genre = genre_abweichung.notiere(top3_Kategorien, genre_wert)
+    if top1_genre is not None:
+        print(f"🎼 Ensemble-Genre {genre_wert} statt Top-1-Genre {top1_genre} – {genre_abweichung.bericht()}")
+
+    if index is not None:
+        # Ähnlichste frühere Zeichnung; bei (fast) identischer Zeichnung bleibt das Genre gleich
+        treffer = index.suche(clip_ergebnis["embedding"], 1)
+        if treffer:
+            ähnlichkeit, eintrag = treffer[0]
+            print(f"🖼️ Ähnelt Zeichnung #{eintrag['id']} ({eintrag.get('datei', '?')}) – Ähnlichkeit {ähnlichkeit:.2f}")
+            if ähnlichkeit >= duplikat_schwelle and "genre" in eintrag:
+                genre_wert = eintrag["genre"]
+                print(f"♻️ Fast identische Zeichnung – Genre {genre_wert} übernommen")
+        index.hinzufuegen(clip_ergebnis["embedding"], datei=os.path.basename(dateiname) if dateiname else None,
+                          genre=genre_wert, top1=top3_Kategorien[0][0])
+
+    # Übereinstimmung des Fallbacks mit CLIP mitzählen
+    ausgabe = ausgabe or GenreAusgabe()
+    if fallback is not None and ausgabe.fallback_genre is not None:
+        rate = fallback.notiere_clip(ausgabe.fallback_genre, clip_ergebnis["genre"])
+        print(f"🧮 Fallback {ausgabe.fallback_genre} | CLIP {clip_ergebnis['genre']} – Übereinstimmung bisher {rate:.0%} ({fallback.vergleiche} Aufnahmen)")
+
+    # Genre per OSC senden
+    if not ausgabe.senden(genre_wert, "clip"):
+        print(f"⌛ CLIP-Genre {genre_wert} kam zu spät, /genre wurde bereits per Fallback gesendet")
+
+def clip_worker_fertig(future, dateiname=None, index=None, ausgabe=None, fallback=None):
+    """Callback des ClipWorker-Futures (läuft im Ergebnis-Thread des Workers)."""
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        ausgelastet = isinstance(future.exception(), KeinFreierSlot)
+        print(f"⚠️ CLIP-Klassifizierung {'übersprungen' if ausgelastet else 'fehlgeschlagen'}: {future.exception()}")
+        if ausgabe is not None:
+            ausgabe.fallback("CLIP ausgelastet" if ausgelastet else "CLIP-Fehler")
+        return
+    sende_clip_ergebnis(future.result(), dateiname, index, ausgabe, fallback)
+
 def map_value(x, in_min, in_max, out_min, out_max):
     return (x - in_min) / (in_max - in_min) * (out_max - out_min) + out_min
 
@@ -133,6 +339,16 @@ def crop_image(image, x, y, width, height):
 def main(x=100, y=100, width=1820, height=980):
     global exposure, brightness, contrast, temp, auto_wb, tint_shift, morphtime, morphtime_min, morphtime_max, morphtime_step
 
+    merke_startzeit("Imports")
+    # CLIP lädt parallel zu Kamerastart und Weißabgleich
+    if clip_worker_aktiv:
+        clip_worker = ClipWorker(backend=clip_backend, quantisieren=clip_int8, cache_pfad=STANDARD_PFAD if feature_cache_aktiv else None)
+        clip_laden = clip_worker.bereit
+    else:
+        clip_worker = None
+        clip_laden = lade_clip_im_hintergrund(clip_backend, clip_int8)
+    clip_laden.add_done_callback(lambda _: merke_startzeit("CLIP bereit"))
+
     print(f"x: {x:.2f}, y: {y:.2f}, width: {width:.2f}, height: {height:.2f}")
     cap = cv2.VideoCapture(0, cv2.CAP_MSMF)
 
@@ -142,10 +358,14 @@ def main(x=100, y=100, width=1820, height=980):
 
     if not cap.isOpened():
         print("Fehler: Kamera konnte nicht geöffnet werden.")
+        if clip_worker is not None:
+            clip_worker.schliessen()
         return
+    merke_startzeit("Kamera geöffnet")
 
     # ----- EINMALIGE Kalibrierung zu Beginn -----
     beste_temp, beste_tint = finde_optimalen_weissabgleich(cap, 75, 25, 100, 0.025, x, y, width, height)
+    merke_startzeit("Weißabgleich")
 
     # Beste Werte setzen
     temp = beste_temp
@@ -154,11 +374,23 @@ def main(x=100, y=100, width=1820, height=980):
     # Kamera-Kalibrierung starten
     apply_settings(cap)
 
+    feature_cache = FeatureCache() if feature_cache_aktiv else None
+    live_schluessel = LiveSchluessel()
+    embedding_index = EmbeddingIndex() if embedding_index_aktiv else None
+    genre_fallback = GenreFallback.laden() if genre_fallback_aktiv else None
+    if genre_fallback_aktiv and genre_fallback is None:
+        print("ℹ️ Kein Genre-Fallback trainiert – /genre kommt nur von CLIP (python -m analysen.genre_fallback <features.csv>)")
+    analyse_scheduler = erstelle_analyse_scheduler(cache=feature_cache, mit_clip=clip_worker is None)
+    renderer = ProjektionsRenderer(kachelgröße=30, bottom_space=250, reihenfolge=projektion_reihenfolge,
+                                   einblenden=projektion_einblenden, ziel_fps=projektion_fps,
+                                   uebergang=projektion_uebergang)
+
     cv2.namedWindow("Morph-Time-Vorschau", cv2.WINDOW_NORMAL)
     cv2.resizeWindow("Morph-Time-Vorschau", 1600, 800) 
 
+    merke_startzeit("Bereit für Aufnahme")
     print("Druecke LEERTASTE für Bildaufnahme, ESC zum Beenden.")
-    print("W/S: Exposure | E/D: Brightness | R/F: Contrast | T/G: Farbtemperatur | Z/H: Tint-Anpassen | A: Auto-WB")
+    print("W/S: Exposure | E/D: Brightness | R/F: Contrast | T/G: Farbtemperatur | Z/H: Tint-Anpassen | A: Auto-WB | P: Projektions-Statistik")
 
     #-------------------------- Aufnahme starten mit Vorschau ----------------------------#
     while True:
@@ -176,6 +408,8 @@ def main(x=100, y=100, width=1820, height=980):
 
         #-------------- Video-Voschau starten --------------#
         cv2.imshow("Live-Vorschau, ESC druecken zum Beenden", frame_tinted)
+        # Alle Fensteraufrufe im Hauptthread: der Renderer liefert nur Frames, gezeigt werden sie hier
+        renderer.anzeigen()
         key = cv2.waitKey(1) & 0xFF
 
     #------------------------- Kamera nachträglich kalibieren ----------------------------#
@@ -223,6 +457,8 @@ def main(x=100, y=100, width=1820, height=980):
         elif key == ord('j'):  # Verringere Morph-Time
             morphtime = max(morphtime - morphtime_step, morphtime_min)
             print(f"↓ Morph-Time: {morphtime} Sek.")
+        elif key == ord('p'):
+            print("🎞️ Projektion:", renderer.bericht())
         elif key == ord('i'):
             cropFactor = min(cropFactor + 0.05, 1.0)
             print(f"↑ Crop-Factor: {cropFactor}")
@@ -246,13 +482,35 @@ def main(x=100, y=100, width=1820, height=980):
             print(f"📸 Bild gespeichert als: {dateiname}")
 
     #--------------------------- Bild-Analyse -------------------------------------#
-            anzahl_cluster = 20
+            # Gemeinsamer Kontext: Gray/HSV/Lab/Masken/Laplace werden pro Aufnahme nur einmal berechnet
+            if pyramiden_analyse:
+                analyse_quelle = AnalysePyramide(frame_tinted, hash_funktion=live_schluessel)
+                kontext = analyse_quelle.kontext_fuer("projektion")
+            else:
+                kontext = AnalyseKontext(frame_tinted_analyse, live_schluessel)
+                analyse_quelle = kontext
+                if histogramm_analyse:
+                    analyse_quelle = VollbildQuelle(kontext, frame_tinted, ["farbhistogramm"], live_schluessel)
 
             client.send_message("/morphtime", morphtime)
             print(f"Senden...morphtime: {morphtime:.2f}")
 
+            # CLIP zuerst an den Worker geben, damit es parallel zu den übrigen Analysen läuft
+            if clip_worker is not None:
+                clip_kontext = analyse_quelle.kontext_fuer("clip")
+                clip_future = clip_worker.klassifiziere(clip_kontext.bild, clip_kontext.inhalt_hash if feature_cache_aktiv else None)
+                clip_start = time.perf_counter()
+
+            # Alle Analysen parallel ausführen, danach wie gewohnt auswerten und senden
+            analyse = analyse_scheduler.ausfuehren(analyse_quelle)
+            print("⏱️ Analyse-Zeiten:")
+            print(analyse.zeitbericht())
+            if "Erste Analyse" not in startzeiten:
+                merke_startzeit("Erste Analyse")
+                drucke_startbericht(clip_laden)
+
             #---------------- Helligkeit ----------------#
-            helligkeit = berechne_durchschnittshelligkeit(frame_tinted_analyse)
+            helligkeit = analyse["helligkeit"]
 
             helligkeit_gemappt = map_value(helligkeit, 0, 255, 20, 600)
             print(f"Durchschnittliche Helligkeit: {helligkeit:.2f}, Gemappte Hellgkeit: {helligkeit_gemappt:.2f}")
@@ -261,7 +519,7 @@ def main(x=100, y=100, width=1820, height=980):
             print(f"Senden...grundton: {helligkeit_gemappt:.2f}")
 
             #---------------- Farbanalyse ---------------#
-            farbanteile = berechne_farbanteile(frame_tinted_analyse, 75, 25)
+            farbanteile = analyse["farbanteile"]
             print("🎨 Farbanteile:")
             for farbe, anteil in farbanteile.items():
                 print(f"  {farbe}: {anteil:.3f}")
@@ -279,7 +537,7 @@ def main(x=100, y=100, width=1820, height=980):
                 print(f"Senden.../{farbe}: {farbanteile_mapped:.2f}")
 
             #------------ Segmentierungsgrad ------------#
-            segmentierungsgrad, clusterbildSegmentierungsGrad = berechne_segmentierungsgrad(frame_tinted_analyse)
+            segmentierungsgrad, clusterbildSegmentierungsGrad = analyse["segmentierung"]
             print(f"Segmentierungs-Grad: {segmentierungsgrad:.2f} | Einfarbig/flächig (gering segmentiert) | bunt/kleinteilig (hoch segmentiert)")
             print("🧭 Interpretation der Werte: ~ 0.0 – 0.2	Sehr gleichmäßige Clustergrößen → Bild hat gleichmäßig verteilte Farben | ~ 0.2 – 0.5	Mäßige Unterschiede in der Flächenverteilung | ~ 0.5 – 1.0+	Einige Cluster dominieren → starke farbliche Fragmentierung oder viele kleine Details")
             
@@ -291,7 +549,7 @@ def main(x=100, y=100, width=1820, height=980):
             client.send_message("/meloSpeed", segmentierungsgradClampedMapped)
 
             #------------- Frequenz-Index --------------#
-            frequenz_index, spectrum = berechne_frequenz_index(frame_tinted_analyse)
+            frequenz_index, spectrum = analyse["frequenz"]
             print(f"Frequenz-Index: {frequenz_index:.2f} | Niedrige Frequenzen → große, flächige Strukturen (ruhige Bilder, wenig Details) | Hohe Frequenzen → viele Kanten, feine Details, Muster (z. B. Kritzeleien, Texturen, Rauschen)")
             print("🧭 Interpretation der Werte: < 0.1	Sehr flächig, fast keine feinen Details | 0.1 – 0.5	Eher ruhig, moderate Details | 0.5 – 1.0	Ausgewogen zwischen Fläche und Detail | > 1.0	Viele feine Details, starke Kanten, „wilde“ Bildstruktur | > 2.0 – 5.0	Sehr detailreich oder rauschig")
             
@@ -301,7 +559,7 @@ def main(x=100, y=100, width=1820, height=980):
             print(f"Senden...drumsample: {frequenz_index_mapped_clamped:.2f}")
 
             #-------------- Farbharmonie ---------------#
-            farbharmonie, farbbalken = berechne_farbharmonie(frame_tinted_analyse, anzahl_cluster, 20)
+            farbharmonie, farbbalken = analyse["farbharmonie"]
             print(f"Farbharmonie: {farbharmonie:.2f} | Große Abstände = starke Kontraste → „unharmonisch“ | Kleine Abstände = ähnliche Farben → „harmonisch“")
             print("🧠 Interpretation des Werts: 1.0 → Sehr harmonisch (ähnliche Farben) | 0.0 → Sehr kontrastreich (komplementäre Farben)")
 
@@ -309,11 +567,11 @@ def main(x=100, y=100, width=1820, height=980):
             print(f"Senden...farbe: {farbharmonie:.2f}")
 
             #---------- Farbschwerpunkt-Index ----------#
-            farbschwerpunkt_index, farbschwerpunkt, farbschwerpunkt_visualisierung = berechne_farbschwerpunkt_index(frame_tinted_analyse, 20)
+            farbschwerpunkt_index, farbschwerpunkt, farbschwerpunkt_visualisierung = analyse["farbschwerpunkt"]
             print(f"Farbschwerpunkt-Index: {farbschwerpunkt_index:.2f}")
 
             #-------------- Bildrauschen ---------------#
-            bildrauschen_index, bildrauschen_varianz = berechne_bildrausch_index(frame_tinted_analyse)
+            bildrauschen_index, bildrauschen_varianz = analyse["bildrauschen"]
             print(f"Bildrauschen-Index: {bildrauschen_index:.2f} | Bildrauschen_Varianz: {bildrauschen_varianz: .2f} | Viele Kanten und hohe Bildfrequenzen = „visuelle Unruhe“")
             print("📊 Typische Werte: 0.0 – 0.2: Sehr glatt, kaum Details | 0.3 – 0.6: Mittlere Textur, normale Bilder | 0.7 – 1.0: Sehr detailreich oder visuell überladen")
 
@@ -321,21 +579,33 @@ def main(x=100, y=100, width=1820, height=980):
             print(f"Senden...melosound: {bildrauschen_index:.2f}")
 
             #---------- Bild-Kategorisierung -----------#
-            top3_Kategorien = klassifiziere_bild_clip(frame_tinted_analyse)
-            print("→ KI-Analyse (Top 3 Kategorien):")
-            for beschreibung, score in top3_Kategorien:
-                print(f"  - {beschreibung}: {score:.2%}")
-            
-            # Genre bestimmen und per OSC senden
-            genre_wert = bestimme_genre_wert(top3_Kategorien)
-            client.send_message("/genre", genre_wert)
-            print(f"Senden...genre: {genre_wert:.2f}")
+            fallback_genre = genre_fallback.vorhersage(merkmale_aus_analyse(analyse))[0] if genre_fallback else None
+            genre_ausgabe = GenreAusgabe(fallback_genre)
+            if clip_worker is None:
+                sende_clip_ergebnis(analyse["clip"], dateiname, embedding_index, genre_ausgabe, genre_fallback)
+            else:
+                # Top 3 und /genre kommen asynchron, sobald der CLIP-Worker fertig ist
+                if not clip_laden.done():
+                    genre_ausgabe.fallback("CLIP lädt noch")
+                clip_future.add_done_callback(partial(clip_worker_fertig, dateiname=dateiname, index=embedding_index,
+                                                      ausgabe=genre_ausgabe, fallback=genre_fallback))
 
             client.send_message("/BPM", 180)
             print(f"Senden...BPM: 180")
 
             time.sleep(0.2)
 
+            # /genre vor /morph: auf CLIP höchstens bis zum Ende des Budgets warten, danach der Fallback.
+            # Gewartet wird in kurzen Schritten, dazwischen werden die Fenster bedient, damit die Oberfläche nicht steht.
+            if clip_worker is not None:
+                while not genre_ausgabe.warte(0) and time.perf_counter() - clip_start < clip_budget:
+                    renderer.anzeigen()
+                    cv2.waitKey(5)
+                if not genre_ausgabe.gesendet.is_set():
+                    genre_ausgabe.fallback("CLIP über Budget")
+                    if not genre_ausgabe.gesendet.is_set():
+                        print("⌛ CLIP über Budget und kein Fallback – /genre folgt nach /morph")
+
             client.send_message("/morph", 1)
             print("Abfahrt!")
 
@@ -354,8 +624,9 @@ def main(x=100, y=100, width=1820, height=980):
             }
 
             #------- Projektion starten -------#
-            # Bild mit Analyse anzeigen (Projektion)
-            projection(frame_tinted, frame_tinted_analyse, analysewerte, morphtime, 30, 250)
+            # Bild mit Analyse an den Renderer übergeben – er baut über morphtime Sekunden auf, die Schleife läuft sofort weiter.
+            # Die Analyse-Ebenen werden freigegeben, sobald der Renderer sein Zielbild gebaut hat.
+            renderer.zeige(frame_tinted, kontext, analysewerte, morphtime, danach=analyse_quelle.freigeben)
 
     #-------------------------- Bild-Erkennung -------------------------------------#
             #text = erkenne_text(frame_tinted_analyse)
@@ -382,7 +653,13 @@ def main(x=100, y=100, width=1820, height=980):
         cv2.imshow("Morph-Time-Vorschau", preview_img)
 
     cap.release()
+    print("🎞️ Projektion:", renderer.bericht())
+    renderer.schliessen()
     cv2.destroyAllWindows()
+    if feature_cache is not None:
+        feature_cache.schliessen()
+    if clip_worker is not None:
+        clip_worker.schliessen()
 
 if __name__ == "__main__":
     main(x=410, y=250, width=1100, height=780)
@@ -11,10 +11,11 @@
 import cv2
 import numpy as np
 
+from analysen.analysis_context import als_kontext
+
 # ------------------------- Bildrausch-Index -------------------------- #
 def visualisiere_bildrausch(image):
-    vis = cv2.Laplacian(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), cv2.CV_8U)
-    vis = cv2.cvtColor(vis, cv2.COLOR_GRAY2BGR)
+    vis = cv2.cvtColor(als_kontext(image).laplacian_8u, cv2.COLOR_GRAY2BGR)
     #cv2.putText(vis, f"Rausch: {index:.2f}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 255, 255), 3)
     return vis
 
@@ -25,7 +26,7 @@ def visualisiere_farbschwerpunkt(image, farbschwerpunkt):
     farbe_rgb = cv2.cvtColor(farbe, cv2.COLOR_HSV2BGR)[0, 0] # type: ignore
     
     # Einfarbiges Bild erzeugen in der errechneten Farbe
-    vis = np.full_like(image, farbe_rgb)
+    vis = np.full_like(als_kontext(image).bild, farbe_rgb)
     #cv2.putText(vis, f"Farbzentrum: H={int(h)}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
     return vis
 
@@ -38,14 +39,14 @@ def visualisiere_frequenzanalyse(spectrum):
 
 # ------------------------- Farbanteile -------------------------- #
 def berechne_farbanteile(image):
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    farben = hsv[:, :, 0].flatten()
+    farben = als_kontext(image).hsv[:, :, 0].flatten()
     hist = cv2.calcHist([farben], [0], None, [12], [0, 180])
     hist_norm = hist / hist.sum()
     return hist_norm
 
 def visualisiere_farbanteile(image):
-    hist = berechne_farbanteile(image)
+    kontext = als_kontext(image)
+    hist = berechne_farbanteile(kontext)
     breite = 50
     hoehe = 400 # Hoehe einstellbar
     bild = np.zeros((hoehe, breite * len(hist), 3), dtype=np.uint8)
@@ -53,6 +54,6 @@ def visualisiere_farbanteile(image):
         farbe = np.uint8([[[i * 15, 255, 255]]]) # type: ignore
         bgr = cv2.cvtColor(farbe, cv2.COLOR_HSV2BGR)[0, 0].tolist() # type: ignore
         cv2.rectangle(bild, (i * breite, hoehe), ((i + 1) * breite, hoehe - int(h * hoehe)), bgr, -1)
-    vis = cv2.resize(bild, (image.shape[1], image.shape[0]))
+    vis = cv2.resize(bild, (kontext.shape[1], kontext.shape[0]))
     #cv2.putText(vis, "Farbanteile", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
     return vis
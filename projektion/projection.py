@@ -8,10 +8,14 @@
 #------------------------------------------------------------
 
 
+import argparse
+import queue
+import threading
+import time
 import cv2
 import numpy as np
-import time
-from screeninfo import get_monitors
+
+from analysen.analysis_context import als_kontext
 
 # Hilfsfunktionen für einzelne Analysen
 from projektion.analysenFuerProjektion import (
@@ -21,122 +25,693 @@ from projektion.analysenFuerProjektion import (
     visualisiere_frequenzanalyse
 )
 
-def projection(image, image_analyse, analysewerte, aufbaudauer=2.0, kachelgröße=25, bottom_space=200):
-    monitore = get_monitors()
-    if len(monitore) < 2:
-        print("⚠️ Nur ein Bildschirm erkannt.")
-        x, y = 0, 0
-        monitor_width = 1280
-        monitor_height = 720
+REIHENFOLGEN = ("raster", "spirale", "zufall")
+UEBERGAENGE = ("kacheln", "morph")  # Kachelaufbau über dem alten Bild oder Überblendung vom alten zum neuen
+SKALA = 60000  # Aufbau-Fortschritt 0…1 als uint16 in der Aufdeck-Karte (Rest bis 65535 bleibt für das Einblenden)
+
+# ---------------------- Aufdeck-Karte ---------------------- #
+def kachel_reihenfolge(zeilen, spalten, reihenfolge="raster", rng=None):
+    """Rang jeder Kachel (zeilen x spalten) in der Aufbaureihenfolge: 0 zuerst."""
+    anzahl = zeilen * spalten
+    if reihenfolge == "raster":
+        rang = np.arange(anzahl)
+    elif reihenfolge == "spirale":
+        # Ring für Ring von der Mitte nach außen, innerhalb eines Rings im Uhrzeigersinn
+        y, x = np.mgrid[:zeilen, :spalten]
+        dy, dx = y - (zeilen - 1) / 2, x - (spalten - 1) / 2
+        ring = np.maximum(np.abs(dy), np.abs(dx))
+        winkel = np.arctan2(dy, dx) % (2 * np.pi)
+        folge = np.lexsort((winkel.ravel(), ring.ravel()))
+        rang = np.empty(anzahl, dtype=np.int64)
+        rang[folge] = np.arange(anzahl)
+    elif reihenfolge == "zufall":
+        rang = (rng if rng is not None else np.random.default_rng()).permutation(anzahl)
     else:
-        monitor = monitore[1]
-        x, y = monitor.x, monitor.y
-        monitor_width = monitor.width
-        monitor_height = monitor.height
+        raise ValueError(f"Unbekannte Reihenfolge: {reihenfolge}")
+    return rang.reshape(zeilen, spalten)
+
+def aufdeck_karte(hoehe, breite, kachelgröße=25, reihenfolge="raster", rng=None):
+    """Aufdeck-Zeitpunkt jedes Pixels (uint16, 0…SKALA) – alle Pixel einer Kachel teilen ihren Zeitpunkt."""
+    zeilen, spalten = -(-hoehe // kachelgröße), -(-breite // kachelgröße)
+    rang = kachel_reihenfolge(zeilen, spalten, reihenfolge, rng)
+    werte = (rang * SKALA // rang.size).astype(np.uint16)
+    return np.repeat(np.repeat(werte, kachelgröße, axis=0), kachelgröße, axis=1)[:hoehe, :breite]
+
+# ---------------------- Kompositor ---------------------- #
+class KachelKompositor:
+    """
+    Baut ein fertiges Zielbild kachelweise auf. Jede Region (Hauptbild, Analysefelder) bekommt einmalig ihre
+    Aufdeck-Karte; ein Frame entsteht danach aus wenigen uint8-/uint16-Operationen in vorab angelegte Puffer –
+    ohne Python-Schleife über Kacheln. Neu berechnet werden nur waagrechte Streifen (je eine Kachelhöhe), in denen
+    sich seit dem letzten Frame etwas ändert; nach dem Aufbau ist ein Frame kostenlos (fertig, geaendert=False).
+    einblenden: Sekunden, in denen eine aufgedeckte Kachel vom Hintergrund auf das Zielbild übergeht (0 = hart).
+    vorher: Hintergrund, über dem aufgebaut wird (z. B. der zuletzt gezeigte Frame); ohne vorher ist er schwarz.
+    """
+
+    def __init__(self, ziel, regionen, kachelgröße=25, reihenfolge="raster", aufbaudauer=2.0, einblenden=0.0, rng=None, vorher=None):
+        self.ziel = np.ascontiguousarray(ziel, dtype=np.uint8)
+        hoehe, breite = self.ziel.shape[:2]
+        self.aufbaudauer = max(aufbaudauer, 1e-3)
+        self.karte = np.zeros((hoehe, breite), dtype=np.uint16)
+        for y1, y2, x1, x2 in regionen:
+            self.karte[y1:y2, x1:x2] = aufdeck_karte(y2 - y1, x2 - x1, kachelgröße, reihenfolge, rng)
+
+        # Frühester und spätester Aufdeck-Zeitpunkt pro Streifen
+        self._streifen = np.append(np.arange(0, hoehe, kachelgröße), hoehe)
+        zeilen_min, zeilen_max = self.karte.min(axis=1), self.karte.max(axis=1)
+        self._streifen_min = np.minimum.reduceat(zeilen_min, self._streifen[:-1]).astype(np.float64)
+        self._streifen_max = np.maximum.reduceat(zeilen_max, self._streifen[:-1]).astype(np.float64)
+        self._letzte_schwelle = 0.0
+
+        # Einblenddauer in Karten-Einheiten, höchstens so lang wie der Aufbau selbst
+        self._einblenden = min(einblenden / self.aufbaudauer, 1.0) * SKALA if einblenden > 0 else 0.0
+        self._ende = SKALA + self._einblenden
+
+        if vorher is not None and vorher.shape != self.ziel.shape:
+            vorher = cv2.resize(vorher, (breite, hoehe))
+        self.vorher = vorher
+        self.puffer = np.zeros_like(self.ziel) if vorher is None else vorher.copy()
+        self._maske = np.empty((hoehe, breite), dtype=np.uint8)
+        if self._einblenden:
+            self._differenz = np.empty((hoehe, breite), dtype=np.uint16)
+            self._alpha3 = np.empty_like(self.ziel)
+            self._rest = np.empty_like(self.ziel) if vorher is not None else None
+        self.fertig = False
+        self.geaendert = False
+        self.zeilen = 0  # im letzten Frame neu berechnete Bildzeilen
+
+    def frame(self, vergangen):
+        """Frame nach vergangen Sekunden (in self.puffer, wird beim nächsten Aufruf überschrieben)."""
+        self.geaendert, self.zeilen = False, 0
+        if self.fertig:
+            return self.puffer
+        schwelle = min(vergangen / self.aufbaudauer * SKALA, self._ende)
+
+        # Streifen mit einer Kachel, die seit der letzten Schwelle aufgedeckt wurde oder noch einblendet
+        aktiv = (self._streifen_min < schwelle) & (self._streifen_max >= self._letzte_schwelle - self._einblenden)
+        kanten = np.flatnonzero(np.diff(np.concatenate(([0], aktiv.view(np.int8), [0]))))
+        for anfang, ende in zip(kanten[::2], kanten[1::2]):
+            y1, y2 = self._streifen[anfang], self._streifen[ende]
+            self._zeichne(slice(y1, y2), schwelle)
+            self.zeilen += y2 - y1
+
+        self.geaendert = self.zeilen > 0
+        self._letzte_schwelle = schwelle
+        self.fertig = schwelle >= self._ende
+        return self.puffer
+
+    def _zeichne(self, zeilen, schwelle):
+        karte, maske, ziel, puffer = self.karte[zeilen], self._maske[zeilen], self.ziel[zeilen], self.puffer[zeilen]
+        if not self._einblenden:
+            cv2.compare(karte, schwelle, cv2.CMP_LT, dst=maske)
+            cv2.copyTo(ziel, maske, puffer)
+            return
+        # alpha = (schwelle - karte) / einblenden, gesättigt auf 0…255
+        alpha3 = self._alpha3[zeilen]
+        cv2.subtract(schwelle, karte, dst=self._differenz[zeilen])
+        cv2.convertScaleAbs(self._differenz[zeilen], dst=maske, alpha=255.0 / self._einblenden)
+        cv2.cvtColor(maske, cv2.COLOR_GRAY2BGR, dst=alpha3)
+        cv2.multiply(ziel, alpha3, dst=puffer, scale=1 / 255)
+        if self.vorher is not None:
+            # + vorher * (255 - alpha) / 255
+            cv2.bitwise_not(alpha3, dst=alpha3)
+            cv2.multiply(self.vorher[zeilen], alpha3, dst=self._rest[zeilen], scale=1 / 255)
+            cv2.add(puffer, self._rest[zeilen], dst=puffer)
+
+class MorphKompositor:
+    """
+    Überblendet vom vorherigen Projektionsbild (Hauptbild und Analysefelder) zum neuen über aufbaudauer Sekunden.
+    Festkomma ohne Gleitkomma pro Pixel: out = vorher + ((ziel - vorher) * a >> 7) mit a = 0…128 in int16,
+    streifenweise in vorab angelegte Puffer. Neu gerechnet wird nur, wenn a sich ändert – höchstens 128 Mal
+    pro Überblendung, alle Frames dazwischen sind kostenlos (geaendert=False). Ohne vorher: aus Schwarz.
+    """
+
+    BITS = 7  # (ziel - vorher) * 2^7 passt in int16
+    STUFEN = 1 << BITS
+
+    def __init__(self, ziel, vorher=None, aufbaudauer=2.0, streifen=32):
+        self.ziel = np.ascontiguousarray(ziel, dtype=np.uint8)
+        hoehe, breite = self.ziel.shape[:2]
+        if vorher is None:
+            vorher = np.zeros_like(self.ziel)
+        elif vorher.shape != self.ziel.shape:
+            vorher = cv2.resize(vorher, (breite, hoehe))
+        self.aufbaudauer = max(aufbaudauer, 1e-3)
+
+        self._vorher = vorher.astype(np.int16)
+        self._differenz = np.subtract(self.ziel, vorher, dtype=np.int16)
+        self._streifen = streifen
+        self._temp = np.empty((streifen, breite, 3), dtype=np.int16)
+        self._stufe = 0
+
+        self.puffer = np.array(vorher, dtype=np.uint8, copy=True)
+        self.fertig = False
+        self.geaendert = False
+        self.zeilen = 0
 
-    h, w, _ = image.shape
-    bild_height = monitor_height - bottom_space
-    bild_width = monitor_width
-    bild_resized = cv2.resize(image, (bild_width, bild_height))
+    def frame(self, vergangen):
+        """Frame nach vergangen Sekunden (in self.puffer, wird beim nächsten Aufruf überschrieben)."""
+        self.geaendert, self.zeilen = False, 0
+        if self.fertig:
+            return self.puffer
+        stufe = min(int(vergangen / self.aufbaudauer * self.STUFEN), self.STUFEN)
+        if stufe != self._stufe:
+            hoehe = len(self.puffer)
+            # Streifen von wenigen Zeilen bleiben zwischen den vier Durchgängen im Cache
+            for y in range(0, hoehe, self._streifen):
+                zeilen = slice(y, min(y + self._streifen, hoehe))
+                temp = self._temp[:zeilen.stop - y]
+                np.multiply(self._differenz[zeilen], stufe, out=temp)
+                np.right_shift(temp, self.BITS, out=temp)
+                np.add(temp, self._vorher[zeilen], out=temp)
+                np.copyto(self.puffer[zeilen], temp, casting="unsafe")  # Werte liegen sicher in 0…255
+            self._stufe = stufe
+            self.geaendert, self.zeilen = True, hoehe
+        self.fertig = stufe == self.STUFEN
+        return self.puffer
 
-    anim_frame = np.zeros_like(bild_resized)
+def erstelle_kompositor(ziel, regionen, uebergang="kacheln", kachelgröße=25, reihenfolge="raster", aufbaudauer=2.0,
+                        einblenden=0.0, rng=None, vorher=None):
+    """KachelKompositor oder MorphKompositor für uebergang ("kacheln" oder "morph")."""
+    if uebergang == "kacheln":
+        return KachelKompositor(ziel, regionen, kachelgröße, reihenfolge, aufbaudauer, einblenden, rng, vorher)
+    if uebergang == "morph":
+        return MorphKompositor(ziel, vorher, aufbaudauer)
+    raise ValueError(f"Unbekannter Übergang: {uebergang}")
 
-    # Leere Maske für Alphablending jeder Kachel
-    alpha_mask = np.zeros((bild_height, bild_width), dtype=np.float32)
+# ---------------------- Projektionsbild ---------------------- #
+def baue_projektionsbild(image, image_analyse, analysewerte, breite, hoehe, bottom_space=200):
+    """Fertiges Zielbild (Hauptbild oben, sieben Analysefelder unten) und die Regionen für den Kachelaufbau."""
+    bild_height = hoehe - bottom_space
+    ziel = np.zeros((hoehe, breite, 3), dtype=np.uint8)
+    ziel[:bild_height] = cv2.resize(image, (breite, bild_height))
+    regionen = [(0, bild_height, 0, breite)]
 
     # Analysevorschauen vorbereiten (jetzt ohne Neu-Berechnung)
+    # image_analyse darf auch der AnalyseKontext der Aufnahme sein → Gray/HSV/Laplace werden wiederverwendet
+    kontext = als_kontext(image_analyse)
     vorschauen = [
-        (visualisiere_bildrausch(image_analyse.copy()), analysewerte.get("bildrausch_index", None), "Bildrausch"),
+        (visualisiere_bildrausch(kontext), analysewerte.get("bildrausch_index", None), "Bildrausch"),
         (analysewerte.get("farbbalken", None), analysewerte.get("farbharmonie", None), "Farbharmonie"),
-        (visualisiere_farbanteile(image_analyse.copy()), None, "Farbanteile"),
+        (visualisiere_farbanteile(kontext), None, "Farbanteile"),
         (visualisiere_frequenzanalyse(analysewerte.get("frequenz_spektrum", None)), analysewerte.get("frequenzverteilung", None), "Frequenz"),
         (analysewerte.get("clusterbildSegmentierungsGrad", None), analysewerte.get("segmentierungsgrad", None), "Segmentierung"),
-        (visualisiere_farbschwerpunkt(image_analyse.copy(), analysewerte.get("farbschwerpunkt_projektion_farbe", None)), analysewerte.get("farbschwerpunkt", None), "Farbschwerpunkt-Farbe"),
+        (visualisiere_farbschwerpunkt(kontext, analysewerte.get("farbschwerpunkt_projektion_farbe", None)), analysewerte.get("farbschwerpunkt", None), "Farbschwerpunkt-Farbe"),
         (analysewerte.get("farbschwerpunkt_visualisierung_pfeil", None), analysewerte.get("farbschwerpunkt", None), "Farbschwerpunkt-Farbe")
     ]
 
-    vorschau_height = bottom_space
-    einzel_width = int(monitor_width / len(vorschauen))
-    analyse_frames = []
-    for vorschau, wert, titel in vorschauen:
-        resized = cv2.resize(vorschau, (einzel_width, vorschau_height))
-        if wert is not None:
-            cv2.putText(resized, f"{titel}: {wert:.2f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    # Felder füllen die Breite lückenlos, statt die Zeile nachträglich zu skalieren
+    grenzen = np.linspace(0, breite, len(vorschauen) + 1).astype(int)
+    for (vorschau, wert, titel), x1, x2 in zip(vorschauen, grenzen[:-1], grenzen[1:]):
+        if vorschau is not None:
+            feld = cv2.resize(vorschau, (x2 - x1, bottom_space))
+        else:
+            feld = np.zeros((bottom_space, x2 - x1, 3), dtype=np.uint8)
+        beschriftung = f"{titel}: {wert:.2f}" if wert is not None else titel
+        cv2.putText(feld, beschriftung, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        ziel[bild_height:, x1:x2] = feld
+        regionen.append((bild_height, hoehe, x1, x2))
+    return ziel, regionen
+
+# ---------------------- Ausgaben ---------------------- #
+def projektions_monitor():
+    """(x, y, Breite, Höhe) des Projektors – der zweite Bildschirm, sonst ein 1280x720-Fenster auf dem ersten."""
+    try:
+        from screeninfo import get_monitors
+    except ImportError:
+        print("⚠️ screeninfo nicht installiert – Projektion in 1280x720.")
+        return 0, 0, 1280, 720
+    monitore = get_monitors()
+    if len(monitore) < 2:
+        print("⚠️ Nur ein Bildschirm erkannt.")
+        return 0, 0, 1280, 720
+    monitor = monitore[1]
+    return monitor.x, monitor.y, monitor.width, monitor.height
+
+class FensterAusgabe:
+    """Vollbildfenster auf dem Projektor (OpenCV-HighGUI). Alle Aufrufe müssen aus demselben Thread kommen."""
+
+    interaktiv = True
+
+    def __init__(self, fenstername="Projektion"):
+        self.fenstername = fenstername
+        self.x, self.y, self.breite, self.hoehe = projektions_monitor()
+
+    def oeffnen(self):
+        cv2.namedWindow(self.fenstername, cv2.WND_PROP_FULLSCREEN)
+        cv2.setWindowProperty(self.fenstername, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+        cv2.moveWindow(self.fenstername, self.x, self.y)
+
+    def zeige(self, frame):
+        cv2.imshow(self.fenstername, frame)
+
+    def warte(self, ms):
+        """Wartet ms Millisekunden, verarbeitet Fenster-Ereignisse und gibt die gedrückte Taste zurück (-1: keine)."""
+        return cv2.waitKey(ms)
+
+    def schliessen(self):
+        cv2.destroyWindow(self.fenstername)
+
+class FensterUebergabe:
+    """
+    Projektorfenster für einen Renderer in einem Hintergrund-Thread. HighGUI ist nur unter Win32 thread-fest,
+    unter GTK und Qt müssen namedWindow, imshow und waitKey aus dem Hauptthread kommen. Der Render-Thread legt
+    hier nur den neuesten Frame ab; anzeigen() im Hauptthread öffnet das Fenster und zeigt ihn,
+    die Fenster-Ereignisse verarbeitet das cv2.waitKey der Hauptschleife.
+    """
+
+    interaktiv = True
+
+    def __init__(self, fenster=None):
+        self.fenster = fenster or FensterAusgabe()
+        self.breite, self.hoehe = self.fenster.breite, self.fenster.hoehe
+        self._bild = None
+        self._neu = False
+        self._offen = False
+        self._geschlossen = False
+        self._sperre = threading.Lock()
+
+    def oeffnen(self):
+        pass  # das Fenster öffnet anzeigen() im Hauptthread
+
+    def zeige(self, frame):
+        # Render-Thread: Kopie in einen festen Puffer, der Kompositor schreibt weiter in seinen eigenen
+        with self._sperre:
+            if self._bild is None or self._bild.shape != frame.shape:
+                self._bild = np.empty_like(frame)
+            np.copyto(self._bild, frame)
+            self._neu = True
+
+    def warte(self, ms):
+        time.sleep(ms / 1000)
+        return -1
+
+    def schliessen(self):
+        with self._sperre:
+            self._geschlossen = True
+
+    def anzeigen(self):
+        """Nur aus dem Hauptthread: neuesten Frame zeigen (bzw. das Fenster schließen); True, wenn ein Frame gezeigt wurde."""
+        with self._sperre:
+            if self._geschlossen:
+                if self._offen:
+                    self.fenster.schliessen()
+                    self._offen = False
+                return False
+            if not self._neu:
+                return False
+            if not self._offen:
+                self.fenster.oeffnen()
+                self._offen = True
+            self.fenster.zeige(self._bild)
+            self._neu = False
+        return True
+
+class ArrayAusgabe:
+    """
+    Headless: sammelt Kopien der gezeigten Frames in self.frames (Tests, Benchmarks).
+    echtzeit=False: warte() kehrt sofort zurück, ein Renderer läuft dann so schnell wie er kann.
+    """
+
+    interaktiv = False
+
+    def __init__(self, breite=1920, hoehe=1080, echtzeit=False):
+        self.breite, self.hoehe = breite, hoehe
+        self.echtzeit = echtzeit
+        self.frames = []
+
+    def oeffnen(self):
+        pass
+
+    def zeige(self, frame):
+        self.frames.append(frame.copy())
+
+    def warte(self, ms):
+        if self.echtzeit:
+            time.sleep(ms / 1000)
+        return -1
+
+    def schliessen(self):
+        pass
+
+class VideoAusgabe(ArrayAusgabe):
+    """Headless: schreibt jeden gezeigten Frame mit cv2.VideoWriter in eine Videodatei mit fester Bildrate."""
+
+    def __init__(self, pfad, breite=1920, hoehe=1080, fps=30, codec="mp4v", echtzeit=False):
+        super().__init__(breite, hoehe, echtzeit)
+        self.pfad, self.fps, self.codec = pfad, fps, codec
+        self.anzahl = 0
+        self._schreiber = None
+
+    def oeffnen(self):
+        self._schreiber = cv2.VideoWriter(self.pfad, cv2.VideoWriter_fourcc(*self.codec), self.fps, (self.breite, self.hoehe))
+        if not self._schreiber.isOpened():
+            raise IOError(f"Video kann nicht geschrieben werden: {self.pfad} (Codec {self.codec})")
+
+    def zeige(self, frame):
+        self._schreiber.write(frame)
+        self.anzahl += 1
+
+    def schliessen(self):
+        if self._schreiber is not None:
+            self._schreiber.release()
+            self._schreiber = None
+
+# ---------------------- Frame-Takt ---------------------- #
+class FrameTakt:
+    """
+    Frame-Pacing auf ziel_fps mit Statistik: gezeigte Frames, verpasste Frame-Termine (Rendern + Anzeigen dauerte
+    länger als ein Intervall), mittlere Renderzeit und CPU-Anteil des Render-Threads seit zuruecksetzen().
+    Alle Methoden außer statistik() laufen im Render-Thread.
+    """
+
+    def __init__(self, ziel_fps=60):
+        self.intervall = 1.0 / ziel_fps
+        self.zuruecksetzen()
+
+    def zuruecksetzen(self):
+        self.frames = 0
+        self.verpasst = 0
+        self._render_s = 0.0
+        self._start = self._naechster = time.perf_counter()
+        self._start_cpu = time.thread_time()
+        self._wand_s = self._cpu_s = self._animation_s = 0.0
+
+    def gezeigt(self, render_s):
+        self.frames += 1
+        self._render_s += render_s
+        self._animation_s = time.perf_counter() - self._start
+
+    def wartezeit_ms(self):
+        """Millisekunden bis zum nächsten Frame-Termin; verpasste Termine werden gezählt und übersprungen."""
+        self._naechster += self.intervall
+        jetzt = self._messen()
+        if jetzt > self._naechster:
+            verpasst = int((jetzt - self._naechster) / self.intervall) + 1
+            self.verpasst += verpasst
+            self._naechster += verpasst * self.intervall
+        return max(1, int(round((self._naechster - jetzt) * 1000)))
+
+    def leerlauf(self):
+        """Im Leerlauf gibt es keine Termine; der Takt beginnt mit dem nächsten Frame neu."""
+        self._naechster = self._messen()
+
+    def _messen(self):
+        jetzt = time.perf_counter()
+        self._wand_s = jetzt - self._start
+        self._cpu_s = time.thread_time() - self._start_cpu
+        return jetzt
+
+    def statistik(self):
+        return {
+            "frames": self.frames,
+            "verpasst": self.verpasst,
+            "render_ms": self._render_s * 1000 / max(self.frames, 1),
+            "fps": self.frames / self._animation_s if self._animation_s > 0 else 0.0,
+            "cpu_anteil": self._cpu_s / self._wand_s if self._wand_s > 0 else 0.0,
+            "dauer_s": self._wand_s,
+        }
+
+    def bericht(self):
+        werte = self.statistik()
+        return (f"{werte['frames']} Frames, {werte['fps']:.1f} fps (Ziel {1 / self.intervall:.0f}) | verpasst: {werte['verpasst']} | Ø {werte['render_ms']:.2f} ms/Frame | "
+                f"CPU {werte['cpu_anteil']:.0%} eines Kerns über {werte['dauer_s']:.1f} s")
+
+def projection(image, image_analyse, analysewerte, aufbaudauer=2.0, kachelgröße=25, bottom_space=200, reihenfolge="raster", einblenden=0.3,
+               ziel_fps=60, ausgabe=None, uebergang="kacheln"):
+    """Projiziert eine Aufnahme, bis ESC gedrückt wird (bei einer headless Ausgabe: bis der Aufbau fertig ist)."""
+    ausgabe = ausgabe or FensterAusgabe()
+    ziel, regionen = baue_projektionsbild(image, image_analyse, analysewerte, ausgabe.breite, ausgabe.hoehe, bottom_space)
+    kompositor = erstelle_kompositor(ziel, regionen, uebergang, kachelgröße, reihenfolge, aufbaudauer, einblenden)
+    ausgabe.oeffnen()
+
+    takt = FrameTakt(ziel_fps)
+    start_time = time.perf_counter()
+    try:
+        while True:
+            if not kompositor.fertig:
+                render_start = time.perf_counter()
+                frame = kompositor.frame(render_start - start_time)
+                if kompositor.geaendert:
+                    ausgabe.zeige(frame)
+                takt.gezeigt(time.perf_counter() - render_start)
+                warten = takt.wartezeit_ms()
+            elif not ausgabe.interaktiv:
+                break
+            else:
+                # Leerlauf: das Fenster behält den letzten Frame, nur noch Tasten abfragen
+                takt.leerlauf()
+                warten = 50
+
+            if ausgabe.warte(warten) & 0xFF == 27:
+                break
+    finally:
+        ausgabe.schliessen()
+    print("🎞️ Projektion:", takt.bericht())
+
+# ---------------------- Headless mit simulierter Uhr ---------------------- #
+def simulierte_frames(kompositor, fps=30, nachlauf=0.0):
+    """
+    (t, Frame) für t = 0, 1/fps, 2/fps … bis der Aufbau fertig ist, plus nachlauf Sekunden Standbild.
+    Die Uhr ist simuliert: das Ergebnis hängt nicht von der Rechengeschwindigkeit ab.
+    """
+    i, ende = 0, None
+    while ende is None or i <= ende:
+        t = i / fps
+        frame = kompositor.frame(t)
+        yield t, frame
+        if kompositor.fertig and ende is None:
+            ende = i + int(round(nachlauf * fps))
+        i += 1
+
+def rendere_offline(image, image_analyse, analysewerte, morphtime=20, ausgabe=None, fps=30, kachelgröße=30, bottom_space=250,
+                    reihenfolge="raster", einblenden=0.0, seed=0, vorher=None, nachlauf=0.0, uebergang="kacheln"):
+    """
+    Rendert den kompletten Aufbau über morphtime Sekunden mit simulierter Uhr in eine headless Ausgabe
+    (Standard: ArrayAusgabe 1920x1080). Jeder Takt wird ausgegeben, auch unveränderte Frames – ein Video hat so
+    die richtige Länge. Mit festem seed sind auch zufällige Reihenfolgen bei jedem Lauf bitgleich.
+    Gibt (ausgabe, statistik) zurück.
+    """
+    ausgabe = ausgabe or ArrayAusgabe()
+    ziel, regionen = baue_projektionsbild(image, image_analyse, analysewerte, ausgabe.breite, ausgabe.hoehe, bottom_space)
+    kompositor = erstelle_kompositor(ziel, regionen, uebergang, kachelgröße, reihenfolge, morphtime, einblenden,
+                                     np.random.default_rng(seed), vorher)
+
+    ausgabe.oeffnen()
+    frames, render_s, start = 0, 0.0, time.perf_counter()
+    try:
+        erzeuger = simulierte_frames(kompositor, fps, nachlauf)
+        while True:
+            render_start = time.perf_counter()
+            try:
+                t, frame = next(erzeuger)
+            except StopIteration:
+                break
+            render_s += time.perf_counter() - render_start
+            ausgabe.zeige(frame)
+            frames += 1
+    finally:
+        ausgabe.schliessen()
+
+    dauer = time.perf_counter() - start
+    statistik = {"frames": frames, "video_s": frames / fps, "dauer_s": dauer,
+                 "render_ms": render_s * 1000 / max(frames, 1), "echtzeit_faktor": frames / fps / dauer if dauer > 0 else 0.0}
+    return ausgabe, statistik
+
+# ---------------------- Renderer-Thread ---------------------- #
+class ProjektionsRenderer:
+    """
+    Langlebige Projektion in einem eigenen Thread: zeige() legt die neue Aufnahme in eine Warteschlange und kehrt
+    sofort zurück, der Thread baut Zielbild und Kompositor selbst und animiert unabhängig von der Aufnahmeschleife.
+    Eine neue Aufnahme wird über dem zuletzt gezeigten Frame aufgebaut; noch nicht begonnene ältere Aufträge
+    werden verworfen, es zählt immer die neueste Aufnahme.
+    ausgabe: FensterUebergabe (Standard, das Fenster bedient anzeigen() im Hauptthread) oder eine headless Ausgabe;
+    feste Bildraten liefert rendere_offline.
+    uebergang="morph": statt Kachelaufbau wird vom zuletzt gezeigten Frame zum neuen Bild überblendet.
+    """
+
+    def __init__(self, kachelgröße=25, bottom_space=200, reihenfolge="raster", einblenden=0.3, ausgabe=None,
+                 ziel_fps=60, leerlauf_ms=50, uebergang="kacheln"):
+        self.kachelgröße = kachelgröße
+        self.bottom_space = bottom_space
+        self.reihenfolge = reihenfolge
+        self.einblenden = einblenden
+        self.uebergang = uebergang
+        self.ausgabe = ausgabe or FensterUebergabe()
+        self.leerlauf_ms = leerlauf_ms
+        self.verworfen = 0  # Aufnahmen, die von einer neueren überholt wurden, bevor sie zu sehen waren
+        self.takt = FrameTakt(ziel_fps)  # Statistik seit der letzten neuen Aufnahme
+
+        self._auftraege = queue.Queue(maxsize=1)
+        self._beendet = threading.Event()
+        self._thread = threading.Thread(target=self._schleife, name="projektion", daemon=True)
+        self._thread.start()
+
+    def zeige(self, image, image_analyse, analysewerte, aufbaudauer=2.0, danach=None):
+        """
+        Neue Aufnahme projizieren (blockiert nie). danach: optionale Funktion, die der Renderer aufruft,
+        sobald das Zielbild gebaut ist (z. B. AnalysePyramide.freigeben).
+        """
+        auftrag = (image, image_analyse, analysewerte, aufbaudauer, danach)
+        while True:
+            try:
+                self._auftraege.put_nowait(auftrag)
+                return
+            except queue.Full:
+                try:
+                    veraltet = self._auftraege.get_nowait()
+                except queue.Empty:
+                    continue
+                self.verworfen += 1
+                if veraltet[4] is not None:
+                    veraltet[4]()
+
+    def _schleife(self):
+        ausgabe = self.ausgabe
+        ausgabe.oeffnen()
+        kompositor, start = None, 0.0
+        try:
+            while not self._beendet.is_set():
+                try:
+                    image, image_analyse, analysewerte, aufbaudauer, danach = self._auftraege.get_nowait()
+                except queue.Empty:
+                    pass
+                else:
+                    try:
+                        ziel, regionen = baue_projektionsbild(image, image_analyse, analysewerte, ausgabe.breite, ausgabe.hoehe,
+                                                                self.bottom_space)
+                    except Exception as fehler:
+                        print(f"⚠️ Projektion: Zielbild konnte nicht gebaut werden: {fehler!r}")
+                        continue
+                    finally:
+                        if danach is not None:
+                            danach()
+                    vorher = kompositor.puffer if kompositor is not None else None
+                    kompositor = erstelle_kompositor(ziel, regionen, self.uebergang, self.kachelgröße, self.reihenfolge,
+                                                     aufbaudauer, self.einblenden, vorher=vorher)
+                    self.takt.zuruecksetzen()
+                    start = time.perf_counter()
+
+                if kompositor is None or kompositor.fertig:
+                    # Leerlauf: kein Neuzusammensetzen, kein Hochladen
+                    self.takt.leerlauf()
+                    ausgabe.warte(self.leerlauf_ms)
+                    continue
+
+                render_start = time.perf_counter()
+                frame = kompositor.frame(render_start - start)
+                if kompositor.geaendert:
+                    ausgabe.zeige(frame)
+                self.takt.gezeigt(time.perf_counter() - render_start)
+                if kompositor.fertig:
+                    print("🎞️ Projektion aufgebaut:", self.takt.bericht())
+                ausgabe.warte(self.takt.wartezeit_ms())
+        finally:
+            ausgabe.schliessen()
+
+    def statistik(self):
+        """Frames, verpasste Frames, Renderzeit und CPU-Anteil seit der letzten neuen Aufnahme (inkl. Leerlauf)."""
+        return dict(self.takt.statistik(), verworfene_aufnahmen=self.verworfen)
+
+    def bericht(self):
+        return f"{self.takt.bericht()} | verworfene Aufnahmen: {self.verworfen}"
+
+    def anzeigen(self):
+        """Aus dem Hauptthread vor dessen cv2.waitKey aufrufen: zeigt den neuesten Frame im Projektorfenster."""
+        anzeigen = getattr(self.ausgabe, "anzeigen", None)
+        return anzeigen() if anzeigen is not None else False
+
+    def schliessen(self, timeout=2):
+        """Aus dem Hauptthread: Render-Thread beenden und das Fenster schließen."""
+        self._beendet.set()
+        self._thread.join(timeout)
+        self.anzeigen()
+
+# ---------------------- Messung ---------------------- #
+def miss_kompositor(breite=1920, hoehe=1080, kachelgröße=25, bottom_space=200, frames=120):
+    """Mittlere Renderzeit pro Frame (ms) je Reihenfolge, hart und mit Einblenden – ohne Fenster."""
+    rng = np.random.default_rng(0)
+    ziel = rng.integers(0, 256, (hoehe, breite, 3), dtype=np.uint8)
+    grenzen = np.linspace(0, breite, 8).astype(int)
+    regionen = [(0, hoehe - bottom_space, 0, breite)] + [(hoehe - bottom_space, hoehe, x1, x2) for x1, x2 in zip(grenzen[:-1], grenzen[1:])]
+    ergebnisse = {}
+    for reihenfolge in REIHENFOLGEN:
+        for einblenden in (0.0, 0.3):
+            kompositor = KachelKompositor(ziel, regionen, kachelgröße, reihenfolge, 2.0, einblenden, rng)
+            start = time.perf_counter()
+            for i in range(frames):
+                kompositor.frame(2.0 * i / frames)  # nur Frames während des Aufbaus
+            ms = (time.perf_counter() - start) * 1000 / frames
+            ergebnisse[(reihenfolge, einblenden)] = ms
+            print(f"{reihenfolge:<8} einblenden {einblenden:.1f} s: {ms:5.2f} ms/Frame ({1000 / ms:5.0f} fps möglich) bei {breite}x{hoehe}")
+
+    # Überblendung: Mittel über alle Frames und Kosten eines Frames, in dem neu gerechnet wird
+    kompositor = MorphKompositor(ziel, rng.integers(0, 256, ziel.shape, dtype=np.uint8), 2.0)
+    gerechnet, gerechnet_s, start = 0, 0.0, time.perf_counter()
+    for i in range(frames):
+        frame_start = time.perf_counter()
+        kompositor.frame(2.0 * i / frames)
+        if kompositor.geaendert:
+            gerechnet += 1
+            gerechnet_s += time.perf_counter() - frame_start
+    ms = (time.perf_counter() - start) * 1000 / frames
+    ergebnisse[("morph", None)] = ms
+    print(f"morph    Überblendung:    {ms:5.2f} ms/Frame ({1000 / ms:5.0f} fps möglich) bei {breite}x{hoehe}, "
+          f"{gerechnet_s * 1000 / max(gerechnet, 1):.2f} ms pro neu gerechnetem Frame")
+    return ergebnisse
+
+def analysewerte_aus_bild(bild, groesse=(320, 240)):
+    """Kontext und analysewerte wie in main.py, für Projektionen ohne Kamera (headless, Tests)."""
+    from analysen.analysis_context import AnalyseKontext
+    from analysen.image_analysis import (berechne_bildrausch_index, berechne_farbharmonie, berechne_farbschwerpunkt_index,
+                                         berechne_frequenz_index, berechne_segmentierungsgrad)
+
+    kontext = AnalyseKontext(cv2.resize(bild, groesse))
+    segmentierungsgrad, clusterbild = berechne_segmentierungsgrad(kontext, modus="schnell")
+    frequenz_index, spektrum = berechne_frequenz_index(kontext)
+    farbharmonie, farbbalken = berechne_farbharmonie(kontext, 20, 20, modus="schnell")
+    farbschwerpunkt_index, farbschwerpunkt, pfeil = berechne_farbschwerpunkt_index(kontext, 20)
+    return kontext, {
+        "bildrausch_index": berechne_bildrausch_index(kontext)[0],
+        "farbharmonie": farbharmonie,
+        "farbbalken": farbbalken,
+        "farbschwerpunkt": farbschwerpunkt_index,
+        "farbschwerpunkt_projektion_farbe": farbschwerpunkt,
+        "farbschwerpunkt_visualisierung_pfeil": pfeil,
+        "frequenzverteilung": frequenz_index,
+        "frequenz_spektrum": spektrum,
+        "segmentierungsgrad": segmentierungsgrad,
+        "clusterbildSegmentierungsGrad": clusterbild
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kachel-Kompositor messen oder eine Projektion headless als Video rendern")
+    parser.add_argument("--breite", type=int, default=1920)
+    parser.add_argument("--hoehe", type=int, default=1080)
+    parser.add_argument("--kachel", type=int, default=25)
+    parser.add_argument("--bild", help="Aufnahme headless projizieren (statt nur den Kompositor zu messen)")
+    parser.add_argument("--video", help="Zieldatei für --bild, z. B. projektion.mp4 (ohne: Frames nur im Speicher)")
+    parser.add_argument("--morphtime", type=float, default=20, help="Aufbaudauer in Sekunden")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--reihenfolge", choices=REIHENFOLGEN, default="raster")
+    parser.add_argument("--einblenden", type=float, default=0.0)
+    parser.add_argument("--uebergang", choices=UEBERGAENGE, default="kacheln")
+    argumente = parser.parse_args()
+
+    if argumente.bild is None:
+        miss_kompositor(argumente.breite, argumente.hoehe, argumente.kachel)
+    else:
+        bild = cv2.imread(argumente.bild)
+        if bild is None:
+            print("❌ Bild konnte nicht geladen werden:", argumente.bild)
         else:
-            cv2.putText(resized, titel, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        analyse_frames.append(resized)
-
-    analyse_tiles = []
-    analyse_anim_frames = []
-    for analyse_img in analyse_frames:
-        anim = np.zeros_like(analyse_img)
-        tiles = []
-        for i in range(0, analyse_img.shape[0], kachelgröße):
-            for j in range(0, analyse_img.shape[1], kachelgröße):
-                y1 = i
-                y2 = min(i + kachelgröße, analyse_img.shape[0])
-                x1 = j
-                x2 = min(j + kachelgröße, analyse_img.shape[1])
-                tiles.append((y1, y2, x1, x2))
-        analyse_tiles.append(tiles)
-        analyse_anim_frames.append(anim)
-
-    tiles = []
-    for i in range(0, bild_height, kachelgröße):
-        for j in range(0, bild_width, kachelgröße):
-            y1 = i
-            y2 = min(i + kachelgröße, bild_height)
-            x1 = j
-            x2 = min(j + kachelgröße, bild_width)
-            tiles.append((y1, y2, x1, x2))
-
-    tile_count = len(tiles)
-    analyse_tile_counts = [len(t) for t in analyse_tiles]
-
-    start_time = time.time()
-    last_shown_index = 0
-    analyse_last_indices = [0 for _ in analyse_tiles]
-
-    fenstername = "Projektion"
-    cv2.namedWindow(fenstername, cv2.WND_PROP_FULLSCREEN)
-    cv2.setWindowProperty(fenstername, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-    cv2.moveWindow(fenstername, x, y)
-
-    while True:
-        elapsed = time.time() - start_time
-        expected_tiles = int((elapsed / aufbaudauer) * tile_count)
-        expected_tiles = min(expected_tiles, tile_count)
-
-        for idx in range(last_shown_index, expected_tiles):
-            y1, y2, x1, x2 = tiles[idx]
-            anim_patch = anim_frame[y1:y2, x1:x2]
-            target_patch = bild_resized[y1:y2, x1:x2]
-            # Fading-Verhältnis auf Basis der Zeit berechnen
-            kachel_prozent = (idx + 1) / tile_count
-            alpha = min(1.0, max(0.0, kachel_prozent))  # lineare Progression
-            alpha_mask[y1:y2, x1:x2] = alpha
-            # Alphablending manuell durchführen
-            blended_patch = (anim_patch.astype(np.float32) * (1 - alpha) + target_patch.astype(np.float32) * alpha).astype(np.uint8)
-            anim_frame[y1:y2, x1:x2] = blended_patch
-        last_shown_index = expected_tiles
-
-        # Analyse-Fenster gleichzeitig animieren (ohne Morphing!)
-        for ai, (tileset, target_img, anim_img) in enumerate(zip(analyse_tiles, analyse_frames, analyse_anim_frames)):
-            expected_ai_tiles = int((elapsed / aufbaudauer) * analyse_tile_counts[ai])
-            expected_ai_tiles = min(expected_ai_tiles, analyse_tile_counts[ai])
-            for idx in range(analyse_last_indices[ai], expected_ai_tiles):
-                y1, y2, x1, x2 = tileset[idx]
-                anim_img[y1:y2, x1:x2] = target_img[y1:y2, x1:x2]
-            analyse_last_indices[ai] = expected_ai_tiles
-
-        analysen_row = np.hstack(analyse_anim_frames)
-        if analysen_row.shape[1] != anim_frame.shape[1]:
-            analysen_row = cv2.resize(analysen_row, (anim_frame.shape[1], analysen_row.shape[0]))
-        full_frame = np.vstack([anim_frame, analysen_row])
-
-        cv2.imshow(fenstername, full_frame)
-
-        if cv2.waitKey(1) & 0xFF == 27:
-            break
-
-    cv2.destroyAllWindows()
+            kontext, werte = analysewerte_aus_bild(bild)
+            if argumente.video:
+                ausgabe = VideoAusgabe(argumente.video, argumente.breite, argumente.hoehe, argumente.fps)
+            else:
+                ausgabe = ArrayAusgabe(argumente.breite, argumente.hoehe)
+            _, statistik = rendere_offline(bild, kontext, werte, argumente.morphtime, ausgabe, argumente.fps, argumente.kachel,
+                                           reihenfolge=argumente.reihenfolge, einblenden=argumente.einblenden,
+                                           uebergang=argumente.uebergang)
+            print(f"✅ {statistik['frames']} Frames ({statistik['video_s']:.1f} s Video) in {statistik['dauer_s']:.2f} s – "
+                  f"{statistik['echtzeit_faktor']:.0f}x Echtzeit, Ø {statistik['render_ms']:.2f} ms/Frame")
@@ -13,6 +13,8 @@ import numpy as np
 import time
 from screeninfo import get_monitors
 
+from analysen.analysis_context import als_kontext
+
 # Hilfsfunktionen für einzelne Analysen
 from projektion.analysenFuerProjektion import (
     visualisiere_bildrausch,
@@ -42,13 +44,15 @@ def projection(image, image_analyse, analysewerte, aufbaudauer=2.0, kachelgröß
     anim_frame = np.zeros_like(bild_resized)
 
     # Analysevorschauen vorbereiten (jetzt ohne Neu-Berechnung)
+    # image_analyse darf auch der AnalyseKontext der Aufnahme sein → Gray/HSV/Laplace werden wiederverwendet
+    kontext = als_kontext(image_analyse)
     vorschauen = [
-        (visualisiere_bildrausch(image_analyse.copy()), analysewerte.get("bildrausch_index", None), "Bildrausch"),
+        (visualisiere_bildrausch(kontext), analysewerte.get("bildrausch_index", None), "Bildrausch"),
         (analysewerte.get("farbbalken", None), analysewerte.get("farbharmonie", None), "Farbharmonie"),
-        (visualisiere_farbanteile(image_analyse.copy()), None, "Farbanteile"),
+        (visualisiere_farbanteile(kontext), None, "Farbanteile"),
         (visualisiere_frequenzanalyse(analysewerte.get("frequenz_spektrum", None)), analysewerte.get("frequenzverteilung", None), "Frequenz"),
         (analysewerte.get("clusterbildSegmentierungsGrad", None), analysewerte.get("segmentierungsgrad", None), "Segmentierung"),
-        (visualisiere_farbschwerpunkt(image_analyse.copy(), analysewerte.get("farbschwerpunkt_projektion_farbe", None)), analysewerte.get("farbschwerpunkt", None), "Farbschwerpunkt-Farbe"),
+        (visualisiere_farbschwerpunkt(kontext, analysewerte.get("farbschwerpunkt_projektion_farbe", None)), analysewerte.get("farbschwerpunkt", None), "Farbschwerpunkt-Farbe"),
         (analysewerte.get("farbschwerpunkt_visualisierung_pfeil", None), analysewerte.get("farbschwerpunkt", None), "Farbschwerpunkt-Farbe")
     ]
 